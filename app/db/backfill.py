@@ -0,0 +1,104 @@
+from pymongo import UpdateOne
+from app.db.database import db
+from app.helpers.similarity import calculate_normalized_embeddings, tensor_to_list
+from app.helpers.embedding_text import concept_embed_string, embedding_content_hash
+from app.db.embedding_codec import encode_embedding
+from app.helpers.embedding_version import embedding_version_fields
+from app.db.embedding_changes import embedded_at_field
+from datetime import datetime
+import asyncio
+
+
+async def find_stale_concepts(db, batch_size: int = 500):
+    """
+    Yields concepts whose stored normalized_embedding is missing or no longer
+    matches their name and usage, detected through the embedding_hash.
+    """
+    projection = {
+        "name": 1,
+        "usage": 1,
+        "embedding_hash": 1,
+        # Only pull the first element of a legacy array, which is enough to
+        # know a vector exists (packed vectors are returned whole, at 1.5KB)
+        "normalized_embedding": {"$slice": 1},
+    }
+    cursor = db.concepts.find({}, projection).batch_size(batch_size)
+    async for concept in cursor:
+        embed_string = concept_embed_string(concept["name"], concept["usage"])
+        if (
+            embedding_content_hash(embed_string) != concept.get("embedding_hash")
+            or not concept.get("normalized_embedding")
+        ):
+            yield concept["_id"], embed_string
+
+
+async def backfill_embeddings(db, batch_size: int = 64) -> int:
+    """
+    Recomputes stale or missing concept embeddings in batches, writing each
+    batch with a single bulk_write. Every write sets embedded_at, so running
+    API workers pick the new vectors up from the change feed. Returns the
+    number of concepts updated.
+    """
+    updated = 0
+    batch = []
+
+    async def flush():
+        ids, strings = zip(*batch)
+        embeddings = tensor_to_list(calculate_normalized_embeddings(list(strings)))
+        # tensor_to_list flattens a batch of one into a single vector
+        if len(batch) == 1:
+            embeddings = [embeddings]
+        await db.concepts.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": id},
+                    {
+                        "$set": {
+                            "normalized_embedding": encode_embedding(embedding),
+                            "embedding_hash": embedding_content_hash(string),
+                            **embedding_version_fields(),
+                            **embedded_at_field(),
+                        }
+                    },
+                )
+                for id, string, embedding in zip(ids, strings, embeddings)
+            ],
+            ordered=False,
+        )
+        batch.clear()
+
+    async for item in find_stale_concepts(db):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            updated += len(batch)
+            await flush()
+    if batch:
+        updated += len(batch)
+        await flush()
+    return updated
+
+
+async def backfill_review_schedule(db) -> int:
+    """
+    Schedules concepts stored before reviews were scheduled, which the review
+    queue would never return: they become due when they were last seen (or
+    created), keeping the old least-recently-seen order. Returns the number
+    of concepts updated.
+    """
+    due = {"$ifNull": ["$last_seen", {"$ifNull": ["$date_created", datetime.now()]}]}
+    result = await db.concepts.update_many(
+        {"next_due": {"$exists": False}}, [{"$set": {"next_due": due}}]
+    )
+    return result.modified_count
+
+
+async def main():
+    count = await backfill_embeddings(db)
+    print(f"Backfilled {count} concept embeddings")
+    count = await backfill_review_schedule(db)
+    print(f"Scheduled {count} concepts for review")
+
+
+# Run as a module: python3 -m app.db.backfill
+if __name__ == "__main__":
+    asyncio.run(main())
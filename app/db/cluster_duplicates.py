@@ -0,0 +1,96 @@
+from pymongo import UpdateOne
+from bson import ObjectId
+from app.db.embedding_codec import decode_embedding
+from app.helpers.duplicates import cluster_duplicates, DUPLICATE_THRESHOLD
+from app.helpers.embedding_version import current_model_filter
+import numpy as np
+import argparse
+import asyncio
+
+
+async def user_vectors(db, user_id: str) -> tuple[list[str], np.ndarray | None]:
+    """Ids and stacked embeddings of a user's concepts (current model only)"""
+    cursor = db.concepts.find(
+        {
+            "user_id": user_id,
+            "normalized_embedding": {"$exists": True, "$ne": None},
+            # Vectors of different models can't be compared
+            **current_model_filter(),
+        },
+        {"normalized_embedding": 1},
+    ).batch_size(1000)
+    ids, vectors = [], []
+    async for concept in cursor:
+        ids.append(str(concept["_id"]))
+        vectors.append(decode_embedding(concept["normalized_embedding"]))
+    return ids, np.stack(vectors) if vectors else None
+
+
+async def user_duplicate_clusters(
+    db, user_id: str, threshold: float = DUPLICATE_THRESHOLD
+) -> list[list[str]]:
+    """Clusters of near-duplicate concepts of one user, oldest id first"""
+    ids, vectors = await user_vectors(db, user_id)
+    if len(ids) < 2:
+        return []
+    return cluster_duplicates(ids, vectors, threshold)
+
+
+async def cluster_all_duplicates(
+    db, threshold: float = DUPLICATE_THRESHOLD, apply: bool = False
+) -> dict[str, list[list[str]]]:
+    """
+    Finds every user's clusters of near-duplicate concepts, one user at a
+    time so only one user's vectors are in memory.
+
+    With `apply`, every concept of a cluster but the oldest is flagged with
+    duplicate_of the oldest and duplicate_score, its similarity to the
+    oldest, like the API flags them, in one bulk_write per user.
+
+    Returns:
+        dict: The clusters of each user that has any.
+    """
+    found = {}
+    for user_id in await db.concepts.distinct("user_id"):
+        ids, vectors = await user_vectors(db, user_id)
+        if len(ids) < 2:
+            continue
+        clusters = cluster_duplicates(ids, vectors, threshold)
+        if not clusters:
+            continue
+        found[user_id] = clusters
+        if apply:
+            rows = {id: row for row, id in enumerate(ids)}
+            updates = []
+            for cluster in clusters:
+                oldest = vectors[rows[cluster[0]]]
+                for id in cluster[1:]:
+                    # Single linkage: a chained member can score below threshold
+                    score = float(vectors[rows[id]] @ oldest)
+                    fields = {"duplicate_of": cluster[0], "duplicate_score": round(score, 5)}
+                    updates.append(UpdateOne({"_id": ObjectId(id)}, {"$set": fields}))
+            await db.concepts.bulk_write(updates, ordered=False)
+    return found
+
+
+async def main(args):
+    from app.db.database import db
+
+    found = await cluster_all_duplicates(db, args.threshold, args.apply)
+    for user_id, clusters in found.items():
+        print(f"user {user_id}: {len(clusters)} clusters")
+        for cluster in clusters:
+            print(f"  {', '.join(cluster)}")
+    duplicates = sum(len(cluster) - 1 for clusters in found.values() for cluster in clusters)
+    action = "Flagged" if args.apply else "Found"
+    print(f"{action} {duplicates} duplicate concepts of {len(found)} users")
+
+
+# Run as a module: python3 -m app.db.cluster_duplicates [--threshold] [--apply]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate concepts")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument(
+        "--apply", action="store_true", help="flag duplicates with duplicate_of"
+    )
+    asyncio.run(main(parser.parse_args()))
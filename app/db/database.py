@@ -1,4 +1,5 @@
 import motor.motor_asyncio
+from app.helpers.metrics import MongoCommandMetrics
 from typing import Annotated
 from dotenv import load_dotenv
 from fastapi import Depends
@@ -27,6 +28,7 @@ client = motor.motor_asyncio.AsyncIOMotorClient(
     tlsCAFile=certifi.where(),
     serverSelectionTimeoutMS=10000,  # Time to wait for server selection
     connectTimeoutMS=10000,  # Time to wait for db connection to be established
+    event_listeners=[MongoCommandMetrics()],  # Command latencies for /metrics
 )
 db = client[db_name]
 
@@ -0,0 +1,87 @@
+from app.db.embedding_codec import decode_embedding
+from app.helpers.embedding_version import is_current_model
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import asyncio
+import os
+
+# Changes are read back from this long before the last sync, to cover writes
+# that commit after their timestamp was taken and clock skew between hosts.
+# Re-reading a change is harmless: it carries the concept's current state.
+EMBEDDING_CHANGES_MARGIN_SECONDS = float(os.getenv("EMBEDDING_CHANGES_MARGIN_SECONDS", "5"))
+# How long deletions are remembered in `concept_deletions`; an index that
+# hasn't synced for longer can't be caught up and must be rebuilt
+CONCEPT_DELETIONS_TTL_SECONDS = int(
+    os.getenv("CONCEPT_DELETIONS_TTL_SECONDS", str(7 * 24 * 3600))
+)
+
+
+def feed_time() -> datetime:
+    """
+    Current time on the change feed's clock: naive UTC, as MongoDB returns
+    dates, so it never jumps back with daylight saving time.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def embedded_at_field() -> dict:
+    """Field stored with every write of a concept's normalized_embedding, so
+    the write shows up in `embedding_changes`"""
+    return {"embedded_at": feed_time()}
+
+
+def can_catch_up(synced_at: datetime) -> bool:
+    """Whether an index synced at `synced_at` can still be caught up from the
+    feed, i.e. no deletion since then has expired"""
+    retention = timedelta(seconds=CONCEPT_DELETIONS_TTL_SECONDS - EMBEDDING_CHANGES_MARGIN_SECONDS)
+    return feed_time() - synced_at < retention
+
+
+async def record_deletions(db, user_id: str, *concept_ids: str):
+    """Records deleted concepts (after the delete), for `embedding_changes`"""
+    at = feed_time()
+    await db.concept_deletions.insert_many(
+        [{"user_id": user_id, "concept_id": concept_id, "at": at} for concept_id in concept_ids]
+    )
+
+
+async def embedding_changes(
+    db, since: datetime, user_id: str | None = None
+) -> tuple[datetime, list[tuple[str, str, np.ndarray | None]]]:
+    """
+    Reads the concept embeddings written or deleted since a time, by every
+    API worker and job, for all users or only one.
+
+    A changed concept is returned with its current vector, or None if it was
+    deleted or its vector comes from another model (e.g. it was edited by a
+    worker that hasn't switched models yet), so applying the changes in order
+    is idempotent.
+
+    Returns:
+        tuple: The time to pass as `since` next time, and (concept id,
+        user id, vector or None) for each change.
+    """
+    synced_at = feed_time()
+    start = since - timedelta(seconds=EMBEDDING_CHANGES_MARGIN_SECONDS)
+    owner = {} if user_id is None else {"user_id": user_id}
+    written, deleted = await asyncio.gather(
+        db.concepts.find(
+            {"embedded_at": {"$gte": start}, **owner},
+            {
+                "user_id": 1,
+                "normalized_embedding": 1,
+                "embedding_model": 1,
+                "embedding_version": 1,
+            },
+        ).to_list(length=None),
+        db.concept_deletions.find({"at": {"$gte": start}, **owner}).to_list(length=None),
+    )
+    changes = []
+    for concept in written:
+        embedding = None
+        if is_current_model(concept):
+            embedding = decode_embedding(concept.get("normalized_embedding"))
+        changes.append((str(concept["_id"]), concept["user_id"], embedding))
+    # Deletions come last, so a concept deleted after it was read still goes
+    changes.extend((d["concept_id"], d["user_id"], None) for d in deleted)
+    return synced_at, changes
@@ -0,0 +1,65 @@
+from bson.binary import Binary
+import numpy as np
+import os
+
+# How new embeddings are stored: "float32" (exact), or "float16" (half the
+# size, with cosine similarities off by about 1e-4)
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+
+# Packed vectors are stored as BSON Binary with a user-defined subtype
+# (128-255) naming their little-endian element type
+_SUBTYPES = {"float32": 0x80, "float16": 0x81}
+_DTYPES = {
+    0x80: np.dtype("<f4"),
+    0x81: np.dtype("<f2"),
+}
+
+
+def encode_embedding(vector, dtype: str = EMBEDDING_STORAGE_DTYPE) -> Binary:
+    """
+    Packs an embedding (list or array) into the BSON Binary it is stored as:
+    1.5KB for 384 float32 values, instead of about 4.8KB as an array of
+    tagged doubles.
+    """
+    if dtype not in _SUBTYPES:
+        raise ValueError(f"Unknown embedding storage dtype {dtype}")
+    subtype = _SUBTYPES[dtype]
+    packed = np.asarray(vector, dtype=_DTYPES[subtype]).ravel()
+    return Binary(packed.tobytes(), subtype)
+
+
+def is_packed_embedding(value) -> bool:
+    return isinstance(value, Binary) and value.subtype in _DTYPES
+
+
+def decode_embedding(value) -> np.ndarray | None:
+    """
+    Reads a stored embedding into a float32 array. Packed float32 vectors are
+    wrapped with np.frombuffer without copying (the array is read-only);
+    documents not migrated yet still hold a list, which is converted.
+    """
+    if value is None:
+        return None
+    if is_packed_embedding(value):
+        vector = np.frombuffer(value, dtype=_DTYPES[value.subtype])
+        return vector if vector.dtype == np.float32 else vector.astype(np.float32)
+    if isinstance(value, bytes):
+        subtype = getattr(value, "subtype", 0)
+        raise ValueError(f"Not a packed embedding (BSON binary subtype {subtype})")
+    return np.asarray(value, dtype=np.float32)
+
+
+def embedding_to_list(value) -> list[float] | None:
+    """A stored embedding as a plain list, for JSON responses"""
+    vector = decode_embedding(value)
+    return None if vector is None else vector.tolist()
+
+
+def storage_dtype(value) -> str | None:
+    """How a stored embedding is encoded: "float32", "float16", "array", or
+    None if there is none"""
+    if value is None:
+        return None
+    if is_packed_embedding(value):
+        return _DTYPES[value.subtype].name
+    return "array"
@@ -0,0 +1,148 @@
+from pymongo import IndexModel, ASCENDING
+from app.db.embedding_changes import CONCEPT_DELETIONS_TTL_SECONDS
+import motor.motor_asyncio
+from datetime import datetime
+import argparse
+import asyncio
+
+# Every index the app relies on, by collection. Add new ones here and they are
+# created on the next startup.
+INDEXES = {
+    "users": [
+        # Enforces unique emails; create_user maps duplicate keys to 409
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "concepts": [
+        # Per-user listing/export/vector index loading, paginated on _id
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id__id"),
+        # Review queues: a user's concepts due by now, most overdue first
+        IndexModel(
+            [("user_id", ASCENDING), ("next_due", ASCENDING)], name="user_id_next_due"
+        ),
+        # Change feed of written embeddings (app.db.embedding_changes), per
+        # user for the vector index registry and for all users for the ANN index
+        IndexModel(
+            [("user_id", ASCENDING), ("embedded_at", ASCENDING)], name="user_id_embedded_at"
+        ),
+        IndexModel([("embedded_at", ASCENDING)], name="embedded_at", sparse=True),
+    ],
+    "concept_deletions": [
+        # Change feed of deleted concepts, expired once no index can still
+        # be caught up from it
+        IndexModel([("user_id", ASCENDING), ("at", ASCENDING)], name="user_id_at"),
+        IndexModel(
+            [("at", ASCENDING)],
+            name="at_ttl",
+            expireAfterSeconds=CONCEPT_DELETIONS_TTL_SECONDS,
+        ),
+    ],
+}
+
+# Queries the routes run often, checked with explain() by the CLI below:
+# (description, collection, filter, sort)
+HOT_QUERIES = [
+    ("user by email", "users", {"email": "someone@example.com"}, None),
+    ("concept page", "concepts", {}, [("_id", ASCENDING)]),
+    (
+        "user's concept page",
+        "concepts",
+        {"user_id": "60b8d6e1e1b8f30d6c8e6f59"},
+        [("_id", ASCENDING)],
+    ),
+    (
+        "user's review queue",
+        "concepts",
+        {"user_id": "60b8d6e1e1b8f30d6c8e6f59", "next_due": {"$lte": datetime(2024, 1, 1)}},
+        [("next_due", ASCENDING)],
+    ),
+    (
+        "user's embedding changes",
+        "concepts",
+        {"user_id": "60b8d6e1e1b8f30d6c8e6f59", "embedded_at": {"$gte": datetime(2024, 1, 1)}},
+        None,
+    ),
+]
+
+# Plan stages that mean a query scans or sorts more than it should
+SLOW_STAGES = {"COLLSCAN", "SORT"}
+
+# Outcome of creating INDEXES at startup ("pending", "ready" or "failed", and
+# the error), reported by GET /ready. Until it is "ready", routes that rely on
+# a unique index check for conflicts themselves.
+index_status = {"state": "pending", "error": None}
+
+
+def indexes_ready() -> bool:
+    return index_status["state"] == "ready"
+
+
+async def ensure_indexes(db: motor.motor_asyncio.AsyncIOMotorDatabase):
+    """Creates any missing index from INDEXES (existing ones are left as is)"""
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+
+async def missing_indexes(db: motor.motor_asyncio.AsyncIOMotorDatabase) -> list[str]:
+    """Names of INDEXES that don't exist yet, as "collection.index_name" """
+    missing = []
+    for collection, indexes in INDEXES.items():
+        existing = await db[collection].index_information()
+        for index in indexes:
+            name = index.document["name"]
+            if name not in existing:
+                missing.append(f"{collection}.{name}")
+    return missing
+
+
+def plan_stages(plan: dict) -> list[str]:
+    """Flattens an explain() plan tree into its list of stage names"""
+    stages = [plan.get("stage", "?")]
+    for child in plan.get("inputStages", []) + [plan.get("inputStage")]:
+        if child:
+            stages += plan_stages(child)
+    return stages
+
+
+async def explain_hot_queries(db: motor.motor_asyncio.AsyncIOMotorDatabase) -> list[dict]:
+    """
+    Runs explain() on HOT_QUERIES and reports each winning plan's stages,
+    flagging collection scans and in-memory sorts.
+    """
+    reports = []
+    for description, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query).limit(100)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = plan_stages(explanation["queryPlanner"]["winningPlan"])
+        reports.append(
+            {
+                "query": description,
+                "collection": collection,
+                "stages": stages,
+                "slow": bool(SLOW_STAGES & set(stages)),
+            }
+        )
+    return reports
+
+
+async def main(args):
+    from app.db.database import db
+
+    if args.create:
+        await ensure_indexes(db)
+        print("Created missing indexes")
+    missing = await missing_indexes(db)
+    print("Missing indexes:", ", ".join(missing) if missing else "none")
+    if args.explain:
+        for report in await explain_hot_queries(db):
+            flag = "SLOW" if report["slow"] else "ok"
+            print(f"[{flag:>4}] {report['query']}: {' <- '.join(report['stages'])}")
+
+
+# Run as a module: python3 -m app.db.indexes [--create] [--explain]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check MongoDB indexes and query plans")
+    parser.add_argument("--create", action="store_true", help="create missing indexes")
+    parser.add_argument("--explain", action="store_true", help="explain the hot queries")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+from pymongo import UpdateOne
+from app.db.embedding_codec import (
+    EMBEDDING_STORAGE_DTYPE,
+    encode_embedding,
+    decode_embedding,
+    storage_dtype,
+)
+import argparse
+import asyncio
+
+
+async def migrate_embeddings(
+    db, dtype: str = EMBEDDING_STORAGE_DTYPE, batch_size: int = 500
+) -> dict:
+    """
+    Rewrites stored normalized_embeddings into the packed `dtype` format:
+    legacy arrays of doubles, and packed vectors of another dtype.
+
+    Each batch is written with a single unordered bulk_write. Every update
+    only matches if the document still holds the vector that was read, so a
+    concept re-embedded meanwhile is left alone. Running it again resumes
+    where it stopped, since converted documents are skipped.
+
+    Returns:
+        dict: Counts of the converted and skipped documents.
+    """
+    converted = skipped = 0
+    cursor = db.concepts.find(
+        {"normalized_embedding": {"$exists": True, "$ne": None}},
+        {"normalized_embedding": 1},
+    ).batch_size(batch_size)
+    updates = []
+
+    async def flush():
+        nonlocal converted, skipped
+        result = await db.concepts.bulk_write(updates, ordered=False)
+        converted += result.modified_count
+        skipped += len(updates) - result.modified_count
+        updates.clear()
+
+    async for concept in cursor:
+        stored = concept["normalized_embedding"]
+        if storage_dtype(stored) == dtype:
+            skipped += 1
+            continue
+        packed = encode_embedding(decode_embedding(stored), dtype)
+        updates.append(
+            UpdateOne(
+                {"_id": concept["_id"], "normalized_embedding": stored},
+                {"$set": {"normalized_embedding": packed}},
+            )
+        )
+        if len(updates) >= batch_size:
+            await flush()
+    if updates:
+        await flush()
+    return {"converted": converted, "skipped": skipped}
+
+
+async def main(args):
+    from app.db.database import db
+
+    counts = await migrate_embeddings(db, args.dtype, args.batch_size)
+    print(
+        f"Converted {counts['converted']} embeddings to {args.dtype}, "
+        f"skipped {counts['skipped']}"
+    )
+
+
+# Run as a module: python3 -m app.db.migrate_embeddings [--dtype float16]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack stored concept embeddings")
+    parser.add_argument(
+        "--dtype", choices=["float32", "float16"], default=EMBEDDING_STORAGE_DTYPE
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
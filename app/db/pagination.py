@@ -0,0 +1,83 @@
+from bson import ObjectId, errors
+import motor.motor_asyncio
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def build_projection(
+    fields: str | None,
+    allowed: set[str],
+    default_exclude: set[str] = frozenset(),
+    never: set[str] = frozenset(),
+) -> dict:
+    """
+    Turns a comma-separated `fields` query parameter into a MongoDB projection,
+    so unrequested fields never leave the database.
+
+    Args:
+        fields (str): e.g. "name,usage". None returns every allowed field
+        except `default_exclude`. "id" is always included.
+        allowed (set): Field names a client may ask for.
+        default_exclude (set): Fields left out unless explicitly requested,
+        like the 384-float normalized_embedding.
+        never (set): Fields that are never returned, like password hashes.
+
+    Raises:
+        ValueError: If a requested field isn't allowed.
+    """
+    if fields is None:
+        return {field: 0 for field in (default_exclude | never)} or None
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    requested.discard("id")
+    unknown = requested - (allowed - never)
+    if unknown:
+        raise ValueError(f"Unknown fields requested: {', '.join(sorted(unknown))}")
+    # An inclusion projection, with _id included by MongoDB by default
+    return {field: 1 for field in requested} or {"_id": 1}
+
+
+async def fetch_page(
+    collection: motor.motor_asyncio.AsyncIOMotorCollection,
+    query: dict,
+    limit: int,
+    after: str | None = None,
+    projection: dict | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Fetches one page of documents with keyset pagination on `_id`.
+
+    Rather than skipping over earlier pages, each page starts right after the
+    last `_id` of the previous one, so every page is an index range scan no
+    matter how deep into the collection it is.
+
+    Returns:
+        tuple: The documents of this page and the `after` cursor of the next
+        page (None on the last page).
+
+    Raises:
+        ValueError: If `after` isn't a valid ObjectId.
+    """
+    query = dict(query)
+    if after is not None:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except errors.InvalidId:
+            raise ValueError(f"Invalid cursor: {after}")
+
+    # Fetch one extra document to know whether there is a next page
+    cursor = collection.find(query, projection).sort("_id", 1).limit(limit + 1)
+    documents = await cursor.to_list(length=limit + 1)
+    next_after = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_after = str(documents[-1]["_id"])
+    return documents, next_after
+
+
+def serialize_document(document: dict) -> dict:
+    """Renames a raw document's ObjectId `_id` into a string `id`"""
+    document = dict(document)
+    return {"id": str(document.pop("_id")), **document}
@@ -0,0 +1,138 @@
+from pymongo import UpdateOne
+from app.helpers.model_registry import EMBEDDING_MODEL_ID, EMBEDDING_MODEL_VERSION
+from app.helpers.embedding_text import concept_embed_string, embedding_content_hash
+from app.helpers.embedding_version import embedding_version_fields, stale_model_filter
+from app.db.embedding_changes import embedded_at_field
+from app.db.embedding_codec import encode_embedding
+from datetime import datetime
+import argparse
+import asyncio
+import time
+import os
+
+# Concepts embedded and written per batch
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "256"))
+# Most concepts re-embedded per second, so a migration running next to the
+# API leaves it enough CPU and database capacity (0 for no limit)
+REEMBED_MAX_PER_SECOND = float(os.getenv("REEMBED_MAX_PER_SECOND", "100"))
+
+
+def job_id() -> str:
+    """Checkpoint document id of the migration to the current model"""
+    return f"reembed:{EMBEDDING_MODEL_ID}:{EMBEDDING_MODEL_VERSION}"
+
+
+async def reembed_concepts(
+    db,
+    batch_size: int = REEMBED_BATCH_SIZE,
+    max_per_second: float = REEMBED_MAX_PER_SECOND,
+    restart: bool = False,
+) -> dict:
+    """
+    Re-embeds every concept whose embedding comes from another model or
+    version than the current one, in `_id` order.
+
+    Each batch is embedded in one forward pass (in a thread, off the event
+    loop), written with a single unordered bulk_write, and then recorded in a
+    checkpoint document of the `jobs` collection, so an interrupted run
+    resumes after the last written batch. Runs are throttled to
+    `max_per_second` concepts.
+
+    A write only applies if the concept still has the name and usage that
+    were embedded and is still stale, so concepts edited meanwhile (which the
+    API re-embeds with the current model) are left alone.
+
+    Every write sets embedded_at, so API workers pick up the new vectors
+    from the change feed (app.db.embedding_changes) without reloading their
+    indexes: both the per-user indexes and the ANN index, whose snapshot is
+    also caught up from the feed (or rebuilt, once the model changed).
+
+    Returns:
+        dict: The checkpoint, with the counts of updated and skipped concepts.
+    """
+    # Imported here so the module can be imported without loading torch
+    from app.helpers.similarity import calculate_normalized_embeddings
+
+    checkpoint = await db.jobs.find_one({"_id": job_id()})
+    if restart or checkpoint is None or checkpoint.get("finished_at"):
+        checkpoint = {
+            "after": None,
+            "updated": 0,
+            "skipped": 0,
+            "started_at": datetime.now(),
+        }
+    stale = stale_model_filter()
+
+    while True:
+        query = dict(stale)
+        if checkpoint["after"] is not None:
+            query["_id"] = {"$gt": checkpoint["after"]}
+        cursor = db.concepts.find(query, {"name": 1, "usage": 1}).sort("_id", 1)
+        concepts = await cursor.limit(batch_size).to_list(length=batch_size)
+        if not concepts:
+            break
+
+        start = time.monotonic()
+        strings = [concept_embed_string(c["name"], c["usage"]) for c in concepts]
+        embeddings = await asyncio.to_thread(calculate_normalized_embeddings, strings)
+        result = await db.concepts.bulk_write(
+            [
+                UpdateOne(
+                    {
+                        "_id": concept["_id"],
+                        "name": concept["name"],
+                        "usage": concept["usage"],
+                        **stale,
+                    },
+                    {
+                        "$set": {
+                            "normalized_embedding": encode_embedding(embedding.numpy()),
+                            "embedding_hash": embedding_content_hash(string),
+                            **embedding_version_fields(),
+                            **embedded_at_field(),
+                        }
+                    },
+                )
+                for concept, string, embedding in zip(concepts, strings, embeddings)
+            ],
+            ordered=False,
+        )
+        checkpoint["after"] = concepts[-1]["_id"]
+        checkpoint["updated"] += result.modified_count
+        checkpoint["skipped"] += len(concepts) - result.modified_count
+        await save_checkpoint(db, checkpoint)
+        print(f"Re-embedded {checkpoint['updated']} concepts (up to {checkpoint['after']})")
+
+        if max_per_second:
+            # Sleep off whatever time this batch had left under the limit
+            elapsed = time.monotonic() - start
+            await asyncio.sleep(max(0.0, len(concepts) / max_per_second - elapsed))
+
+    checkpoint["finished_at"] = datetime.now()
+    await save_checkpoint(db, checkpoint)
+    return checkpoint
+
+
+async def save_checkpoint(db, checkpoint: dict):
+    checkpoint = {**checkpoint, "updated_at": datetime.now()}
+    checkpoint.pop("_id", None)
+    await db.jobs.replace_one({"_id": job_id()}, checkpoint, upsert=True)
+
+
+async def main(args):
+    from app.db.database import db
+
+    checkpoint = await reembed_concepts(db, args.batch_size, args.max_per_second, args.restart)
+    print(
+        f"Re-embedded {checkpoint['updated']} concepts with {EMBEDDING_MODEL_ID} "
+        f"v{EMBEDDING_MODEL_VERSION} (skipped {checkpoint['skipped']} edited meanwhile)"
+    )
+
+
+# Run as a module: python3 -m app.db.reembed [--max-per-second N] [--restart]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed concepts with the current model")
+    parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+    parser.add_argument("--max-per-second", type=float, default=REEMBED_MAX_PER_SECOND)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    asyncio.run(main(parser.parse_args()))
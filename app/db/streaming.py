@@ -0,0 +1,69 @@
+from app.db.pagination import serialize_document
+from app.db.embedding_codec import decode_embedding, is_packed_embedding
+from bson import ObjectId
+import motor.motor_asyncio
+import orjson
+
+# Default number of documents MongoDB sends per cursor batch when exporting
+EXPORT_BATCH_SIZE = 1000
+# Serialized documents are gathered into chunks of about this size before
+# being written to the response, rather than one write per document
+_CHUNK_BYTES = 64 * 1024
+
+
+def _default(value):
+    """orjson fallback for BSON types it can't serialize natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if is_packed_embedding(value):
+        # Written by orjson straight from the array (OPT_SERIALIZE_NUMPY)
+        return decode_embedding(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+async def stream_ndjson(cursor: motor.motor_asyncio.AsyncIOMotorCursor):
+    """
+    Serializes the documents of a cursor as newline-delimited JSON.
+
+    Only one cursor batch and one output chunk are held in memory at a time,
+    so memory stays flat no matter how many documents are exported.
+    """
+    chunk = bytearray()
+    async for document in cursor:
+        chunk += orjson.dumps(
+            serialize_document(document),
+            default=_default,
+            option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY,
+        )
+        if len(chunk) >= _CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+async def iter_ndjson(chunks):
+    """
+    Parses newline-delimited JSON from an async iterator of byte chunks (like
+    `Request.stream()`), one line at a time, without buffering the whole body.
+
+    Yields:
+        The parsed object of each non-empty line, or the ValueError raised
+        while parsing it.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes):
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        return ValueError(f"Invalid JSON: {e}")
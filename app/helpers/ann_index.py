@@ -0,0 +1,427 @@
+from app.helpers.vector_index import VectorIndex, EMBEDDING_DIM
+from app.db.embedding_codec import decode_embedding
+from app.helpers.embedding_version import (
+    embedding_version_fields,
+    current_model_filter,
+    is_current_model,
+)
+from app.db.embedding_changes import embedding_changes, feed_time, can_catch_up
+from app.helpers.metrics import timed
+from datetime import datetime
+import numpy as np
+import threading
+import argparse
+import logging
+import asyncio
+import time
+import os
+
+# The cross-user ANN index is optional, since it holds every stored embedding
+ANN_INDEX_ENABLED = os.getenv("ANN_INDEX_ENABLED") == "true"
+# Snapshot file the index is loaded from on startup and saved to on shutdown
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", "ann_index.npz")
+# Longest the index is searched without applying the concept changes made by
+# other workers and jobs (see app.db.embedding_changes)
+ANN_SYNC_SECONDS = float(os.getenv("ANN_SYNC_SECONDS", "1"))
+# Number of inverted lists probed per query; higher is slower but more exact
+ANN_N_PROBE = int(os.getenv("ANN_N_PROBE", "8"))
+# Below this many vectors, search stays exact and no clustering is trained
+ANN_TRAIN_THRESHOLD = int(os.getenv("ANN_TRAIN_THRESHOLD", "10000"))
+
+# Chunk size for scoring many vectors against the centroids, to bound memory
+_ASSIGN_CHUNK = 65536
+# Largest sample the centroids are trained on
+_MAX_TRAIN_SAMPLE = 100_000
+
+logger = logging.getLogger(__name__)
+
+
+def default_n_lists(n: int) -> int:
+    """Rule of thumb for the number of inverted lists: about 4 * sqrt(n)"""
+    return int(min(4096, max(16, 4 * np.sqrt(n))))
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for every vector"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        chunk = vectors[start : start + _ASSIGN_CHUNK]
+        assignments[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """
+    Clusters normalized vectors by cosine similarity.
+
+    Returns:
+        np.ndarray: (n_lists x dim) normalized centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_to_centroids(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_lists)
+        # Sum each cluster's members with one sort + reduceat rather than a
+        # Python loop over clusters
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        non_empty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(vectors[order], starts[non_empty])
+        # Reseed empty clusters with random vectors
+        sums[~non_empty] = vectors[rng.choice(len(vectors), (~non_empty).sum())]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids.astype(np.float32)
+
+
+class IVFFlatIndex:
+    """
+    Approximate nearest-neighbour index (IVF-flat) over normalized embeddings.
+
+    Vectors are split into inverted lists by their nearest k-means centroid.
+    A query only scans the `n_probe` lists whose centroids are closest to it,
+    so search cost grows with about n_probe / n_lists of the corpus instead of
+    all of it. Each list is an exact VectorIndex.
+
+    Until `train_threshold` vectors have been added, everything stays in a
+    single exact list. The insert that reaches it starts training the
+    centroids on a background thread, and searches stay exact until the
+    trained lists are swapped in. Updates and removals made meanwhile are
+    replayed onto the trained lists at the swap.
+
+    Updates, removals, searches and the swap take a lock, so the event loop
+    and the training thread can share the index.
+
+    `synced_at` is the change feed time the contents are current with (None
+    until the index is filled by `build_ann_index`); snapshots store it, so
+    they can be caught up from the feed.
+    """
+
+    def __init__(
+        self,
+        dim: int = EMBEDDING_DIM,
+        n_probe: int = ANN_N_PROBE,
+        train_threshold: int = ANN_TRAIN_THRESHOLD,
+    ):
+        self.dim = dim
+        self.n_probe = n_probe
+        self.train_threshold = train_threshold
+        self.centroids: np.ndarray | None = None
+        self._lists: list[VectorIndex] = [VectorIndex(dim)]
+        self._list_of: dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._training: threading.Thread | None = None
+        # id -> vector (None once removed) of the changes made while training
+        self._changes: dict[str, np.ndarray | None] = {}
+        self.synced_at: datetime | None = None
+        # When the change feed was last read, on the monotonic clock
+        self._checked = 0.0
+
+    def __len__(self) -> int:
+        return len(self._list_of)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def arrays(self) -> tuple[list[str], np.ndarray]:
+        """All indexed ids and a copy of their vectors"""
+        ids, vectors = [], []
+        for inverted_list in self._lists:
+            list_ids, list_vectors = inverted_list.arrays()
+            ids.extend(list_ids)
+            vectors.append(list_vectors)
+        if not ids:
+            return [], np.empty((0, self.dim), dtype=np.float32)
+        return ids, np.concatenate(vectors)
+
+    def build(self, ids: list[str], vectors: np.ndarray, n_lists: int | None = None):
+        """
+        (Re)builds the whole index from scratch: trains centroids on a sample
+        of the vectors (if there are enough) and fills the inverted lists.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._list_of = {}
+        if len(ids) < self.train_threshold:
+            self.centroids = None
+            self._lists = [VectorIndex(self.dim)]
+            self._lists[0].extend(list(ids), vectors)
+            self._list_of = dict.fromkeys(ids, 0)
+            return
+
+        n_lists = n_lists or default_n_lists(len(ids))
+        rng = np.random.default_rng(0)
+        sample_size = min(len(ids), _MAX_TRAIN_SAMPLE)
+        sample = vectors[rng.choice(len(ids), sample_size, replace=False)]
+        self.centroids = spherical_kmeans(sample, n_lists)
+        self._fill(ids, vectors, assign_to_centroids(vectors, self.centroids))
+
+    def _fill(self, ids: list[str], vectors: np.ndarray, assignments: np.ndarray):
+        """Puts vectors into the inverted lists given their assignments"""
+        self._lists = [VectorIndex(self.dim) for _ in range(len(self.centroids))]
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self._lists) + 1))
+        for list_number, inverted_list in enumerate(self._lists):
+            rows = order[bounds[list_number] : bounds[list_number + 1]]
+            list_ids = [ids[row] for row in rows]
+            inverted_list.extend(list_ids, vectors[rows])
+            self._list_of.update(dict.fromkeys(list_ids, list_number))
+
+    def upsert(self, id: str, embedding):
+        """Adds or moves a single vector (incremental insert)"""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if self.trained:
+                list_number = int(np.argmax(self.centroids @ embedding))
+            else:
+                list_number = 0
+            previous = self._list_of.get(id)
+            if previous is not None and previous != list_number:
+                self._lists[previous].remove(id)
+            self._lists[list_number].upsert(id, embedding)
+            self._list_of[id] = list_number
+
+            if self._training is not None:
+                self._changes[id] = embedding
+            elif not self.trained and len(self) >= self.train_threshold:
+                self.start_training()
+
+    def remove(self, id: str):
+        with self._lock:
+            list_number = self._list_of.pop(id, None)
+            if list_number is not None:
+                self._lists[list_number].remove(id)
+            if self._training is not None:
+                self._changes[id] = None
+
+    def start_training(self):
+        """Trains the centroids on a copy of the current vectors in a
+        background thread, unless a training is already running"""
+        with self._lock:
+            if self._training is not None:
+                return
+            ids, vectors = self.arrays()
+            self._changes = {}
+            self._training = threading.Thread(
+                target=self._train, args=(ids, vectors), name="ann-training", daemon=True
+            )
+            self._training.start()
+
+    def _train(self, ids: list[str], vectors: np.ndarray):
+        try:
+            trained = IVFFlatIndex(self.dim, self.n_probe, train_threshold=0)
+            trained.build(ids, vectors)
+        except Exception:
+            logger.exception("ANN index training failed; search stays exact")
+            with self._lock:
+                self._training = None
+            return
+        with self._lock:
+            for id, embedding in self._changes.items():
+                if embedding is None:
+                    trained.remove(id)
+                else:
+                    trained.upsert(id, embedding)
+            self.take_contents(trained)
+            self._changes = {}
+            self._training = None
+
+    def take_contents(self, other: "IVFFlatIndex"):
+        """Replaces the centroids and inverted lists with another index's,
+        e.g. one built or loaded off the event loop"""
+        with self._lock:
+            self.centroids = other.centroids
+            self._lists = other._lists
+            self._list_of = other._list_of
+
+    def wait_for_training(self, timeout: float | None = None):
+        """Blocks until a background training (if any) is done"""
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+
+    @timed("ann_index.search")
+    def search(self, query, k: int, n_probe: int | None = None) -> list[tuple[str, float]]:
+        """
+        Finds approximately the k most similar vectors to a normalized query.
+
+        Returns:
+            list: (id, score) tuples, best first.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if not self.trained:
+                return self._lists[0].top_k(query, k)
+
+            n_probe = min(n_probe or self.n_probe, len(self._lists))
+            centroid_scores = self.centroids @ query
+            probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+            candidates = []
+            for list_number in probed:
+                candidates.extend(self._lists[list_number].top_k(query, k))
+        candidates.sort(key=lambda match: match[1], reverse=True)
+        return candidates[:k]
+
+    def save(self, path: str):
+        """
+        Writes a snapshot of the index, replacing any previous one atomically.
+        Each process writes its own temporary file, so workers sharing the
+        path can save concurrently; any of their snapshots is consistent with
+        its own `synced_at`.
+        """
+        with self._lock:
+            ids, vectors = self.arrays()
+            list_sizes = np.array([len(inverted_list) for inverted_list in self._lists])
+            centroids = self.centroids if self.trained else np.empty((0, self.dim))
+            synced_at = self.synced_at
+        if synced_at is None:
+            raise ValueError("ERROR: The ANN index was never filled, so there is nothing to save")
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            # Which embedding model the vectors come from
+            **{key: np.array(value) for key, value in embedding_version_fields().items()},
+            # Change feed time to catch up from
+            synced_at=np.array(synced_at.isoformat()),
+            ids=np.array(ids, dtype=str),
+            vectors=vectors,
+            list_sizes=list_sizes,
+            centroids=centroids.astype(np.float32),
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """Replaces the index contents with a snapshot written by `save`"""
+        with np.load(path, allow_pickle=False) as snapshot:
+            centroids = snapshot["centroids"]
+            ids = snapshot["ids"].tolist()
+            vectors = snapshot["vectors"]
+            self._list_of = {}
+            if len(centroids):
+                self.centroids = centroids
+                assignments = np.repeat(
+                    np.arange(len(centroids)), snapshot["list_sizes"]
+                )
+                self._fill(ids, vectors, assignments)
+            else:
+                self.centroids = None
+                self._lists = [VectorIndex(self.dim)]
+                self._lists[0].extend(ids, vectors)
+                self._list_of = dict.fromkeys(ids, 0)
+
+
+async def read_embeddings(db) -> tuple[list[str], np.ndarray]:
+    """Ids and vectors of every concept embedded by the current model"""
+    query = {"normalized_embedding": {"$exists": True}, **current_model_filter()}
+    cursor = db.concepts.find(query, {"normalized_embedding": 1}).batch_size(1000)
+    ids, vectors = [], []
+    async for concept in cursor:
+        ids.append(str(concept["_id"]))
+        vectors.append(decode_embedding(concept["normalized_embedding"]))
+    if not ids:
+        return [], np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+
+def snapshot_checkpoint(path: str) -> datetime | None:
+    """
+    The change feed time a snapshot can be caught up from, or None if it
+    can't be trusted: missing, from another embedding model, from before
+    snapshots recorded their sync time, or older than the deletions the
+    feed still remembers (or unreadable).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as snapshot:
+            # Snapshots from before versioning have neither, so count as legacy
+            stored = {
+                name: snapshot[name].item()
+                for name in ("embedding_model", "embedding_version")
+                if name in snapshot.files
+            }
+            if "synced_at" not in snapshot.files or not is_current_model(stored):
+                return None
+            synced_at = datetime.fromisoformat(snapshot["synced_at"].item())
+    except (OSError, ValueError):
+        logger.warning("Unreadable ANN index snapshot %s; rebuilding", path, exc_info=True)
+        return None
+    return synced_at if can_catch_up(synced_at) else None
+
+
+async def sync_ann_index(db, index: IVFFlatIndex):
+    """Applies the concepts written or deleted since the index last synced,
+    by any worker or job"""
+    synced_at, changes = await embedding_changes(db, index.synced_at)
+    for concept_id, _, embedding in changes:
+        if embedding is None:
+            index.remove(concept_id)
+        else:
+            index.upsert(concept_id, embedding)
+    index.synced_at = synced_at
+
+
+async def refresh_ann_index(db, index: IVFFlatIndex, check_seconds: float = ANN_SYNC_SECONDS):
+    """Syncs the index if it wasn't in the last `check_seconds`, so searches
+    see other workers' writes"""
+    if time.monotonic() - index._checked < check_seconds:
+        return
+    # Marked as checked first, so concurrent searches don't sync again
+    index._checked = time.monotonic()
+    await sync_ann_index(db, index)
+
+
+async def build_ann_index(db, index: IVFFlatIndex, path: str = ANN_INDEX_PATH):
+    """
+    Fills the ANN index from its snapshot and catches up from the change
+    feed, or builds it from MongoDB if the snapshot is missing or can't be
+    trusted (see `snapshot_checkpoint`).
+
+    Loading and training run off the event loop. Writes applied to `index`
+    meanwhile are replaced, then replayed from the feed.
+    """
+    fresh = IVFFlatIndex(index.dim, index.n_probe, index.train_threshold)
+    synced_at = snapshot_checkpoint(path)
+    if synced_at is not None:
+        await asyncio.to_thread(fresh.load, path)
+    else:
+        # Taken before reading, so writes landing during the read are replayed
+        synced_at = feed_time()
+        ids, vectors = await read_embeddings(db)
+        await asyncio.to_thread(fresh.build, ids, vectors)
+    index.take_contents(fresh)
+    index.synced_at = synced_at
+    await sync_ann_index(db, index)
+    index._checked = time.monotonic()
+
+
+# Shared index used by the concept routes; it is filled in the background by
+# the app lifespan (see app.main), and is None when the ANN mode is disabled
+ann_index = IVFFlatIndex() if ANN_INDEX_ENABLED else None
+# Outcome of filling it ("disabled", "pending", "ready" or "failed", and the
+# error), reported by GET /ready. Until it is "ready", /similar answers 503.
+ann_index_status = {"state": "pending" if ANN_INDEX_ENABLED else "disabled", "error": None}
+
+
+def ann_index_ready() -> bool:
+    return ann_index_status["state"] == "ready"
+
+
+# Run as a module: python3 -m app.helpers.ann_index [--rebuild]
+if __name__ == "__main__":
+    from app.db.database import db
+
+    parser = argparse.ArgumentParser(description="Build the concept ANN index snapshot")
+    parser.add_argument("--rebuild", action="store_true", help="ignore any existing snapshot")
+    parser.add_argument("--path", default=ANN_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.path):
+        os.remove(args.path)
+    index = IVFFlatIndex()
+    asyncio.run(build_ann_index(db, index, args.path))
+    index.save(args.path)
+    print(f"Saved ANN index of {len(index)} vectors to {args.path}")
@@ -1,25 +1,21 @@
 import warnings
 import sounddevice as sd
-import torch
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+from app.helpers.transcription import transcribe_audio
+from app.helpers.audio_buffer import AudioBuffer
 import numpy as np
-import queue
 import sys
 
 # Suppress warnings related to deprecation
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-MODEL_ID = "jonatasgrosman/wav2vec2-large-xlsr-53-english"
-processor = Wav2Vec2Processor.from_pretrained(MODEL_ID)
-model = Wav2Vec2ForCTC.from_pretrained(MODEL_ID)
-
-q = queue.Queue()
+# Preallocated buffer the input stream callback writes recordings into
+recording: AudioBuffer | None = None
 
 
 def main():
     test_audio_io()
     record_audio()
-    audio = get_all_audio_from_queue().flatten()
+    audio = get_recorded_audio()
     print(audio)
 
     sd.play(audio)
@@ -36,21 +32,15 @@ def test_audio_io():
     print(sd.query_devices())
 
 
-def pad_audio(audio, target_length=16000):
-    """Pads audio that is too short (less than 1s)"""
-    if len(audio) < target_length:
-        padding = target_length - len(audio)
-        audio = np.pad(audio, (0, padding), "constant")
-    return audio
-
-
 def record_audio(fs=16000, chunk_duration=1, max_duration=20):
     """Records audio input continuously up to a max_duration for testing of model transcription"""
+    global recording
     sd.default.samplerate = fs
     sd.default.channels = 1
-    q.queue.clear()
+    # Room for the whole recording, plus the block that may overshoot it
+    recording = AudioBuffer(int((max_duration + chunk_duration) * fs))
 
-    # Continuously add to our queue the new recordings
+    # Continuously add the new recordings to the buffer
     try:
         print("Recording audio... Press Ctrl+C to stop")
         recorded_time = 0
@@ -73,32 +63,16 @@ def audio_callback(indata, frames, time, status):
     """Audio callback function used by sounddevice InputStream"""
     if status:
         print(status, file=sys.stderr)
-    q.put(indata.copy())
-
-
-def get_all_audio_from_queue():
-    """Outputs all audio recorded to queue in a np array for model processing"""
-    all_audio = []
-    while not q.empty():
-        all_audio.append(q.get())  # Returns and removes top elem from queue
-    if all_audio:
-        return np.concatenate(all_audio, axis=0)
-    return np.array([])
-
-
-def transcribe_audio(audio, processor=processor, model=model):
-    """Uses model inference to transcribe an audio recording"""
-    audio = pad_audio(audio)
-    # Preprocessing
-    inputs = processor(audio, sampling_rate=16000, return_tensors="pt", padding=True)
-    # Inference
-    # no_grad turns off gradient descent, which we don't need for inference
-    # (only for training) and speeds up this computation
-    with torch.no_grad():
-        logits = model(inputs.input_values, attention_mask=inputs.attention_mask).logits
-    predicted_ids = torch.argmax(logits, dim=-1)
-    transcription = processor.batch_decode(predicted_ids)
-    return transcription[0]
+    # Straight from the device block into the preallocated buffer, with no
+    # per-block allocation
+    recording.write(indata[:, 0])
+
+
+def get_recorded_audio():
+    """The audio recorded so far, as a view of the recording buffer"""
+    if recording is None:
+        return np.zeros(0, dtype=np.float32)
+    return recording.view(recording.start)
 
 
 if __name__ == "__main__":
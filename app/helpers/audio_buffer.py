@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class AudioBuffer:
+    """
+    Preallocated float32 sample buffer that audio is written into directly.
+
+    With `ring` (the default) it keeps the latest `capacity` samples, for live
+    streams: every sample is stored twice, at its position and `capacity`
+    further, so any range of up to `capacity` recent samples is one contiguous
+    slice and `view` never copies. Without `ring` it is a fixed-size clip
+    buffer, and writing past `capacity` raises BufferError.
+
+    Positions are absolute sample counts since the buffer was created. Views
+    are read-only and only valid until their samples are overwritten, so
+    callers copy anything they keep longer.
+    """
+
+    def __init__(self, capacity: int, ring: bool = True):
+        if capacity <= 0:
+            raise ValueError("The buffer capacity must be positive")
+        self.capacity = capacity
+        self.ring = ring
+        self._data = np.zeros(2 * capacity if ring else capacity, dtype=np.float32)
+        self.written = 0
+
+    @property
+    def start(self) -> int:
+        """Oldest position still in the buffer"""
+        return max(0, self.written - self.capacity)
+
+    def __len__(self) -> int:
+        return self.written - self.start
+
+    def write(self, samples: np.ndarray, scale: float | None = None):
+        """
+        Copies samples in, converting them to float32 on the way (and
+        multiplying them by `scale`, e.g. 1 / 32768 for int16 PCM) without any
+        intermediate array.
+        """
+        n = len(samples)
+        if not self.ring:
+            if self.written + n > self.capacity:
+                raise BufferError(f"Audio longer than {self.capacity} samples")
+            self._copy(samples, self._data[self.written : self.written + n], scale)
+            self.written += n
+            return
+
+        # Only the last `capacity` samples of a large write would survive it
+        skipped = max(0, n - self.capacity)
+        samples = samples[skipped:]
+        position = (self.written + skipped) % self.capacity
+        first = min(len(samples), self.capacity - position)
+        rest = samples[first:]
+        for offset in (0, self.capacity):
+            head = self._data[offset + position : offset + position + first]
+            self._copy(samples[:first], head, scale)
+            # What doesn't fit before the end wraps around to the start
+            self._copy(rest, self._data[offset : offset + len(rest)], scale)
+        self.written += n
+
+    @staticmethod
+    def _copy(source: np.ndarray, destination: np.ndarray, scale: float | None):
+        if scale is None:
+            np.copyto(destination, source, casting="unsafe")
+        else:
+            np.multiply(source, scale, out=destination, casting="unsafe")
+
+    def view(self, start: int, stop: int | None = None) -> np.ndarray:
+        """
+        Zero-copy, read-only view of the samples at positions [start, stop)
+        (up to the latest sample by default).
+
+        Raises:
+            ValueError: If part of the range was overwritten or not written yet.
+        """
+        stop = self.written if stop is None else stop
+        if not self.start <= start <= stop <= self.written:
+            raise ValueError(
+                f"Samples [{start}, {stop}) aren't in the buffer [{self.start}, {self.written})"
+            )
+        offset = start % self.capacity if self.ring else start
+        view = self._data[offset : offset + stop - start]
+        view.flags.writeable = False
+        return view
+
+    def latest(self, n: int) -> np.ndarray:
+        """View of the last `n` samples (fewer if less were written)"""
+        return self.view(max(self.start, self.written - n))
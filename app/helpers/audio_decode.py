@@ -0,0 +1,189 @@
+from app.helpers.audio_buffer import AudioBuffer
+import numpy as np
+import struct
+
+# Every decoder outputs mono float32 audio at the transcription model's rate
+TARGET_RATE = 16000
+
+# Raw PCM sample formats, as numpy dtypes
+PCM_ENCODINGS = {"s16le": np.dtype("<i2"), "f32le": np.dtype("<f4")}
+WAV_CONTENT_TYPES = {"audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave"}
+
+# WAV format tags
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Longest WAV header accepted before the audio data starts
+_MAX_WAV_HEADER_BYTES = 1 << 16
+
+
+def sample_scale(dtype: np.dtype) -> float | None:
+    """Factor mapping integer samples into [-1, 1] (None for floats)"""
+    if dtype.kind in "iu":
+        return 1 / (1 << (8 * dtype.itemsize - 1))
+    return None
+
+
+class LinearResampler:
+    """
+    Resamples a stream chunk by chunk with linear interpolation, carrying the
+    last sample and the fractional position over to the next chunk so chunk
+    boundaries don't show in the output.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int = TARGET_RATE):
+        self.step = source_rate / target_rate
+        self._position = 0.0
+        self._last = None
+
+    def __call__(self, samples: np.ndarray) -> np.ndarray:
+        if self._last is not None:
+            samples = np.concatenate([[self._last], samples])
+        if len(samples) == 0:
+            return samples.astype(np.float32)
+        positions = np.arange(self._position, len(samples) - 1 + 1e-9, self.step)
+        output = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        # Continue from the next output position, relative to the last sample
+        next_position = positions[-1] + self.step if len(positions) else self._position
+        self._position = next_position - (len(samples) - 1)
+        self._last = samples[-1]
+        return output
+
+
+class StreamingAudioDecoder:
+    """
+    Decodes uploaded audio into 16kHz mono float32 samples as its bytes
+    arrive, writing them straight into an AudioBuffer.
+
+    Supports WAV files (PCM 8/16/32-bit, or 32-bit float, any rate and
+    channel count) and raw little-endian PCM (`encoding` s16le or f32le) at
+    16kHz mono. Bytes of a sample split across chunks are carried over, and
+    16kHz mono input is converted into the buffer without intermediate
+    arrays.
+    """
+
+    def __init__(self, wav: bool, encoding: str = "s16le"):
+        if not wav and encoding not in PCM_ENCODINGS:
+            raise ValueError(f"Unknown encoding {encoding}")
+        self.wav = wav
+        self._header = bytearray()
+        self._format = None
+        self._carry = b""
+        self._remaining = None
+        self.channels = 1
+        self.rate = TARGET_RATE
+        self.dtype = None if wav else PCM_ENCODINGS[encoding]
+        self._resample = None
+
+    @classmethod
+    def for_content_type(cls, content_type: str | None, encoding: str = "s16le"):
+        media_type = (content_type or "").split(";")[0].strip().lower()
+        return cls(wav=media_type in WAV_CONTENT_TYPES, encoding=encoding)
+
+    def feed(self, data: bytes, buffer: AudioBuffer):
+        """
+        Decodes the next bytes of the stream into `buffer`.
+
+        Raises:
+            ValueError: If the data isn't a supported WAV file.
+            BufferError: If a clip buffer is full.
+        """
+        if self.dtype is None:
+            self._header += data
+            data = self._parse_wav_header()
+            if data is None:
+                return
+        if self._remaining is not None:
+            data = data[: self._remaining]
+            self._remaining -= len(data)
+
+        frame_bytes = self.dtype.itemsize * self.channels
+        data = self._carry + data if self._carry else data
+        usable = len(data) - len(data) % frame_bytes
+        self._carry = bytes(data[usable:])
+        if not usable:
+            return
+        samples = np.frombuffer(data, dtype=self.dtype, count=usable // self.dtype.itemsize)
+        scale = sample_scale(self.dtype)
+        if self.dtype.kind == "u":
+            # 8-bit WAV is unsigned, centred on 128
+            samples = samples.astype(np.float32) - 128
+
+        if self.channels == 1 and self.rate == TARGET_RATE:
+            buffer.write(samples, scale)
+            return
+        samples = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        if scale is not None:
+            samples *= scale
+        if self.rate != TARGET_RATE:
+            if self._resample is None:
+                self._resample = LinearResampler(self.rate)
+            samples = self._resample(samples)
+        buffer.write(samples)
+
+    def finish(self):
+        """
+        Raises:
+            ValueError: If the stream ended inside the WAV header or a sample.
+        """
+        if self.dtype is None:
+            raise ValueError("Invalid WAV file: no audio data")
+        if self._carry:
+            raise ValueError("Audio isn't a whole number of samples")
+
+    def _parse_wav_header(self) -> bytes | None:
+        """
+        Parses the RIFF chunks before the audio data once enough of the
+        header has arrived. Returns the bytes after the header (None while
+        more header bytes are needed).
+        """
+        header = self._header
+        if len(header) < 12:
+            return None
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError("Invalid WAV file: not a RIFF/WAVE file")
+        offset = 12
+        while True:
+            if len(header) < offset + 8:
+                break
+            chunk_id = bytes(header[offset : offset + 4])
+            (size,) = struct.unpack_from("<I", header, offset + 4)
+            body = offset + 8
+            if chunk_id == b"data":
+                if self._format is None:
+                    raise ValueError("Invalid WAV file: data before fmt chunk")
+                self._set_format()
+                # Streamed WAVs may leave the data size unset
+                self._remaining = None if size in (0, 0xFFFFFFFF) else size
+                data = bytes(header[body:])
+                self._header = bytearray()
+                return data
+            if len(header) < body + size:
+                break
+            if chunk_id == b"fmt ":
+                if size < 16:
+                    raise ValueError("Invalid WAV file: fmt chunk too short")
+                self._format = struct.unpack_from("<HHIIHH", header, body)
+                if self._format[0] == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    # The actual format tag starts the sub-format GUID
+                    (tag,) = struct.unpack_from("<H", header, body + 24)
+                    self._format = (tag,) + self._format[1:]
+            # Chunks are padded to an even size
+            offset = body + size + size % 2
+        if len(header) > _MAX_WAV_HEADER_BYTES:
+            raise ValueError("Invalid WAV file: header too long")
+        return None
+
+    def _set_format(self):
+        tag, channels, rate, _, _, bits = self._format
+        dtypes = {
+            (_WAVE_FORMAT_PCM, 8): np.dtype("u1"),
+            (_WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+            (_WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+            (_WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+        }
+        if (tag, bits) not in dtypes or not channels or not rate:
+            raise ValueError(f"Unsupported WAV format (format {tag}, {bits}-bit)")
+        self.dtype = dtypes[(tag, bits)]
+        self.channels = channels
+        self.rate = rate
@@ -0,0 +1,122 @@
+from app.helpers.vector_index import user_index_registry
+from app.helpers.metrics import timed
+import numpy as np
+import os
+
+# Cosine similarity from which two of a user's concepts count as the same
+# concept worded differently
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.95"))
+# What happens to a new or edited concept that duplicates another one of the
+# user's: "flag" stores which (duplicate_of), "reject" refuses it with a 409,
+# and "off" skips the check
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "flag")
+# Rows of the similarity matrix computed at once when clustering
+_CLUSTER_BLOCK = 1024
+
+
+@timed("concepts.duplicate_check")
+async def find_duplicate(
+    db,
+    user_id: str,
+    embedding,
+    exclude: str | None = None,
+    threshold: float = DUPLICATE_THRESHOLD,
+) -> tuple[str, float] | None:
+    """
+    Finds the user's concept most similar to a normalized embedding, if it is
+    at least `threshold` similar, ignoring the concept `exclude` (the one
+    being edited).
+
+    Searches the user's in-memory vector index: one matrix-vector product over
+    all of their vectors, loaded from MongoDB on first use.
+
+    Returns:
+        tuple: The duplicate's id and similarity, or None.
+    """
+    index = await user_index_registry.get(db, user_id)
+    for concept_id, score in index.search(embedding, 2):
+        if concept_id != exclude:
+            return (concept_id, score) if score >= threshold else None
+    return None
+
+
+@timed("concepts.duplicate_check")
+async def find_batch_duplicates(
+    db,
+    user_id: str,
+    embeddings: np.ndarray,
+    ids: list[str],
+    keep_duplicates: bool = True,
+    threshold: float = DUPLICATE_THRESHOLD,
+) -> list[tuple[str, float] | None]:
+    """
+    `find_duplicate` for a batch of new concepts of one user (a bulk
+    import), with ids assigned but not stored yet: each row is compared with
+    the user's stored concepts in one matrix product, and with the rows
+    before it in the batch.
+
+    With `keep_duplicates` off (the "reject" policy), a row found to be a
+    duplicate won't be stored, so later rows aren't compared with it.
+
+    Returns:
+        list: For each row, its duplicate's id and similarity, or None.
+    """
+    index = await user_index_registry.get(db, user_id)
+    stored_ids, stored = index.arrays()
+    if len(stored_ids):
+        stored_scores = embeddings @ stored.T
+        stored_best = stored_scores.argmax(axis=1)
+    batch_scores = embeddings @ embeddings.T
+
+    kept = np.zeros(len(ids), dtype=bool)
+    duplicates = []
+    for row in range(len(ids)):
+        best = None
+        if len(stored_ids):
+            column = stored_best[row]
+            best = (stored_ids[column], float(stored_scores[row, column]))
+        earlier = np.flatnonzero(kept[:row])
+        if len(earlier):
+            column = earlier[batch_scores[row, earlier].argmax()]
+            if best is None or batch_scores[row, column] > best[1]:
+                best = (ids[column], float(batch_scores[row, column]))
+        duplicate = best if best is not None and best[1] >= threshold else None
+        duplicates.append(duplicate)
+        kept[row] = keep_duplicates or duplicate is None
+    return duplicates
+
+
+def cluster_duplicates(
+    ids: list[str], vectors: np.ndarray, threshold: float = DUPLICATE_THRESHOLD
+) -> list[list[str]]:
+    """
+    Groups near-duplicate vectors: any two at least `threshold` similar end up
+    in the same cluster, as do their own duplicates (single linkage).
+
+    The similarity matrix is computed a block of rows at a time, so memory
+    stays at `_CLUSTER_BLOCK` rows however many vectors there are.
+
+    Returns:
+        list: Clusters of two or more ids, each sorted, so the oldest
+        ObjectId comes first.
+    """
+    parent = list(range(len(ids)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for start in range(0, len(ids), _CLUSTER_BLOCK):
+        scores = vectors[start : start + _CLUSTER_BLOCK] @ vectors.T
+        rows, columns = np.nonzero(scores >= threshold)
+        for row, column in zip(rows + start, columns):
+            # Each pair once, and not a vector with itself
+            if column > row:
+                parent[root(row)] = root(column)
+
+    clusters = {}
+    for i, id in enumerate(ids):
+        clusters.setdefault(root(i), []).append(id)
+    return [sorted(cluster) for cluster in clusters.values() if len(cluster) > 1]
@@ -0,0 +1,335 @@
+from app.helpers.similarity import mean_pooling
+from app.helpers.metrics import timed
+import torch.nn.functional as F
+import numpy as np
+from collections import OrderedDict
+import threading
+import inspect
+import torch
+import copy
+import os
+
+# Which implementation runs the embedding model; see BACKENDS below
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Intra-op threads used for inference (unset keeps the library default)
+EMBEDDING_NUM_THREADS = os.getenv("EMBEDDING_NUM_THREADS")
+# Where the ONNX backend keeps its exported model
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "onnx_models")
+# Most sentences run through the model together; inputs are sorted by token
+# length first so each group is only padded to the longest of similar lengths
+EMBEDDING_BUCKET_SIZE = int(os.getenv("EMBEDDING_BUCKET_SIZE", "16"))
+# A group is also cut early rather than let its share of real (non-pad)
+# tokens drop below this
+MIN_BUCKET_EFFICIENCY = 0.8
+# Number of distinct strings whose token ids are kept (0 disables the cache)
+EMBEDDING_TOKEN_CACHE_SIZE = int(os.getenv("EMBEDDING_TOKEN_CACHE_SIZE", "10000"))
+# Inputs `pad` can build, in the order they are passed to wrapped models.
+# Models only get those their forward() accepts (MPNet and DistilBERT have
+# no token_type_ids).
+MODEL_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def model_input_names(model) -> tuple[str, ...]:
+    """The MODEL_INPUT_NAMES that `model.forward` takes"""
+    parameters = inspect.signature(model.forward).parameters
+    return tuple(name for name in MODEL_INPUT_NAMES if name in parameters)
+
+
+class TokenEmbeddingsModule(torch.nn.Module):
+    """Wraps a HuggingFace model so it takes and returns plain tensors, as
+    needed for tracing and ONNX export. Takes the tensors of `input_names`,
+    positionally."""
+
+    def __init__(self, model, input_names: tuple[str, ...]):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.model(**dict(zip(self.input_names, inputs)), return_dict=False)[0]
+
+
+class EmbeddingBackend:
+    """
+    Reference backend: eager PyTorch fp32.
+
+    Every backend shares tokenization, mean pooling and normalization, and
+    only overrides `token_embeddings`, the forward pass of the model.
+    """
+
+    name = "torch"
+
+    def __init__(self, tokenizer, model):
+        self.tokenizer = tokenizer
+        self.model = model.eval()
+        self.input_names = model_input_names(model)
+        self.bucket_size = EMBEDDING_BUCKET_SIZE
+        self.token_cache_size = EMBEDDING_TOKEN_CACHE_SIZE
+        self._token_cache: OrderedDict[str, list[int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._real_tokens = 0
+        self._total_tokens = 0
+        self._token_cache_hits = 0
+        self._token_cache_misses = 0
+
+    def token_embeddings(self, encoded) -> torch.Tensor:
+        return self.model(**encoded)[0]
+
+    def model_inputs(self, encoded) -> tuple[torch.Tensor, ...]:
+        """The padded tensors in the order TokenEmbeddingsModule takes them"""
+        return tuple(encoded[name] for name in self.input_names)
+
+    def example_inputs(self, sentences: list[str]) -> dict[str, torch.Tensor]:
+        """Padded model inputs for tracing or exporting the model"""
+        return self.pad(self.tokenizer(sentences, truncation=True)["input_ids"])
+
+    @timed("embedding.tokenize")
+    def tokenize(self, inputs: list[str]) -> list[list[int]]:
+        """Token ids of every input (unpadded), reusing those of strings
+        tokenized before"""
+        token_ids = [None] * len(inputs)
+        missing = {}
+        with self._lock:
+            for row, text in enumerate(inputs):
+                ids = self._token_cache.get(text)
+                if ids is None:
+                    missing.setdefault(text, []).append(row)
+                else:
+                    self._token_cache.move_to_end(text)
+                    token_ids[row] = ids
+            self._token_cache_hits += len(inputs) - sum(map(len, missing.values()))
+            self._token_cache_misses += sum(map(len, missing.values()))
+
+        if missing:
+            texts = list(missing)
+            encoded = self.tokenizer(texts, truncation=True)["input_ids"]
+            with self._lock:
+                for text, ids in zip(texts, encoded):
+                    for row in missing[text]:
+                        token_ids[row] = ids
+                    if self.token_cache_size > 0:
+                        self._token_cache[text] = ids
+                while len(self._token_cache) > self.token_cache_size:
+                    self._token_cache.popitem(last=False)
+        return token_ids
+
+    def buckets(self, lengths: list[int]) -> list[list[int]]:
+        """
+        Groups input rows by token length: rows are taken shortest first and
+        a new group starts once the current one has `bucket_size` rows, or
+        when the next (longer) row would make its padding efficiency drop
+        below MIN_BUCKET_EFFICIENCY.
+        """
+        buckets = []
+        bucket, real_tokens = [], 0
+        for row in np.argsort(lengths, kind="stable"):
+            length = lengths[row]
+            if bucket and (
+                len(bucket) >= self.bucket_size
+                or (real_tokens + length) / (length * (len(bucket) + 1))
+                < MIN_BUCKET_EFFICIENCY
+            ):
+                buckets.append(bucket)
+                bucket, real_tokens = [], 0
+            bucket.append(row)
+            real_tokens += length
+        if bucket:
+            buckets.append(bucket)
+        return buckets
+
+    def pad(self, token_ids: list[list[int]]) -> dict[str, torch.Tensor]:
+        """Pads a group of token id lists to its longest one, as model inputs"""
+        length = max(map(len, token_ids))
+        input_ids = torch.full(
+            (len(token_ids), length), self.tokenizer.pad_token_id, dtype=torch.long
+        )
+        attention_mask = torch.zeros((len(token_ids), length), dtype=torch.long)
+        for row, ids in enumerate(token_ids):
+            input_ids[row, : len(ids)] = torch.tensor(ids)
+            attention_mask[row, : len(ids)] = 1
+        encoded = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            # Single sentences are all segment 0
+            encoded["token_type_ids"] = torch.zeros_like(input_ids)
+        return encoded
+
+    def encode(self, inputs: str | list[str]) -> np.ndarray:
+        """
+        Computes normalized sentence embeddings for a single or list of
+        sentences, as a (# sentences x 384) float32 array.
+
+        Inputs are grouped by token length (see `buckets`), each group is
+        padded only to its own longest sentence, and the embeddings are put
+        back in the original order.
+        """
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        embeddings = np.empty((len(inputs), self.model.config.hidden_size), np.float32)
+        if not inputs:
+            return embeddings
+
+        token_ids = self.tokenize(inputs)
+        for rows in self.buckets([len(ids) for ids in token_ids]):
+            encoded = self.pad([token_ids[row] for row in rows])
+            with self._lock:
+                self._real_tokens += int(encoded["attention_mask"].sum())
+                self._total_tokens += encoded["attention_mask"].numel()
+            with timed("embedding.forward"), torch.no_grad():
+                token_embeddings = self.token_embeddings(encoded)
+                pooled = mean_pooling((token_embeddings,), encoded["attention_mask"])
+            embeddings[rows] = F.normalize(pooled, p=2, dim=1).numpy()
+        return embeddings
+
+    def stats(self) -> dict:
+        """Padding efficiency (real tokens / total tokens run through the
+        model) and token cache counters"""
+        with self._lock:
+            lookups = self._token_cache_hits + self._token_cache_misses
+            return {
+                "backend": self.name,
+                "real_tokens": self._real_tokens,
+                "total_tokens": self._total_tokens,
+                "padding_efficiency": (
+                    self._real_tokens / self._total_tokens if self._total_tokens else None
+                ),
+                "token_cache_entries": len(self._token_cache),
+                "token_cache_hits": self._token_cache_hits,
+                "token_cache_misses": self._token_cache_misses,
+                "token_cache_hit_rate": (
+                    self._token_cache_hits / lookups if lookups else None
+                ),
+            }
+
+
+class TorchScriptBackend(EmbeddingBackend):
+    """Model traced and frozen with TorchScript, which fuses ops and skips the
+    Python overhead of the eager modules"""
+
+    name = "torchscript"
+
+    def __init__(self, tokenizer, model):
+        super().__init__(tokenizer, model)
+        example = self.example_inputs(["an example sentence", "another"])
+        with torch.no_grad():
+            traced = torch.jit.trace(
+                TokenEmbeddingsModule(self.model, self.input_names),
+                self.model_inputs(example),
+                check_trace=False,
+            )
+        self.traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+    def token_embeddings(self, encoded) -> torch.Tensor:
+        return self.traced(*self.model_inputs(encoded))
+
+
+class CompiledBackend(EmbeddingBackend):
+    """Model compiled with torch.compile for dynamic batch and sequence sizes.
+    The first calls at new shapes are slow while kernels are generated."""
+
+    name = "compile"
+
+    def __init__(self, tokenizer, model):
+        super().__init__(tokenizer, model)
+        self.compiled = torch.compile(
+            TokenEmbeddingsModule(self.model, self.input_names), dynamic=True
+        )
+
+    def token_embeddings(self, encoded) -> torch.Tensor:
+        return self.compiled(*self.model_inputs(encoded))
+
+
+class QuantizedBackend(EmbeddingBackend):
+    """Linear layers dynamically quantized to int8, which roughly halves CPU
+    inference time for a small loss in precision"""
+
+    name = "quantized"
+
+    def __init__(self, tokenizer, model):
+        # Quantize a copy so the fp32 weights stay usable as the reference
+        quantized = torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(model).eval(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        super().__init__(tokenizer, quantized)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Model exported to ONNX and run with ONNX Runtime.
+
+    The export is written once to EMBEDDING_ONNX_DIR and reused afterwards.
+    Needs the optional `onnxruntime` package (and `onnx` for the export).
+    """
+
+    name = "onnx"
+
+    def __init__(self, tokenizer, model, model_id: str = "model"):
+        super().__init__(tokenizer, model)
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError(
+                "ERROR: EMBEDDING_BACKEND=onnx needs onnxruntime (pip install onnxruntime onnx)"
+            )
+
+        path = os.path.join(EMBEDDING_ONNX_DIR, f"{model_id.replace('/', '__')}.onnx")
+        if not os.path.exists(path):
+            self.export(path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        if EMBEDDING_NUM_THREADS:
+            options.intra_op_num_threads = int(EMBEDDING_NUM_THREADS)
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def export(self, path: str):
+        """Exports the model with dynamic batch and sequence dimensions"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        example = self.example_inputs(["an example sentence"])
+        names = list(self.input_names)
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in names}
+        dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+        # Export to a temporary file first so a crash never leaves a broken model
+        tmp_path = f"{path}.tmp"
+        torch.onnx.export(
+            TokenEmbeddingsModule(self.model, self.input_names),
+            self.model_inputs(example),
+            tmp_path,
+            input_names=names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+        os.replace(tmp_path, path)
+
+    def token_embeddings(self, encoded) -> torch.Tensor:
+        inputs = {
+            input.name: encoded[input.name].numpy() for input in self.session.get_inputs()
+        }
+        return torch.from_numpy(self.session.run(None, inputs)[0])
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (
+        EmbeddingBackend,
+        TorchScriptBackend,
+        CompiledBackend,
+        QuantizedBackend,
+        OnnxBackend,
+    )
+}
+
+
+def create_backend(name: str, tokenizer, model, model_id: str = "model") -> EmbeddingBackend:
+    """Builds the named backend around an already loaded tokenizer and model"""
+    if name not in BACKENDS:
+        raise ValueError(f"ERROR: Unknown embedding backend {name=}, use one of {list(BACKENDS)}")
+    if EMBEDDING_NUM_THREADS:
+        torch.set_num_threads(int(EMBEDDING_NUM_THREADS))
+    if name == OnnxBackend.name:
+        return OnnxBackend(tokenizer, model, model_id)
+    return BACKENDS[name](tokenizer, model)
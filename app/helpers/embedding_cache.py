@@ -0,0 +1,249 @@
+from collections import OrderedDict
+import numpy as np
+import unicodedata
+import threading
+import hashlib
+import logging
+import fcntl
+import os
+
+logger = logging.getLogger(__name__)
+
+# In-memory budget for cached embeddings, in megabytes
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "64"))
+# Directory of the optional on-disk tier; unset keeps the cache memory-only
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+# Number of vectors the on-disk tier holds; changing it needs a new file
+EMBEDDING_CACHE_DISK_CAPACITY = int(os.getenv("EMBEDDING_CACHE_DISK_CAPACITY", "100000"))
+
+# Rough per-entry cost of the key, dict slot and array header on top of the
+# vector itself, used for the memory bound
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes unicode and whitespace so trivially different strings share
+    a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, model_id: str) -> str:
+    """Content address of an embedding: hash of the model ID and normalized
+    input text"""
+    payload = f"{model_id}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    Fixed-capacity on-disk tier: a memory-mapped .npy file of rows, each
+    holding a key's digest and its float32 vector. Any number of processes
+    can share the file.
+
+    A key always goes to the same slot (its digest modulo the capacity), so
+    processes agree on where a vector lives without sharing a write counter.
+    A newer key landing on an occupied slot replaces the older one. A read
+    only returns a row whose stored digest matches the key, and reads and
+    writes take a lock on `<file>.lock`, so no reader sees a half-written
+    row.
+
+    The .npy header records the capacity and the vector dimension. The file
+    is created with the dimension of the first vector written. Opening it
+    with another capacity, or writing vectors of another dimension, raises
+    ValueError instead of misreading the rows.
+    """
+
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        self.capacity = capacity
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock_file = open(f"{path}.lock", "a")
+        self._rows = None
+        self._open()
+
+    def _open(self):
+        """Maps the file if it exists, checking it was made for this capacity"""
+        if self._rows is not None or not os.path.exists(self.path):
+            return
+        rows = np.lib.format.open_memmap(self.path, mode="r+")
+        if rows.dtype.names != ("key", "vector") or len(rows) != self.capacity:
+            raise ValueError(
+                f"ERROR: {self.path} holds {len(rows)} rows of {rows.dtype}, expected "
+                f"{self.capacity} keyed vectors; delete it or restore "
+                "EMBEDDING_CACHE_DISK_CAPACITY"
+            )
+        self._rows = rows
+
+    def _create(self, dim: int):
+        dtype = np.dtype([("key", "u1", (32,)), ("vector", "<f4", (dim,))])
+        np.lib.format.open_memmap(
+            self.path, mode="w+", dtype=dtype, shape=(self.capacity,)
+        ).flush()
+        self._open()
+
+    @property
+    def dim(self) -> int | None:
+        return None if self._rows is None else self._rows.dtype["vector"].shape[0]
+
+    def _slot(self, digest: np.ndarray) -> int:
+        return int.from_bytes(digest[:8].tobytes(), "little") % self.capacity
+
+    def __len__(self) -> int:
+        if self._rows is None:
+            return 0
+        return int(np.count_nonzero(self._rows["key"].any(axis=1)))
+
+    def get(self, key: str) -> np.ndarray | None:
+        digest = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+        fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+        try:
+            # Another process may have created the file since
+            self._open()
+            if self._rows is None:
+                return None
+            slot = self._slot(digest)
+            if not np.array_equal(self._rows["key"][slot], digest):
+                return None
+            # Copy out of the map so the row can be reused safely later
+            return np.array(self._rows["vector"][slot])
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def put_many(self, keys: list[str], embeddings: list[np.ndarray]):
+        if not keys:
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self._open()
+            if self._rows is None:
+                self._create(len(embeddings[0]))
+            for key, embedding in zip(keys, embeddings):
+                if len(embedding) != self.dim:
+                    raise ValueError(
+                        f"ERROR: {self.path} stores {self.dim}-dim vectors, "
+                        f"got {len(embedding)}"
+                    )
+                digest = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                slot = self._slot(digest)
+                self._rows["vector"][slot] = embedding
+                self._rows["key"][slot] = digest
+            self._rows.flush()
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._rows is not None:
+            self._rows.flush()
+            self._rows = None
+        self._lock_file.close()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed LRU cache of normalized embeddings.
+
+    Entries are keyed by `cache_key(text, model_id)` and evicted least recently
+    used first once their total size passes `max_bytes`. With `disk_path` set,
+    every new embedding is also written to a DiskEmbeddingStore (one file per
+    model under `disk_path`), which is checked on memory misses so the cache
+    survives restarts and is shared by the workers. A disk tier that can't be
+    opened is logged and left out.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        max_bytes: int,
+        disk_path: str | None = None,
+        disk_capacity: int = EMBEDDING_CACHE_DISK_CAPACITY,
+    ):
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.disk_capacity = disk_capacity
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._disk = None
+        self._lock = threading.Lock()
+
+    def _disk_store(self) -> DiskEmbeddingStore | None:
+        """Opens the on-disk tier on first use"""
+        if self.disk_path and self._disk is None:
+            safe_model_id = "".join(c if c.isalnum() else "_" for c in self.model_id)
+            path = os.path.join(self.disk_path, f"{safe_model_id}.npy")
+            try:
+                self._disk = DiskEmbeddingStore(path, self.disk_capacity)
+            except (OSError, ValueError):
+                logger.exception("Embedding cache disk tier disabled")
+                self.disk_path = None
+        return self._disk
+
+    def _insert(self, key: str, embedding: np.ndarray):
+        """Adds an entry to the memory tier and evicts down to the budget"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = embedding
+        self._bytes += embedding.nbytes + _ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + _ENTRY_OVERHEAD_BYTES
+
+    def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """Looks up each text, returning its embedding or None on a miss"""
+        results = []
+        with self._lock:
+            for text in texts:
+                key = cache_key(text, self.model_id)
+                embedding = self._entries.get(key)
+                if embedding is not None:
+                    self._entries.move_to_end(key)
+                elif (disk := self._disk_store()) is not None:
+                    embedding = disk.get(key)
+                    if embedding is not None:
+                        self.disk_hits += 1
+                        self._insert(key, embedding)
+                if embedding is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                results.append(embedding)
+        return results
+
+    def put_many(self, texts: list[str], embeddings: np.ndarray):
+        """Stores freshly computed embeddings for the given texts"""
+        with self._lock:
+            keys, rows = [], []
+            for text, embedding in zip(texts, embeddings):
+                key = cache_key(text, self.model_id)
+                embedding = np.array(embedding, dtype=np.float32)
+                self._insert(key, embedding)
+                keys.append(key)
+                rows.append(embedding)
+            if (disk := self._disk_store()) is not None:
+                disk.put_many(keys, rows)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size of the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_id": self.model_id,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 5) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk) if self._disk is not None else 0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
@@ -0,0 +1,210 @@
+from concurrent.futures import Future
+from app.helpers.model_registry import EMBEDDING_MODEL_ID, EMBEDDING_MODEL_VERSION
+from app.helpers.metrics import timed, BATCH_SIZE
+from app.helpers.embedding_cache import (
+    EmbeddingCache,
+    EMBEDDING_CACHE_MAX_MB,
+    EMBEDDING_CACHE_DIR,
+)
+import numpy as np
+import threading
+import logging
+import asyncio
+import queue
+import time
+import os
+
+# Largest number of sentences run through the model in one forward pass, and
+# how long the worker waits for more requests before running a partial batch
+MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+
+logger = logging.getLogger(__name__)
+
+# Sentinel put on the queue to stop the worker thread
+_STOP = object()
+
+
+class EmbeddingEngine:
+    """
+    Micro-batches embedding requests from concurrent callers.
+
+    Each call to `embed` puts its sentences on a queue and awaits a future. A
+    dedicated worker thread drains the queue into padded batches of up to
+    `max_batch_size` sentences, waiting at most `max_wait_ms` for a batch to
+    fill, runs one forward pass per batch and resolves every request's future
+    with its rows of the output. The event loop never runs the model itself.
+
+    With a `cache`, sentences that were embedded before are answered straight
+    from it and only the misses are queued.
+
+    `embed_fn` defaults to calculate_normalized_embeddings, imported by the
+    worker thread on first use so that torch is never imported at app startup.
+    """
+
+    def __init__(
+        self,
+        embed_fn=None,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        cache: EmbeddingCache | None = None,
+    ):
+        self.embed_fn = embed_fn
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker thread if it isn't already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="embedding-engine", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Stops the worker thread once the requests already queued are done"""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(_STOP)
+                self._thread.join()
+                self._thread = None
+
+    def submit(self, inputs: str | list[str]) -> Future:
+        """
+        Queues a single or list of sentences for embedding. The returned future
+        resolves to a (# sentences x 384) float32 array.
+        """
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        if not texts:
+            raise ValueError("ERROR: No sentences to embed")
+        if self.cache is None:
+            return self._enqueue(texts)
+
+        try:
+            cached = self.cache.get_many(texts)
+        except Exception:
+            logger.exception("Unable to read the embedding cache")
+            cached = [None] * len(texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        future = Future()
+        if not missing:
+            future.set_result(np.stack(cached))
+            return future
+
+        def fill_from_model(model_future: Future):
+            """Caches the newly computed rows and merges them with the hits"""
+            if model_future.cancelled():
+                future.cancel()
+                return
+            if model_future.exception() is not None:
+                future.set_exception(model_future.exception())
+                return
+            embeddings = model_future.result()
+            for i, embedding in zip(missing, embeddings):
+                cached[i] = embedding
+            # Resolve first: a cache failure must never hold back a result
+            future.set_result(np.stack(cached))
+            try:
+                self.cache.put_many([texts[i] for i in missing], embeddings)
+            except Exception:
+                logger.exception("Unable to cache %d embeddings", len(missing))
+
+        self._enqueue([texts[i] for i in missing]).add_done_callback(fill_from_model)
+        return future
+
+    def _enqueue(self, texts: list[str]) -> Future:
+        """Puts sentences on the worker queue and returns their future"""
+        self.start()
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for the worker"""
+        return self._queue.qsize()
+
+    async def embed(self, inputs: str | list[str]) -> np.ndarray:
+        """Awaitable version of `submit` for use inside async routes"""
+        return await asyncio.wrap_future(self.submit(inputs))
+
+    def _run(self):
+        """Worker loop: collect a batch of requests, then run it"""
+        stopping = False
+        while not stopping:
+            request = self._queue.get()
+            if request is _STOP:
+                break
+            batch = [request]
+            batch_size = len(request[0])
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+
+            # Keep collecting requests until the batch is full or the wait is up
+            while batch_size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    break
+                batch.append(request)
+                batch_size += len(request[0])
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list[tuple[list[str], Future]]):
+        """Embeds all sentences of a batch and hands each request its rows"""
+        # Skip requests whose callers have already given up
+        batch = [
+            (texts, future)
+            for texts, future in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        BATCH_SIZE.observe(len(texts), engine="embedding")
+        try:
+            if self.embed_fn is None:
+                from app.helpers.similarity import calculate_normalized_embeddings
+
+                self.embed_fn = calculate_normalized_embeddings
+            # A single large request can still exceed max_batch_size
+            with timed("embedding.batch"):
+                embeddings = np.concatenate(
+                    [
+                        np.asarray(
+                            self.embed_fn(texts[i : i + self.max_batch_size]),
+                            dtype=np.float32,
+                        )
+                        for i in range(0, len(texts), self.max_batch_size)
+                    ]
+                )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(embeddings[offset : offset + len(request_texts)])
+            offset += len(request_texts)
+
+
+# Shared cache and engine used by the routes, so repeated sentences skip the
+# model and concurrent requests batch together
+embedding_cache = EmbeddingCache(
+    f"{EMBEDDING_MODEL_ID}@{EMBEDDING_MODEL_VERSION}",
+    max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+    disk_path=EMBEDDING_CACHE_DIR,
+)
+embedding_engine = EmbeddingEngine(cache=embedding_cache)
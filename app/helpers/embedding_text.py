@@ -0,0 +1,12 @@
+import hashlib
+
+
+def concept_embed_string(name: str, usage: str) -> str:
+    """Builds the text a concept's normalized_embedding is computed from"""
+    return f"{name}: {usage}"
+
+
+def embedding_content_hash(embed_string: str) -> str:
+    """Hashes the text behind an embedding. Stored next to the vector so we
+    can tell when it no longer matches the concept's name and usage."""
+    return hashlib.sha256(embed_string.encode("utf-8")).hexdigest()
@@ -0,0 +1,41 @@
+from app.helpers.model_registry import EMBEDDING_MODEL_ID, EMBEDDING_MODEL_VERSION
+
+# Model of the concept embeddings stored before embeddings recorded their
+# model; documents without embedding_model count as its version 1
+LEGACY_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LEGACY_EMBEDDING_VERSION = 1
+
+
+def embedding_version_fields() -> dict:
+    """Fields stored next to an embedding computed by the current model"""
+    return {
+        "embedding_model": EMBEDDING_MODEL_ID,
+        "embedding_version": EMBEDDING_MODEL_VERSION,
+    }
+
+
+def current_model_filter() -> dict:
+    """
+    MongoDB filter matching concepts whose embedding comes from the current
+    model and version. Only those vectors are compared with new ones, so a
+    model switch never mixes vector spaces while `app.db.reembed` runs.
+    """
+    current = embedding_version_fields()
+    if (EMBEDDING_MODEL_ID, EMBEDDING_MODEL_VERSION) == (
+        LEGACY_EMBEDDING_MODEL,
+        LEGACY_EMBEDDING_VERSION,
+    ):
+        return {"$or": [current, {"embedding_model": {"$exists": False}}]}
+    return current
+
+
+def stale_model_filter() -> dict:
+    """MongoDB filter matching concepts embedded by another model or version"""
+    return {"$nor": [current_model_filter()]}
+
+
+def is_current_model(concept: dict) -> bool:
+    """Whether a concept document's embedding comes from the current model"""
+    model = concept.get("embedding_model", LEGACY_EMBEDDING_MODEL)
+    version = concept.get("embedding_version", LEGACY_EMBEDDING_VERSION)
+    return (model, version) == (EMBEDDING_MODEL_ID, EMBEDDING_MODEL_VERSION)
@@ -0,0 +1,57 @@
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+import functools
+import threading
+import asyncio
+import os
+
+# Which pool CPU-heavy helpers run on by default: "thread" or "process".
+# Threads are enough for work that releases the GIL (bcrypt, torch); a process
+# pool isolates pure-Python work at the cost of pickling arguments.
+CPU_EXECUTOR = os.getenv("CPU_EXECUTOR", "thread")
+# Upper bound on the number of workers in each pool
+CPU_EXECUTOR_WORKERS = int(
+    os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+_executors: dict[str, Executor] = {}
+_lock = threading.Lock()
+
+
+def get_executor(kind: str | None = None) -> Executor:
+    """Returns the shared, bounded thread or process pool, creating it lazily"""
+    kind = kind or CPU_EXECUTOR
+    with _lock:
+        if kind not in _executors:
+            if kind == "thread":
+                _executors[kind] = ThreadPoolExecutor(
+                    max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu"
+                )
+            elif kind == "process":
+                _executors[kind] = ProcessPoolExecutor(
+                    max_workers=CPU_EXECUTOR_WORKERS
+                )
+            else:
+                raise ValueError(f"ERROR: Unknown executor kind {kind=}")
+        return _executors[kind]
+
+
+async def run_cpu_bound(fn, *args, kind: str | None = None, **kwargs):
+    """
+    Runs a CPU-heavy helper on the executor pool and awaits its result, so the
+    event loop keeps serving other requests in the meantime.
+
+    With the process pool, `fn` and its arguments must be picklable (a
+    module-level function).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(kind), functools.partial(fn, *args, **kwargs)
+    )
+
+
+def shutdown_executors():
+    """Shuts down every pool that was created, waiting for running work"""
+    with _lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True)
+        _executors.clear()
@@ -0,0 +1,342 @@
+from app.helpers.profiler import (
+    SamplingProfiler,
+    profile_path,
+    PROFILING_ENABLED,
+    PROFILE_HEADER,
+)
+from bisect import bisect_left
+from pymongo import monitoring
+import functools
+import threading
+import inspect
+import time
+import os
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+LATENCY_BUCKETS += (1, 2.5, 5, 10, 30)
+# Upper bounds of the batch size histogram buckets
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _format_labels(labelnames: tuple, values: tuple) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    """
+    Base of the metrics rendered by `MetricsRegistry` in the Prometheus text
+    format. Every update takes the metric's lock, so metrics can be updated
+    from any thread (model workers, executors, the event loop).
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        """(name suffix, formatted labels, value) of every sample"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {value:g}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [("", _format_labels(self.labelnames, key), v) for key, v in values.items()]
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. Set it directly, or pass `read` to compute
+    it on every scrape (e.g. a queue's length), returning either a number or
+    a dict of label values tuple -> number.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), read=None):
+        super().__init__(name, help, labelnames)
+        self.read = read
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.read is not None:
+            values = self.read()
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [("", _format_labels(self.labelnames, key), v) for key, v in values.items()]
+
+
+class CallbackCounter(Gauge):
+    """A counter kept by other code (like the embedding cache's hit count),
+    read on every scrape"""
+
+    type = "counter"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple = (), buckets=LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (+Inf last), sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(state[0]), state[1]) for key, state in self._values.items()}
+        samples = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (bound,))
+                samples.append(("_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Metrics of this process, served by GET /metrics (see app.main)
+metrics_registry = MetricsRegistry()
+
+STAGE_SECONDS = metrics_registry.register(
+    Histogram(
+        "circa_stage_seconds",
+        "Latency of instrumented stages (tokenization, forward passes, bcrypt, ...)",
+        ("stage",),
+    )
+)
+BATCH_SIZE = metrics_registry.register(
+    Histogram(
+        "circa_batch_size",
+        "Items per model batch",
+        ("engine",),
+        buckets=SIZE_BUCKETS,
+    )
+)
+MONGO_COMMAND_SECONDS = metrics_registry.register(
+    Histogram(
+        "circa_mongo_command_seconds",
+        "Latency of MongoDB commands",
+        ("command", "collection", "outcome"),
+    )
+)
+REQUEST_SECONDS = metrics_registry.register(
+    Histogram(
+        "circa_http_request_seconds",
+        "Latency of HTTP requests, until the whole response is sent",
+        ("method", "route", "status"),
+    )
+)
+REQUESTS_IN_PROGRESS = metrics_registry.register(
+    Gauge("circa_http_requests_in_progress", "HTTP requests being handled")
+)
+
+
+class timed:
+    """
+    Records how long a block or function takes in the stage latency
+    histogram, as a context manager or as a decorator (of plain or async
+    functions):
+
+        with timed("embedding.forward"):
+            ...
+
+        @timed("transcription.batch")
+        def transcribe_batch(clips): ...
+
+    Time work handed to a process pool around the submitting call: a
+    decorated function running in a child process records into the child's
+    registry, which /metrics never sees.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self._start, stage=self.stage)
+
+    def __call__(self, function):
+        stage = self.stage
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request, labelled by
+    method, route template and status, and the number of requests in
+    progress.
+
+    With PROFILING_ENABLED, a request sent with an `X-Profile` header is also
+    run under the sampling profiler. The profile is written to PROFILE_DIR,
+    and its file name is returned in the `X-Profile` response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profiler = path = None
+        if PROFILING_ENABLED and any(
+            name == PROFILE_HEADER.encode() for name, _ in scope["headers"]
+        ):
+            path = profile_path(f"{scope['method']} {scope['path']}")
+            profiler = SamplingProfiler()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if path is not None:
+                    header = (PROFILE_HEADER.encode(), os.path.basename(path).encode())
+                    message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_PROGRESS.dec()
+            if profiler is not None:
+                profiler.stop()
+                profiler.save(path)
+            # The router puts the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route, status=status)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    PyMongo command listener recording the latency of every MongoDB command
+    the app sends (find, insert, update, getMore, ...), by collection, so the
+    database round trips of every route are covered without timing each call
+    site.
+    """
+
+    def __init__(self):
+        # request id -> collection of the commands in flight
+        self._collections: dict[int, str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[event.request_id] = target if isinstance(target, str) else ""
+
+    def _observe(self, event, outcome: str):
+        MONGO_COMMAND_SECONDS.observe(
+            event.duration_micros / 1e6,
+            command=event.command_name,
+            collection=self._collections.pop(event.request_id, ""),
+            outcome=outcome,
+        )
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
@@ -0,0 +1,149 @@
+from app.helpers.model_server import MODEL_SERVER_ADDRESS, load_remote_model
+import threading
+import time
+import os
+
+# Hugging Face models used by the app. Stored concept embeddings record the
+# model and version that computed them, so after switching the embedding
+# model (or bumping its version, for a change that alters its vectors, like a
+# new pooling) they are re-embedded by `python3 -m app.db.reembed`
+EMBEDDING_MODEL_ID = os.getenv(
+    "EMBEDDING_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2"
+)
+EMBEDDING_MODEL_VERSION = int(os.getenv("EMBEDDING_MODEL_VERSION", "1"))
+TRANSCRIPTION_MODEL_ID = os.getenv(
+    "TRANSCRIPTION_MODEL_ID", "jonatasgrosman/wav2vec2-large-xlsr-53-english"
+)
+
+# Models loaded in the background as soon as the app starts (comma-separated);
+# any other model is loaded on first use
+PRELOAD_MODELS = [
+    name.strip()
+    for name in os.getenv("PRELOAD_MODELS", "embedding").split(",")
+    if name.strip()
+]
+
+
+def load_embedding_weights():
+    """Tokenizer and model for sentence embeddings"""
+    # Imported here so that importing the app doesn't pay for transformers
+    from transformers import AutoTokenizer, AutoModel
+
+    ### https://huggingface.co/sentence-transformers/all-MiniLM-L6-v2
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_ID)
+    model = AutoModel.from_pretrained(EMBEDDING_MODEL_ID)
+    return tokenizer, model
+
+
+def load_embedding_model():
+    """The sentence embedding model wrapped in the configured inference
+    backend (EMBEDDING_BACKEND, see app.helpers.embedding_backends)"""
+    from app.helpers.embedding_backends import create_backend, EMBEDDING_BACKEND
+
+    tokenizer, model = load_embedding_weights()
+    return create_backend(EMBEDDING_BACKEND, tokenizer, model, EMBEDDING_MODEL_ID)
+
+
+def load_transcription_model():
+    """Processor and model for speech transcription"""
+    from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+
+    processor = Wav2Vec2Processor.from_pretrained(TRANSCRIPTION_MODEL_ID)
+    model = Wav2Vec2ForCTC.from_pretrained(TRANSCRIPTION_MODEL_ID)
+    return processor, model
+
+
+class ModelRegistry:
+    """
+    Loads models on demand instead of at import time.
+
+    `get` loads a model the first time it is needed (blocking only the calling
+    thread, never the event loop when called from a worker), and
+    `load_in_background` warms models up on a separate thread at startup.
+    Each model's state ("not_loaded", "loading", "ready" or "failed") is
+    reported by `states` for the readiness endpoint.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._model_ids = {}
+        self._models = {}
+        self._states = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._locks = {}
+
+    def register(self, name: str, model_id: str, loader):
+        self._loaders[name] = loader
+        self._model_ids[name] = model_id
+        self._states[name] = "not_loaded"
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        """Returns a loaded model, loading it first if needed"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        # Concurrent callers wait for the one load in progress
+        with self._locks[name]:
+            if name not in self._models:
+                self._states[name] = "loading"
+                start = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._states[name] = "failed"
+                    self._errors[name] = str(e)
+                    raise
+                self._load_seconds[name] = round(time.perf_counter() - start, 3)
+                self._states[name] = "ready"
+                self._errors.pop(name, None)
+        return self._models[name]
+
+    def is_ready(self, name: str) -> bool:
+        return self._states.get(name) == "ready"
+
+    def load_in_background(self, names: list[str]) -> threading.Thread:
+        """Loads models one after another on a daemon thread"""
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"ERROR: Failed to load model {name}", str(e))
+
+        thread = threading.Thread(target=load_all, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def states(self) -> dict:
+        """State of every registered model, for the readiness endpoint"""
+        return {
+            name: {
+                "model_id": self._model_ids[name],
+                "state": self._states[name],
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+
+def register_models(registry: ModelRegistry, remote: bool = False):
+    """
+    Registers the app's models, either loaded in this process or, with
+    `remote`, served by the shared model server (app.helpers.model_server)
+    so API workers don't each hold a copy of the weights.
+    """
+    if remote:
+        registry.register("embedding", EMBEDDING_MODEL_ID, load_remote_model)
+        registry.register("transcription", TRANSCRIPTION_MODEL_ID, load_remote_model)
+    else:
+        registry.register("embedding", EMBEDDING_MODEL_ID, load_embedding_model)
+        registry.register("transcription", TRANSCRIPTION_MODEL_ID, load_transcription_model)
+
+
+# Shared registry of every model the app can use
+model_registry = ModelRegistry()
+register_models(model_registry, remote=bool(MODEL_SERVER_ADDRESS))
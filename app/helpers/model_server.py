@@ -0,0 +1,225 @@
+from app.helpers.metrics import timed
+from multiprocessing.connection import Listener, Client
+import numpy as np
+import threading
+import ipaddress
+import argparse
+import queue
+import os
+
+# Address of a shared model server (a Unix socket path, or host:port). When
+# set, API workers send embedding and transcription jobs to it instead of
+# loading their own copy of the models.
+MODEL_SERVER_ADDRESS = os.getenv("MODEL_SERVER_ADDRESS")
+# Shared secret the server and its clients authenticate each other with.
+# There is no default: messages are pickles, so anyone holding the key can
+# run code in the server.
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "").encode()
+# Allow a TCP address on another interface than loopback. Only set this on a
+# private network; prefer a Unix socket.
+MODEL_SERVER_ALLOW_REMOTE = os.getenv("MODEL_SERVER_ALLOW_REMOTE") == "true"
+
+
+def parse_address(
+    address: str, allow_remote: bool = MODEL_SERVER_ALLOW_REMOTE
+) -> str | tuple[str, int]:
+    """
+    "host:port" for TCP, anything else is a Unix socket path. TCP hosts must
+    be loopback unless `allow_remote`.
+
+    Raises:
+        ValueError: If the host isn't loopback and remote hosts aren't allowed.
+    """
+    host, _, port = address.rpartition(":")
+    if not (host and port.isdigit()):
+        return address
+    host = host.strip("[]")
+    if not allow_remote:
+        try:
+            loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(
+                f"ERROR: Model server address {address} isn't loopback; use a Unix "
+                "socket, or set MODEL_SERVER_ALLOW_REMOTE=true on a private network"
+            )
+    return host, int(port)
+
+
+def require_authkey(authkey: bytes) -> bytes:
+    """Refuses to talk to (or run) a model server without a shared secret"""
+    if not authkey:
+        raise ValueError("ERROR: Set MODEL_SERVER_AUTHKEY to use the model server")
+    return authkey
+
+
+class ModelServerError(Exception):
+    """A job failed inside the model server"""
+
+
+class RemoteModel:
+    """
+    Client of the model server, used by API workers in place of a loaded model.
+
+    Connections are opened on demand and reused, one per concurrent caller, so
+    the embedding engine thread and transcription jobs don't wait on each
+    other.
+    """
+
+    def __init__(self, address: str = MODEL_SERVER_ADDRESS, authkey: bytes = MODEL_SERVER_AUTHKEY):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self._idle = queue.SimpleQueue()
+
+    def call(self, op: str, payload=None):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = Client(self.address, authkey=self.authkey)
+        try:
+            with timed(f"model_server.{op}"):
+                connection.send((op, payload))
+                status, result = connection.recv()
+        except BaseException:
+            # Never reuse a connection left in an unknown state
+            connection.close()
+            raise
+        self._idle.put(connection)
+        if status == "error":
+            raise ModelServerError(result)
+        return result
+
+    def encode(self, inputs: str | list[str]) -> np.ndarray:
+        """Same as EmbeddingBackend.encode, run by the server"""
+        return self.call("embed", [inputs] if isinstance(inputs, str) else list(inputs))
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        return self.call("transcribe", np.asarray(audio, dtype=np.float32))
+
+    def transcribe_batch(self, clips: list[np.ndarray]) -> list[str]:
+        return self.call("transcribe_batch", clips)
+
+    def frame_ids(self, audio: np.ndarray) -> np.ndarray:
+        return self.call("frame_ids", np.asarray(audio, dtype=np.float32))
+
+    def decode_ids(self, ids: np.ndarray) -> str:
+        return self.call("decode_ids", ids)
+
+    def stats(self) -> dict:
+        return self.call("stats")
+
+    def states(self) -> dict:
+        """Loading state of the models in the server"""
+        return self.call("states")
+
+
+def load_remote_model() -> RemoteModel:
+    """Registry loader used instead of the local ones when a model server is
+    configured; it checks the server is reachable"""
+    model = RemoteModel()
+    model.states()
+    return model
+
+
+class ModelServer:
+    """
+    Holds the only copy of the models and runs jobs for every API worker.
+
+    Each client connection is served on its own thread. Embedding jobs go
+    through the shared embedding engine, so requests from different workers
+    are batched together and share one cache.
+    """
+
+    def __init__(self, address: str, authkey: bytes = MODEL_SERVER_AUTHKEY):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.listener = None
+        self._stopped = threading.Event()
+
+    def handle(self, op: str, payload):
+        from app.helpers.model_registry import model_registry
+
+        if op == "embed":
+            from app.helpers.embedding_engine import embedding_engine
+
+            return embedding_engine.submit(payload).result()
+        if op == "transcribe":
+            from app.helpers.transcription import transcribe_audio
+
+            return transcribe_audio(payload)
+        if op == "transcribe_batch":
+            from app.helpers.transcription import transcribe_batch
+
+            return transcribe_batch(payload)
+        if op == "frame_ids":
+            from app.helpers.transcription import frame_ids
+
+            return frame_ids(payload)
+        if op == "decode_ids":
+            from app.helpers.transcription import decode_ids
+
+            return decode_ids(payload)
+        if op == "stats":
+            return model_registry.get("embedding").stats()
+        if op == "states":
+            return model_registry.states()
+        raise ValueError(f"Unknown model server operation {op=}")
+
+    def serve_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    op, payload = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.handle(op, payload))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                connection.send(reply)
+
+    def serve_forever(self, preload: list[str] = ()):
+        from app.helpers.model_registry import model_registry, register_models
+
+        # This process holds the models, so load them locally even when
+        # MODEL_SERVER_ADDRESS is set in the shared environment
+        register_models(model_registry, remote=False)
+        model_registry.load_in_background(list(preload))
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        self.listener = Listener(self.address, authkey=self.authkey)
+        while True:
+            try:
+                connection = self.listener.accept()
+            except Exception as e:
+                if self._stopped.is_set():
+                    return
+                # A client that fails authentication or hangs up during the
+                # handshake mustn't stop the server
+                print("ERROR: Model server connection refused", str(e))
+                continue
+            threading.Thread(
+                target=self.serve_connection, args=(connection,), daemon=True
+            ).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+
+
+# Run as a module: python3 -m app.helpers.model_server [--address ...]
+if __name__ == "__main__":
+    from app.helpers.model_registry import PRELOAD_MODELS
+
+    parser = argparse.ArgumentParser(description="Serve the models to API workers")
+    parser.add_argument("--address", default=MODEL_SERVER_ADDRESS or "/tmp/circa-models.sock")
+    parser.add_argument("--preload", default=",".join(PRELOAD_MODELS))
+    args = parser.parse_args()
+
+    print(f"Serving models on {args.address}")
+    ModelServer(args.address).serve_forever(
+        [name for name in args.preload.split(",") if name]
+    )
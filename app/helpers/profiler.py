@@ -0,0 +1,92 @@
+from collections import Counter
+from datetime import datetime
+import threading
+import sys
+import os
+
+# Per-request profiles are only taken when this is set, since sampling costs
+# CPU and every profile writes a file
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED") == "true"
+# Request header that asks for a profile of the request
+PROFILE_HEADER = "x-profile"
+# Folder the profiles are written to, one file per profiled request
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Time between two samples
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+# Innermost frames of threads that are idle rather than working: waits, and
+# PyMongo's monitor threads sleeping between checks
+IDLE_FRAMES = (":wait", ":select", ":poll", ":_worker", "periodic_executor.py:_run")
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread records the Python stack of
+    every other thread every `interval_ms` while it runs, and counts how often
+    each stack was seen.
+
+    It samples the event loop and the worker threads (model engines,
+    executors) alike, so a profile shows where a request's time goes even
+    when it is spent off the event loop; other requests served meanwhile show
+    up too. Threads idling in a wait are left out.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit(os.sep, 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                if stack[0].endswith(IDLE_FRAMES):
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """
+        The profile in the collapsed stack format ("thread;outer;...;inner
+        count" lines), read by flamegraph.pl, speedscope and similar tools
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, path: str):
+        """Writes the collapsed profile to `path`"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+
+
+def profile_path(label: str, directory: str = PROFILE_DIR) -> str:
+    """A new file path in `directory` for a profile described by `label`"""
+    safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+    return os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{safe_label}.folded")
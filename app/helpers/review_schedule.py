@@ -0,0 +1,81 @@
+from datetime import datetime
+
+# Concepts are scheduled for review with SM-2: every review is graded 0-5,
+# reviews graded at least PASSING_QUALITY push the next one further out
+# (1 day, 6 days, then the last interval times the concept's ease, in whole
+# days), and a failed review starts the concept over at 1 day. The grade also
+# nudges the ease, which never drops below MIN_EASE.
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASSING_QUALITY = 3
+FIRST_INTERVAL_DAYS = 1
+SECOND_INTERVAL_DAYS = 6
+# Weight of a new review's score in a concept's progress, which is a moving
+# average of the scores of its reviews
+PROGRESS_WEIGHT = 0.3
+
+_DAY_MS = 24 * 60 * 60 * 1000
+
+
+def review_quality(score: float) -> int:
+    """SM-2 grade (0-5) of a review scored from 0 to 1"""
+    return round(5 * min(1.0, max(0.0, score)))
+
+
+def ease_change(quality: int) -> float:
+    """How much a review of this grade changes a concept's ease"""
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+
+def review_update(score: float, now: datetime | None = None) -> list[dict]:
+    """
+    Update pipeline recording a review scored from 0 to 1: it updates the
+    concept's progress, last_seen, SM-2 state (ease, interval_days,
+    repetitions) and next_due from their current values.
+
+    MongoDB computes the new values from the stored ones within the single
+    update, so concurrent reviews of a concept can't overwrite each other.
+    Concepts never reviewed start from the SM-2 defaults.
+    """
+    now = datetime.now() if now is None else now
+    score = min(1.0, max(0.0, score))
+    quality = review_quality(score)
+    ease = {"$ifNull": ["$ease", DEFAULT_EASE]}
+    repetitions = {"$ifNull": ["$repetitions", 0]}
+
+    if quality >= PASSING_QUALITY:
+        interval = {
+            "$switch": {
+                "branches": [
+                    {"case": {"$lt": [repetitions, 1]}, "then": FIRST_INTERVAL_DAYS},
+                    {"case": {"$eq": [repetitions, 1]}, "then": SECOND_INTERVAL_DAYS},
+                ],
+                # Whole days, rounded up
+                "default": {
+                    "$ceil": {"$multiply": [{"$ifNull": ["$interval_days", 1]}, ease]}
+                },
+            }
+        }
+        repetitions = {"$add": [repetitions, 1]}
+    else:
+        interval, repetitions = FIRST_INTERVAL_DAYS, 0
+
+    return [
+        # One stage reads every old value...
+        {
+            "$set": {
+                "progress": {
+                    "$add": [
+                        {"$multiply": [{"$ifNull": ["$progress", 0]}, 1 - PROGRESS_WEIGHT]},
+                        PROGRESS_WEIGHT * score,
+                    ]
+                },
+                "last_seen": now,
+                "ease": {"$max": [MIN_EASE, {"$add": [ease, ease_change(quality)]}]},
+                "interval_days": interval,
+                "repetitions": repetitions,
+            }
+        },
+        # ...and the next one dates the review from the new interval
+        {"$set": {"next_due": {"$add": [now, {"$multiply": ["$interval_days", _DAY_MS]}]}}},
+    ]
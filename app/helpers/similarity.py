@@ -1,11 +1,10 @@
-from transformers import AutoTokenizer, AutoModel
+from app.helpers.model_registry import model_registry, EMBEDDING_MODEL_ID
 import torch
-import torch.nn.functional as F
 
-### https://huggingface.co/sentence-transformers/all-MiniLM-L6-v2
-# Load tokenizer and model from HuggingFace Hub
-tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
-model = AutoModel.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
+# The tokenizer and model are loaded from HuggingFace Hub on first use (or in
+# the background at app startup) by the model registry, and run by one of the
+# backends in app.helpers.embedding_backends
+MODEL_ID = EMBEDDING_MODEL_ID
 
 
 def main():
@@ -18,23 +17,11 @@ def main():
 
 def calculate_normalized_embeddings(inputs: str | list[str]):
     """Computes and normalizes the sentence embeddings for a single or list of
-    sentences. 
+    sentences, using the configured embedding backend.
     
     Output is a (# sentences x 384) tensor."""
-    # Tokenize sentences
-    encoded_input = tokenizer(
-        inputs, padding=True, truncation=True, return_tensors="pt"
-    )
-
-    # Compute token embeddings
-    with torch.no_grad():
-        model_output = model(**encoded_input)
-
-    # Perform pooling
-    sentence_embeddings = mean_pooling(model_output, encoded_input["attention_mask"])
-
-    # Return normalized embeddings
-    return F.normalize(sentence_embeddings, p=2, dim=1)
+    backend = model_registry.get("embedding")
+    return torch.from_numpy(backend.encode(inputs))
 
 
 def compute_similarity(ref: str, rest: list[str]) -> list[tuple[str, float]]:
@@ -52,16 +39,83 @@ def compute_similarity(ref: str, rest: list[str]) -> list[tuple[str, float]]:
     """
     sentences = [ref] + rest
     sentence_embeddings = calculate_normalized_embeddings(sentences)
-    ref_embedding = sentence_embeddings[0]
-    similarities = []
-    for other_embedding, sentence in zip(sentence_embeddings[1:], rest):
-        # Compute cosine similarity between the sentence embeddings
-        similarity = F.cosine_similarity(
-            ref_embedding.unsqueeze(0), other_embedding.unsqueeze(0)
-        )
-        # Append the sentence and its similarity score to the list
-        similarities.append((sentence, round(similarity.item(), 5)))
-    return similarities
+    return score_similarities(sentence_embeddings[0], sentence_embeddings[1:], rest)
+
+
+def score_similarities(ref_embedding, rest_embeddings, rest: list[str]):
+    """
+    Scores already computed embeddings (tensors or arrays) of the rest
+    sentences against the reference embedding, in the same list-of-tuples
+    format as compute_similarity.
+    """
+    scores = similarity_matrix(ref_embedding, rest_embeddings)[0]
+    # One tolist() for the whole row instead of an .item() call per score
+    return [
+        (sentence, round(score, 5)) for sentence, score in zip(rest, scores.tolist())
+    ]
+
+
+def similarity_matrix(ref_embeddings, candidate_embeddings) -> torch.Tensor:
+    """
+    Cosine similarity of every reference against every candidate embedding.
+
+    Since both sides are already L2-normalized, this is a single matrix
+    product instead of a cosine per pair.
+
+    Args:
+        ref_embeddings: (M x 384) or (384,) tensor/array of references.
+        candidate_embeddings: (N x 384) or (384,) tensor/array of candidates.
+
+    Returns:
+        torch.Tensor: The (M x N) matrix of similarity scores.
+    """
+    refs = torch.as_tensor(ref_embeddings, dtype=torch.float32)
+    candidates = torch.as_tensor(candidate_embeddings, dtype=torch.float32)
+    return torch.atleast_2d(refs) @ torch.atleast_2d(candidates).T
+
+
+def top_k_similarities(
+    ref_embeddings, candidate_embeddings, k: int
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Finds the k most similar candidates for every reference.
+
+    Returns:
+        tuple: (M x k) tensors of scores and candidate indices, best first.
+    """
+    scores = similarity_matrix(ref_embeddings, candidate_embeddings)
+    return torch.topk(scores, k=min(k, scores.size(dim=1)), dim=1)
+
+
+def compute_similarity_matrix(
+    refs: list[str], candidates: list[str], top_k: int | None = None
+) -> list[list[tuple[str, float]]]:
+    """
+    Compute the similarity of many reference sentences against many candidate
+    sentences, embedding all of them in one forward pass.
+
+    Args:
+        refs (list): The sentences to compare against.
+        candidates (list): The sentences to compare with every reference.
+        top_k (int, optional): Only keep the k best candidates per reference,
+        sorted by score.
+
+    Returns:
+        list: For every reference, a list of (candidate, score) tuples.
+    """
+    embeddings = calculate_normalized_embeddings(refs + candidates)
+    ref_embeddings, candidate_embeddings = embeddings[: len(refs)], embeddings[len(refs) :]
+    if top_k is None:
+        scores = similarity_matrix(ref_embeddings, candidate_embeddings).tolist()
+        return [
+            [(sentence, round(score, 5)) for sentence, score in zip(candidates, row)]
+            for row in scores
+        ]
+    scores, indices = top_k_similarities(ref_embeddings, candidate_embeddings, top_k)
+    return [
+        [(candidates[i], round(score, 5)) for score, i in zip(row_scores, row_indices)]
+        for row_scores, row_indices in zip(scores.tolist(), indices.tolist())
+    ]
 
 
 def tensor_to_list(tensor : torch.Tensor) -> list | list[list]:
@@ -0,0 +1,216 @@
+from app.helpers.model_registry import model_registry, TRANSCRIPTION_MODEL_ID
+from app.helpers.model_server import RemoteModel
+from app.helpers.audio_buffer import AudioBuffer
+from app.helpers.metrics import timed
+import numpy as np
+import time
+import os
+
+# The processor and model are loaded on first use by the model registry
+MODEL_ID = TRANSCRIPTION_MODEL_ID
+# The transcription model works on 16kHz mono audio
+SAMPLE_RATE = 16000
+# wav2vec2 outputs one frame per 320 samples (20ms), each computed from a
+# receptive field of 400 samples
+FRAME_SAMPLES = 320
+RECEPTIVE_FIELD_SAMPLES = 400
+
+# Streaming transcription runs the model on windows of this many seconds...
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "3"))
+# ...each overlapping the previous and next window by this much context on
+# either side, whose frames are thrown away when stitching the outputs
+STREAM_CONTEXT_SECONDS = float(os.getenv("STREAM_CONTEXT_SECONDS", "0.5"))
+# Longest audio a streaming session accepts, which bounds its memory
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "300"))
+
+
+def pad_audio(audio, target_length=16000):
+    """Pads audio that is too short (less than 1s)"""
+    if len(audio) < target_length:
+        padding = target_length - len(audio)
+        audio = np.pad(audio, (0, padding), "constant")
+    return audio
+
+
+def transcribe_audio(audio, processor=None, model=None):
+    """Uses model inference to transcribe an audio recording"""
+    if processor is None or model is None:
+        loaded = model_registry.get("transcription")
+        # With a model server, the whole job runs there
+        if isinstance(loaded, RemoteModel):
+            return loaded.transcribe(audio)
+        processor, model = loaded
+    # Imported here so loading the app doesn't import torch
+    import torch
+
+    audio = pad_audio(audio)
+    # Preprocessing
+    inputs = processor(audio, sampling_rate=16000, return_tensors="pt", padding=True)
+    # Inference
+    # no_grad turns off gradient descent, which we don't need for inference
+    # (only for training) and speeds up this computation
+    with torch.no_grad():
+        logits = model(inputs.input_values, attention_mask=inputs.attention_mask).logits
+    predicted_ids = torch.argmax(logits, dim=-1)
+    transcription = processor.batch_decode(predicted_ids)
+    return transcription[0]
+
+
+def frame_count(length: int) -> int:
+    """Number of output frames the model computes for `length` samples"""
+    return max(1, (length - RECEPTIVE_FIELD_SAMPLES) // FRAME_SAMPLES + 1)
+
+
+@timed("transcription.batch")
+def transcribe_batch(clips: list[np.ndarray]) -> list[str]:
+    """
+    Transcribes several clips in one forward pass. Shorter clips are padded
+    to the longest one, with an attention mask so the model ignores the
+    padding, and each transcript is decoded from its clip's own frames only.
+    """
+    loaded = model_registry.get("transcription")
+    if isinstance(loaded, RemoteModel):
+        return loaded.transcribe_batch(clips)
+    import torch
+
+    processor, model = loaded
+    inputs = processor(
+        [pad_audio(clip) for clip in clips],
+        sampling_rate=SAMPLE_RATE,
+        return_tensors="pt",
+        padding=True,
+    )
+    with torch.no_grad():
+        logits = model(inputs.input_values, attention_mask=inputs.attention_mask).logits
+    ids = torch.argmax(logits, dim=-1).numpy()
+    return [
+        processor.decode(clip_ids[: frame_count(max(len(clip), SAMPLE_RATE))])
+        for clip, clip_ids in zip(clips, ids)
+    ]
+
+
+@timed("transcription.window")
+def frame_ids(audio: np.ndarray) -> np.ndarray:
+    """
+    Most likely CTC token of every output frame (about one per 20ms) of an
+    audio window, before repeated tokens and blanks are collapsed.
+    """
+    loaded = model_registry.get("transcription")
+    if isinstance(loaded, RemoteModel):
+        return loaded.frame_ids(audio)
+    import torch
+
+    processor, model = loaded
+    length = len(audio)
+    inputs = processor(
+        pad_audio(audio), sampling_rate=SAMPLE_RATE, return_tensors="pt", padding=True
+    )
+    with torch.no_grad():
+        logits = model(inputs.input_values, attention_mask=inputs.attention_mask).logits
+    ids = torch.argmax(logits, dim=-1)[0].numpy()
+    # Drop the frames of the padding added to audio shorter than 1s
+    return ids[: frame_count(length)]
+
+
+def decode_ids(ids: np.ndarray) -> str:
+    """CTC-decodes stitched frame ids: collapses repeats, drops blanks"""
+    loaded = model_registry.get("transcription")
+    if isinstance(loaded, RemoteModel):
+        return loaded.decode_ids(ids)
+    processor, _ = loaded
+    return processor.decode(ids)
+
+
+class StreamingTranscriber:
+    """
+    Transcribes audio as it arrives, with bounded memory.
+
+    The model runs on overlapping sliding windows of `window` seconds that
+    advance by `window - 2 * context` seconds. Of each window's output frames
+    only the middle part is kept, where the model heard enough audio on both
+    sides; the kept frames of consecutive windows are contiguous, so they are
+    stitched together before CTC decoding, which merges tokens split across
+    windows correctly.
+
+    Audio is written straight into a preallocated ring buffer of one window,
+    and the model reads each window as a zero-copy view of it. Besides that
+    buffer, a session only keeps its frame ids (a few bytes per 20ms).
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = STREAM_WINDOW_SECONDS,
+        context_seconds: float = STREAM_CONTEXT_SECONDS,
+        max_seconds: float = STREAM_MAX_SECONDS,
+    ):
+        if window_seconds <= 2 * context_seconds:
+            raise ValueError("The window must be longer than twice its context")
+        self.window = int(window_seconds * SAMPLE_RATE)
+        self.context = int(context_seconds * SAMPLE_RATE)
+        self.step = self.window - 2 * self.context
+        self.max_samples = int(max_seconds * SAMPLE_RATE)
+        self.audio = AudioBuffer(self.window)
+        # Position of the next window in the stream
+        self.window_start = 0
+        self.ids: list[np.ndarray] = []
+        self.first_window = True
+        self.compute_seconds = 0.0
+        self.text = ""
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.audio.written / SAMPLE_RATE
+
+    def feed(self, chunk: np.ndarray, scale: float | None = None) -> str | None:
+        """
+        Adds 16kHz samples, runs every window they complete, and returns the
+        updated transcript if it changed (None otherwise).
+
+        Samples of any dtype are converted to float32 (times `scale`, e.g.
+        1 / 32768 for int16) as they are copied into the window buffer.
+
+        Raises:
+            ValueError: If the session exceeds its maximum duration.
+        """
+        if self.audio.written + len(chunk) > self.max_samples:
+            raise ValueError(f"Audio longer than {self.max_samples // SAMPLE_RATE}s")
+        while len(chunk):
+            # Never write past the current window, which isn't processed yet
+            room = self.window_start + self.window - self.audio.written
+            self.audio.write(chunk[:room], scale)
+            chunk = chunk[room:]
+            if self.audio.written - self.window_start == self.window:
+                self._run_window(final=False)
+        return self._update_text()
+
+    def finish(self) -> str:
+        """Runs the audio left in the buffer and returns the full transcript"""
+        # Otherwise all that is left is audio whose frames were already kept
+        pending = self.audio.written - self.window_start
+        if pending > (0 if self.first_window else self.context):
+            self._run_window(final=True)
+        self._update_text()
+        return self.text
+
+    def _run_window(self, final: bool):
+        start = time.perf_counter()
+        ids = frame_ids(self.audio.view(self.window_start))
+        self.compute_seconds += time.perf_counter() - start
+
+        keep_from = 0 if self.first_window else round(self.context / FRAME_SAMPLES)
+        keep_to = len(ids) if final else round((self.window - self.context) / FRAME_SAMPLES)
+        self.ids.append(ids[keep_from:keep_to])
+        self.first_window = False
+        # The next window overlaps this one by twice the context
+        self.window_start += self.step
+
+    def _update_text(self) -> str | None:
+        if not self.ids:
+            return None
+        start = time.perf_counter()
+        text = decode_ids(np.concatenate(self.ids))
+        self.compute_seconds += time.perf_counter() - start
+        if text == self.text:
+            return None
+        self.text = text
+        return text
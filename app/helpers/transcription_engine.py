@@ -0,0 +1,215 @@
+from concurrent.futures import Future
+from app.helpers.transcription import SAMPLE_RATE
+from app.helpers.metrics import STAGE_SECONDS, BATCH_SIZE
+import numpy as np
+import threading
+import asyncio
+import math
+import time
+import os
+
+# Most clips, and most seconds of padded audio, run through the model at once
+MAX_BATCH_SIZE = int(os.getenv("TRANSCRIPTION_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_SECONDS = float(os.getenv("TRANSCRIPTION_MAX_BATCH_SECONDS", "120"))
+# How long a worker waits for more clips before running a partial batch
+MAX_WAIT_MS = float(os.getenv("TRANSCRIPTION_MAX_WAIT_MS", "20"))
+# Worker threads running batches; each batch already uses every core through
+# torch, so more than one mostly helps when batches are small
+WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+# Most clips waiting for a worker before new ones are turned away
+MAX_QUEUE_DEPTH = int(os.getenv("TRANSCRIPTION_MAX_QUEUE_DEPTH", "32"))
+# Longest clip accepted by the batch endpoint
+MAX_CLIP_SECONDS = float(os.getenv("TRANSCRIPTION_MAX_CLIP_SECONDS", "60"))
+# Longest clip over shortest clip allowed in one batch, to limit padding
+MAX_LENGTH_RATIO = 1.5
+
+
+class QueueFullError(Exception):
+    """The transcription queue is at MAX_QUEUE_DEPTH"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Transcription queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TranscriptionRequest:
+    def __init__(self, audio: np.ndarray):
+        self.audio = audio
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.queue_seconds = None
+        self.batch_size = None
+
+
+class TranscriptionScheduler:
+    """
+    Batches transcription jobs from concurrent requests.
+
+    Clips wait in a bounded queue. A pool of worker threads each take the
+    oldest waiting clip plus the waiting clips closest to it in length (at
+    most MAX_LENGTH_RATIO longer or shorter), so little of a batch is padding,
+    and transcribe them in one forward pass with an attention mask over the
+    padding. A worker waits up to `max_wait_ms` for a batch to fill.
+
+    `submit` raises QueueFullError once `max_queue_depth` clips are waiting;
+    it carries a Retry-After estimate from the recent processing speed.
+
+    `transcribe_fn` defaults to transcribe_batch, imported by the workers on
+    first use so torch isn't imported at app startup.
+    """
+
+    def __init__(
+        self,
+        transcribe_fn=None,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_batch_seconds: float = MAX_BATCH_SECONDS,
+        max_wait_ms: float = MAX_WAIT_MS,
+        workers: int = WORKERS,
+        max_queue_depth: int = MAX_QUEUE_DEPTH,
+    ):
+        self.transcribe_fn = transcribe_fn
+        self.max_batch_size = max_batch_size
+        self.max_batch_samples = int(max_batch_seconds * SAMPLE_RATE)
+        self.max_wait_ms = max_wait_ms
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self._pending: list[TranscriptionRequest] = []
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+        # Moving average of worker seconds spent per clip, for Retry-After
+        self._seconds_per_clip = 1.0
+
+    def start(self):
+        """Starts the worker threads if they aren't already running"""
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            for number in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"transcription-{number}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        """Stops the workers once the clips already queued are done"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        return max(1, math.ceil(self.queue_depth * self._seconds_per_clip / self.workers))
+
+    def submit(self, audio: np.ndarray) -> TranscriptionRequest:
+        """
+        Queues a 16kHz float32 clip. The request's future resolves to its
+        transcript.
+
+        Raises:
+            QueueFullError: If `max_queue_depth` clips are already waiting.
+        """
+        self.start()
+        request = TranscriptionRequest(np.asarray(audio, dtype=np.float32))
+        with self._condition:
+            if len(self._pending) >= self.max_queue_depth:
+                raise QueueFullError(self.retry_after())
+            self._pending.append(request)
+            self._condition.notify()
+        return request
+
+    async def transcribe(self, audio: np.ndarray) -> TranscriptionRequest:
+        """Awaitable version of `submit`; returns the completed request"""
+        request = self.submit(audio)
+        await asyncio.wrap_future(request.future)
+        return request
+
+    def _take_batch(self) -> list[TranscriptionRequest]:
+        """Removes the oldest clip and the clips closest to it in length from
+        the queue (called with the condition held)"""
+        oldest = self._pending[0]
+        length = len(oldest.audio)
+        candidates = sorted(
+            (
+                request
+                for request in self._pending[1:]
+                if max(len(request.audio), length)
+                <= MAX_LENGTH_RATIO * max(1, min(len(request.audio), length))
+            ),
+            key=lambda request: abs(len(request.audio) - length),
+        )
+        batch = [oldest]
+        longest = length
+        for request in candidates:
+            if len(batch) >= self.max_batch_size:
+                break
+            padded = max(longest, len(request.audio)) * (len(batch) + 1)
+            if padded > self.max_batch_samples:
+                continue
+            batch.append(request)
+            longest = max(longest, len(request.audio))
+        taken = set(map(id, batch))
+        self._pending = [request for request in self._pending if id(request) not in taken]
+        return batch
+
+    def _run(self):
+        """Worker loop: wait for clips, collect a batch, then run it"""
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # Give concurrent requests a moment to join the batch
+                deadline = self._pending[0].queued_at + self.max_wait_ms / 1000
+                while len(self._pending) < self.max_batch_size and not self._stopping:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0 or not self._condition.wait(timeout):
+                        break
+                if not self._pending:
+                    continue
+                batch = self._take_batch()
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list[TranscriptionRequest]):
+        """Transcribes a batch of clips and resolves each request's future"""
+        now = time.monotonic()
+        # Skip requests whose callers have already given up
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        for request in batch:
+            request.queue_seconds = now - request.queued_at
+            request.batch_size = len(batch)
+            STAGE_SECONDS.observe(request.queue_seconds, stage="transcription.queue")
+        BATCH_SIZE.observe(len(batch), engine="transcription")
+
+        start = time.perf_counter()
+        try:
+            if self.transcribe_fn is None:
+                from app.helpers.transcription import transcribe_batch
+
+                self.transcribe_fn = transcribe_batch
+            texts = self.transcribe_fn([request.audio for request in batch])
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        self._seconds_per_clip = 0.8 * self._seconds_per_clip + 0.2 * elapsed / len(batch)
+
+        for request, text in zip(batch, texts):
+            request.future.set_result(text)
+
+
+# Shared scheduler used by POST /transcribe
+transcription_scheduler = TranscriptionScheduler()
@@ -0,0 +1,202 @@
+from app.db.embedding_codec import decode_embedding
+from app.helpers.embedding_version import current_model_filter
+from app.db.embedding_changes import embedding_changes, feed_time, can_catch_up
+from app.helpers.metrics import timed
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import asyncio
+import time
+import os
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+# How many users' indexes are kept in memory before the least recently used
+# one is dropped (it is reloaded from MongoDB on its next search)
+VECTOR_INDEX_MAX_USERS = int(os.getenv("VECTOR_INDEX_MAX_USERS", "1000"))
+# Longest a loaded index is served without checking whether another worker
+# (or a job such as app.db.reembed) changed the user's concepts
+VECTOR_INDEX_CHECK_SECONDS = float(os.getenv("VECTOR_INDEX_CHECK_SECONDS", "1"))
+
+
+class VectorIndex:
+    """
+    Exact, in-memory vector index over a contiguous float32 matrix.
+
+    Rows are kept packed at the top of a preallocated matrix that doubles in
+    size as needed, so a search is one matrix-vector product over
+    `vectors[:len(self)]`. Removing a row moves the last row into its place.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 64):
+        self.dim = dim
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    def upsert(self, id: str, embedding):
+        """Adds a vector, or replaces it if the id is already indexed"""
+        row = self._rows.get(id)
+        if row is None:
+            row = len(self._ids)
+            if row == len(self._vectors):
+                grown = np.empty((2 * len(self._vectors), self.dim), dtype=np.float32)
+                grown[:row] = self._vectors[:row]
+                self._vectors = grown
+            self._ids.append(id)
+            self._rows[id] = row
+        self._vectors[row] = embedding
+
+    def extend(self, ids: list[str], embeddings: np.ndarray):
+        """Adds many new vectors at once, e.g. when bulk loading an index"""
+        start = len(self._ids)
+        needed = start + len(ids)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:start] = self._vectors[:start]
+            self._vectors = grown
+        self._vectors[start:needed] = embeddings
+        self._ids.extend(ids)
+        self._rows.update((id, start + i) for i, id in enumerate(ids))
+
+    def arrays(self) -> tuple[list[str], np.ndarray]:
+        """The indexed ids and a view of their packed vectors"""
+        return self._ids, self._vectors[: len(self._ids)]
+
+    def remove(self, id: str):
+        """Removes a vector if present, filling its row with the last one"""
+        row = self._rows.pop(id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        last_id = self._ids.pop()
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._ids[row] = last_id
+            self._rows[last_id] = row
+
+    @timed("vector_index.search")
+    def search(self, query, k: int) -> list[tuple[str, float]]:
+        """
+        Finds the k indexed vectors most similar to a normalized query vector.
+
+        Returns:
+            list: (id, score) tuples, best first.
+        """
+        return self.top_k(query, k)
+
+    def top_k(self, query, k: int) -> list[tuple[str, float]]:
+        """`search` without recording its latency, for indexes built out of
+        several VectorIndexes that time their whole search themselves"""
+        n = len(self._ids)
+        if n == 0 or k <= 0:
+            return []
+        scores = self._vectors[:n] @ np.asarray(query, dtype=np.float32)
+        k = min(k, n)
+        # argpartition finds the top k in linear time; only those get sorted
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[i], float(scores[i])) for i in top]
+
+
+class UserIndexRegistry:
+    """
+    Per-user VectorIndexes over concept embeddings, loaded lazily from MongoDB
+    on a user's first search and kept up to date by the concept routes.
+
+    Every API worker holds its own registry. Writes made through this worker
+    are applied in place with `upsert` and `remove`. Writes made elsewhere
+    (other workers, the re-embed and backfill jobs) are read from the change
+    feed of app.db.embedding_changes: at most every `check_seconds`, a loaded
+    index applies the changes to its user's concepts since it last synced,
+    so it is never reloaded as a whole unless it fell too far behind.
+    """
+
+    def __init__(
+        self,
+        max_users: int = VECTOR_INDEX_MAX_USERS,
+        check_seconds: float = VECTOR_INDEX_CHECK_SECONDS,
+    ):
+        self.max_users = max_users
+        self.check_seconds = check_seconds
+        self._indexes: OrderedDict[str, VectorIndex] = OrderedDict()
+        # user id -> (change feed time the index is synced to, time last checked)
+        self._synced: dict[str, tuple[datetime, float]] = {}
+        self._loading: dict[str, asyncio.Lock] = {}
+
+    async def get(self, db, user_id: str) -> VectorIndex:
+        """Returns a user's index, loading it from the concepts collection if
+        it isn't in memory yet, or catching it up with other writers' changes"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            synced_at, checked = self._synced[user_id]
+            if time.monotonic() - checked < self.check_seconds:
+                return index
+            if can_catch_up(synced_at):
+                await self._sync(db, user_id, index, synced_at)
+                return index
+
+        # Concurrent loads for the same user share a single one
+        lock = self._loading.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            if self._indexes.get(user_id) is index:
+                # Changes written during the load are picked up by the next sync
+                synced_at = feed_time()
+                index = await self._load(db, user_id)
+                self._indexes[user_id] = index
+                self._synced[user_id] = (synced_at, time.monotonic())
+                while len(self._indexes) > self.max_users:
+                    evicted, _ = self._indexes.popitem(last=False)
+                    self._synced.pop(evicted, None)
+            index = self._indexes[user_id]
+        self._loading.pop(user_id, None)
+        return index
+
+    async def _sync(self, db, user_id: str, index: VectorIndex, since: datetime):
+        # Marked as checked first, so concurrent requests don't sync again
+        self._synced[user_id] = (since, time.monotonic())
+        synced_at, changes = await embedding_changes(db, since, user_id)
+        for concept_id, _, embedding in changes:
+            if embedding is None:
+                index.remove(concept_id)
+            else:
+                index.upsert(concept_id, embedding)
+        if self._indexes.get(user_id) is index:
+            self._synced[user_id] = (synced_at, time.monotonic())
+
+    async def _load(self, db, user_id: str) -> VectorIndex:
+        cursor = db.concepts.find(
+            {
+                "user_id": user_id,
+                "normalized_embedding": {"$exists": True},
+                **current_model_filter(),
+            },
+            {"normalized_embedding": 1},
+        )
+        index = VectorIndex()
+        async for concept in cursor:
+            index.upsert(str(concept["_id"]), decode_embedding(concept["normalized_embedding"]))
+        return index
+
+    def upsert(self, user_id: str, concept_id: str, embedding):
+        """Applies an inserted or re-embedded concept to a loaded index"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.upsert(concept_id, embedding)
+
+    def remove(self, user_id: str, concept_id: str):
+        """Drops a deleted concept from a loaded index"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.remove(concept_id)
+
+
+# Shared registry used by the concept routes
+user_index_registry = UserIndexRegistry()
@@ -1,10 +1,80 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.helpers.similarity import compute_similarity
-from app.routes import concepts, users
-from app.db.database import PRODUCTION
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.helpers.model_registry import model_registry, PRELOAD_MODELS
+from app.helpers.embedding_engine import embedding_engine, embedding_cache
+from app.helpers.transcription_engine import transcription_scheduler
+from app.helpers.executors import shutdown_executors
+from app.helpers.ann_index import (
+    ann_index,
+    ann_index_status,
+    build_ann_index,
+    ANN_INDEX_PATH,
+)
+from app.helpers.metrics import (
+    metrics_registry,
+    RequestMetricsMiddleware,
+    Gauge,
+    CallbackCounter,
+)
+from app.routes import concepts, users, transcription
+from app.db.database import PRODUCTION, db
+from app.db.indexes import ensure_indexes, index_status
+import logging
+import asyncio
+
+
+logger = logging.getLogger(__name__)
+
+
+async def bootstrap_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        # Serve anyway, but not as ready (see /ready); python3 -m app.db.indexes
+        # reports what is missing
+        logger.exception("Unable to create MongoDB indexes")
+        index_status.update(state="failed", error=f"{type(e).__name__}: {e}")
+    else:
+        index_status.update(state="ready", error=None)
+
+
+async def bootstrap_ann_index():
+    try:
+        await build_ann_index(db, ann_index, ANN_INDEX_PATH)
+    except Exception as e:
+        # /similar keeps answering 503; the other routes don't need the index
+        logger.exception("Unable to fill the ANN index")
+        ann_index_status.update(state="failed", error=f"{type(e).__name__}: {e}")
+    else:
+        ann_index_status.update(state="ready", error=None)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models on a background thread so the app answers requests that
+    # don't need them (users, listings, ...) right away
+    model_registry.load_in_background(PRELOAD_MODELS)
+    # Index creation waits on MongoDB, so don't hold up startup for it either
+    index_task = asyncio.create_task(bootstrap_indexes())
+    # Restoring the ANN index snapshot (or building it from MongoDB) can take
+    # a while, and only /similar needs it
+    ann_task = asyncio.create_task(bootstrap_ann_index()) if ann_index is not None else None
+    yield
+    index_task.cancel()
+    if ann_task is not None:
+        ann_task.cancel()
+    if ann_index_status["state"] == "ready":
+        ann_index.save(ANN_INDEX_PATH)
+    # Release the model worker threads and CPU pools on shutdown
+    embedding_engine.stop()
+    transcription_scheduler.stop()
+    embedding_cache.close()
+    shutdown_executors()
+
+
+app = FastAPI(lifespan=lifespan)
 
 if PRODUCTION:
     origins = ["circalearn.net"]  # domain-to-be
@@ -18,10 +88,57 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+
+def queue_depths() -> dict:
+    return {
+        ("embedding",): embedding_engine.queue_depth,
+        ("transcription",): transcription_scheduler.queue_depth,
+    }
+
+
+def embedding_cache_lookups() -> dict:
+    stats = embedding_cache.stats()
+    return {
+        ("memory_hit",): stats["hits"] - stats["disk_hits"],
+        ("disk_hit",): stats["disk_hits"],
+        ("miss",): stats["misses"],
+    }
+
+
+def embedding_padding_tokens() -> dict:
+    if not model_registry.is_ready("embedding"):
+        return {}
+    stats = model_registry.get("embedding").stats()
+    real = stats.get("real_tokens", 0)
+    return {("real",): real, ("padding",): stats.get("total_tokens", 0) - real}
+
+
+metrics_registry.register(
+    Gauge("circa_queue_depth", "Jobs waiting for a model", ("engine",), read=queue_depths)
+)
+metrics_registry.register(
+    CallbackCounter(
+        "circa_embedding_cache_lookups_total",
+        "Embedding cache lookups by result",
+        ("result",),
+        read=embedding_cache_lookups,
+    )
+)
+metrics_registry.register(
+    CallbackCounter(
+        "circa_embedding_tokens_total",
+        "Tokens run through the embedding model, real or padding",
+        ("kind",),
+        read=embedding_padding_tokens,
+    )
+)
 
 # Include API Routes
 app.include_router(concepts.router, prefix="/api/v1", tags=['concepts'])
 app.include_router(users.router, prefix="/api/v1", tags=["users"])
+app.include_router(transcription.router, prefix="/api/v1", tags=["transcription"])
 
 
 @app.get("/")
@@ -31,14 +148,62 @@ def root():
 
 # Route to quickly compare two sentences
 @app.get("/compare/{ref}/{other}")
-def compare(ref: str, other: str):
+async def compare(ref: str, other: str):
     # Turn dashes "-" into spaces " "
     ref = " ".join(ref.split("-"))
     other = " ".join(other.split("-"))
-    similarity = compute_similarity(ref, [other])
+    # Embed through the shared engine so concurrent comparisons batch together
+    embeddings = await embedding_engine.embed([ref, other])
+    # Embeddings are normalized, so their dot product is the cosine similarity
+    similarity = [(other, round(float(embeddings[1] @ embeddings[0]), 5))]
     return {"similarity": similarity}
 
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: reports the loading state of every model, of the
+    MongoDB indexes and of the ANN index, and responds 503 until the
+    preloaded models are ready and the indexes exist (or when creating them
+    failed). The ANN index only holds up /similar, so it doesn't count.
+    """
+    is_ready = all(model_registry.is_ready(name) for name in PRELOAD_MODELS)
+    is_ready = is_ready and index_status["state"] == "ready"
+    return JSONResponse(
+        content={
+            "ready": is_ready,
+            "models": model_registry.states(),
+            "indexes": index_status,
+            "ann_index": ann_index_status,
+        },
+        status_code=200 if is_ready else 503,
+    )
+
+
+@app.get("/embedding-cache")
+def embedding_cache_stats():
+    """Hit/miss counters and size of the shared embedding cache"""
+    return embedding_cache.stats()
+
+
+@app.get("/embedding-stats")
+def embedding_stats():
+    """Padding efficiency and token cache counters of the embedding model
+    (empty until the model is loaded)"""
+    if not model_registry.is_ready("embedding"):
+        return {}
+    return model_registry.get("embedding").stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Latency histograms, batch sizes, queue depths and cache counters of
+    this process, in the Prometheus text format"""
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
 # For fast local development
 # Use `uvicorn app.main:app --reload` to start
 # For production, we will need to use Uvicorn
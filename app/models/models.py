@@ -1,14 +1,17 @@
-from pydantic import BaseModel, Field, computed_field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict
 from pydantic.functional_validators import BeforeValidator
-from app.helpers.similarity import calculate_normalized_embeddings, tensor_to_list
 from datetime import datetime
-from typing import Optional, Annotated, List
+from typing import Optional, Annotated, List, Any, Dict
 from bson import ObjectId
+from app.db.embedding_codec import embedding_to_list
 
 
 # Custom type for ObjectId, represented as a string in the model for JSON
 # serialization
 PyObjectId = Annotated[str, BeforeValidator(str)]
+# Embeddings are stored packed as BSON Binary (see app.db.embedding_codec) and
+# only turned into a list of floats when a response includes them
+Embedding = Annotated[List[float], BeforeValidator(embedding_to_list)]
 
 class ConceptModel(BaseModel):
     """
@@ -24,12 +27,29 @@ class ConceptModel(BaseModel):
     date_created: Annotated[datetime, Field(default_factory=datetime.now)]
     last_seen: Optional[datetime] = None
     progress: Annotated[float, Field(default=0, ge=0, le=1)]
-
-    @computed_field
-    def normalized_embedding(self) -> List[float]:
-        # Compute the normalized embedding based on name and usage
-        embed_string = f"{self.name}: {self.usage}"
-        return tensor_to_list(calculate_normalized_embeddings(embed_string))
+    # Spaced-repetition schedule (see app.helpers.review_schedule), updated by
+    # every review; new concepts are due right away
+    next_due: Annotated[datetime, Field(default_factory=datetime.now)]
+    ease: float = 2.5
+    interval_days: float = 0
+    repetitions: int = 0
+    # Stored embedding of "{name}: {usage}", computed once on create/update in
+    # the concept routes rather than on every serialization
+    normalized_embedding: Optional[Embedding] = None
+    # Hash of the embedded text, so a stale or missing vector can be detected
+    # (see app.db.backfill)
+    embedding_hash: Optional[str] = None
+    # Embedding model and version that computed normalized_embedding; vectors
+    # are only compared with vectors of the same model and version
+    embedding_model: Optional[str] = None
+    embedding_version: Optional[int] = None
+    # When normalized_embedding was last written (UTC), which is how other
+    # API workers find it in the change feed (see app.db.embedding_changes)
+    embedded_at: Optional[datetime] = None
+    # Set when the concept's embedding is at least DUPLICATE_THRESHOLD similar
+    # to another concept of the user's (see app.helpers.duplicates)
+    duplicate_of: Optional[PyObjectId] = None
+    duplicate_score: Optional[float] = None
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -48,6 +68,33 @@ class ConceptModel(BaseModel):
     )
 
 
+class CreateConceptModel(BaseModel):
+    """
+    Model for a new concept, as sent by a client.
+
+    Only the concept's own content is accepted; the review schedule, the
+    embedding and its metadata, and duplicate flags are set by the server
+    (other fields are ignored).
+    """
+    user_id: PyObjectId
+    name: str  # Required field
+    usage: str  # Required field
+    date_created: Annotated[datetime, Field(default_factory=datetime.now)]
+    last_seen: Optional[datetime] = None
+    progress: Annotated[float, Field(default=0, ge=0, le=1)]
+
+    model_config = ConfigDict(
+        str_strip_whitespace=True,
+        json_schema_extra={
+            "example": {
+                "user_id": "60b8d6e1e1b8f30d6c8e6f59",
+                "name": "Example Concept",
+                "usage": "This is how you use it",
+            }
+        },
+    )
+
+
 class UpdateConceptModel(BaseModel):
     """
     Model for possible updates to an existing concept.
@@ -59,6 +106,66 @@ class UpdateConceptModel(BaseModel):
     last_seen: Optional[datetime] = None
 
 
+class ConceptSearchResult(BaseModel):
+    """
+    A concept matched by semantic search, with its similarity to the query
+    """
+    concept: ConceptModel
+    score: float
+
+
+class AnswerResult(BaseModel):
+    """
+    Grade of a spoken answer to a concept: what was heard, its similarity to
+    the concept, and the concept's updated progress and next review
+    """
+    concept_id: str
+    transcript: str
+    score: float
+    progress: float
+    last_seen: datetime
+    next_due: datetime
+
+
+class ReviewModel(BaseModel):
+    """
+    A review of a concept, scored from 0 (forgotten) to 1 (perfect recall)
+    """
+    score: Annotated[float, Field(ge=0, le=1)]
+
+
+class BulkItemResult(BaseModel):
+    """
+    Outcome of one item of a bulk import. `status` is one of "created",
+    "invalid", "duplicate" (rejected by DUPLICATE_POLICY=reject), "failed" or
+    "skipped" (not attempted after an earlier error in an ordered import).
+    """
+    index: int
+    status: str
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkImportResult(BaseModel):
+    """
+    Summary and per-item results of a bulk import: `failed` counts the
+    invalid, duplicate and failed items, `skipped` those never attempted
+    """
+    created: int
+    failed: int
+    skipped: int
+    results: List[BulkItemResult]
+
+
+class Page(BaseModel):
+    """
+    One page of a list endpoint. Items only contain the requested fields, and
+    `next_after` is passed back as `after` to get the next page.
+    """
+    items: List[Dict[str, Any]]
+    next_after: Optional[str] = None
+
+
 class UserModel(BaseModel):
     """
     Container for a single user record
@@ -103,4 +210,4 @@ if __name__ == '__main__':
                             name = "Test",
                             usage="also test")
 
-    print(instance.normalized_embedding)
+    print(instance.model_dump())
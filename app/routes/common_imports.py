@@ -1,6 +1,6 @@
 # Centralizes the imports I will need for all routes
 from fastapi import APIRouter, Depends, HTTPException, status, Body, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.db.database import DbDep
 from bson import ObjectId, errors
 
@@ -13,6 +13,7 @@ __all__ = [
     "Body",
     "Response",
     "JSONResponse",
+    "StreamingResponse",
     "status",
     "DbDep",
     "ObjectId",
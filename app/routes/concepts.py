@@ -1,11 +1,54 @@
-from app.models.models import ConceptModel, UpdateConceptModel
+from app.models.models import (
+    ConceptModel,
+    CreateConceptModel,
+    UpdateConceptModel,
+    ConceptSearchResult,
+    AnswerResult,
+    ReviewModel,
+    BulkImportResult,
+    Page,
+)
 from app.routes.common_imports import *
-from app.helpers.similarity import calculate_normalized_embeddings, tensor_to_list
-from typing import List
+from app.helpers.embedding_text import concept_embed_string, embedding_content_hash
+from app.helpers.embedding_engine import embedding_engine
+from app.helpers.review_schedule import review_update
+from app.helpers.duplicates import find_duplicate, find_batch_duplicates, DUPLICATE_POLICY
+from app.helpers.embedding_version import embedding_version_fields, is_current_model
+from app.helpers.metrics import timed, STAGE_SECONDS
+from app.helpers.vector_index import user_index_registry
+from app.helpers.transcription_engine import transcription_scheduler, QueueFullError
+from app.helpers import ann_index
+from app.routes.transcription import read_audio_clip, queue_full_error
+from app.db.pagination import (
+    build_projection,
+    fetch_page,
+    serialize_document,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+)
+from app.db.streaming import stream_ndjson, iter_ndjson, EXPORT_BATCH_SIZE
+from app.db.embedding_codec import encode_embedding, decode_embedding, embedding_to_list
+from app.db.embedding_changes import embedded_at_field, record_deletions
+from fastapi import Query, Request
+from pydantic import ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import orjson
+import time
 
 
 router = APIRouter()
 
+# Most concepts accepted by a single bulk import
+MAX_BULK_ITEMS = 10000
+# Attempts at an update whose embedded text keeps changing underneath it
+MAX_UPDATE_ATTEMPTS = 3
+# Longest review queue returned at once
+MAX_REVIEW_QUEUE = 500
+
 
 async def find_concept_by_id(db: DbDep, id: str):
     """
@@ -24,6 +67,135 @@ async def find_concept_by_id(db: DbDep, id: str):
     return concept
 
 
+async def embed_concept_fields(name: str, usage: str) -> dict:
+    """
+    Computes the stored embedding fields (normalized_embedding,
+    embedding_hash, the embedding model and version, and embedded_at for the
+    change feed) for a concept's name and usage.
+
+    The forward pass is batched with other concurrent requests by the
+    embedding engine, off the event loop.
+    """
+    embed_string = concept_embed_string(name, usage)
+    embedding = await embedding_engine.embed(embed_string)
+    return {
+        "normalized_embedding": encode_embedding(embedding[0]),
+        "embedding_hash": embedding_content_hash(embed_string),
+        **embedding_version_fields(),
+        **embedded_at_field(),
+    }
+
+
+async def check_duplicate(
+    db: DbDep, user_id: str, embedding, exclude: str | None = None
+) -> dict:
+    """
+    Compares a new or re-embedded concept against the user's other concepts,
+    and returns its duplicate fields (duplicate_of and duplicate_score) to
+    store, per DUPLICATE_POLICY.
+
+    Raises:
+        HTTPException: 409 if the concept is a duplicate and the policy is
+        "reject".
+    """
+    if DUPLICATE_POLICY == "off":
+        return {}
+    duplicate = await find_duplicate(db, user_id, decode_embedding(embedding), exclude)
+    if duplicate is None:
+        return {"duplicate_of": None, "duplicate_score": None}
+    duplicate_id, score = duplicate
+    if DUPLICATE_POLICY == "reject":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=duplicate_detail(duplicate_id, score),
+        )
+    return {"duplicate_of": duplicate_id, "duplicate_score": round(score, 5)}
+
+
+def embedding_unchanged(concept: dict, name: str, usage: str) -> bool:
+    """Whether a concept's stored embedding is already that of the given
+    name and usage, computed by the current model"""
+    return (
+        concept.get("embedding_hash") == embedding_content_hash(concept_embed_string(name, usage))
+        and is_current_model(concept)
+    )
+
+
+def duplicate_detail(duplicate_id: str, score: float) -> str:
+    return f"Concept duplicates concept id={duplicate_id} (similarity {score:.3f})"
+
+
+async def check_bulk_duplicates(
+    db: DbDep, concepts: list, documents: list[dict], embeddings, results: list, ordered: bool
+) -> tuple[list, list[dict]]:
+    """
+    `check_duplicate` for a bulk import, with one batched check per user
+    that also compares the items with each other. Flags the documents in
+    place; under the "reject" policy, duplicates are reported as "duplicate"
+    in `results` instead (and stop an `ordered` import).
+
+    Returns:
+        tuple: The (index, CreateConceptModel) items and documents left to insert.
+    """
+    rows_by_user = {}
+    for row, (_, concept) in enumerate(concepts):
+        rows_by_user.setdefault(concept.user_id, []).append(row)
+
+    rejected = {}  # row -> duplicate id and similarity
+    for user_id, rows in rows_by_user.items():
+        duplicates = await find_batch_duplicates(
+            db,
+            user_id,
+            embeddings[rows],
+            [str(documents[row]["_id"]) for row in rows],
+            keep_duplicates=DUPLICATE_POLICY != "reject",
+        )
+        for row, duplicate in zip(rows, duplicates):
+            if duplicate is None:
+                documents[row].update(duplicate_of=None, duplicate_score=None)
+            elif DUPLICATE_POLICY == "reject":
+                rejected[row] = duplicate
+            else:
+                duplicate_id, score = duplicate
+                documents[row].update(duplicate_of=duplicate_id, duplicate_score=round(score, 5))
+
+    if not rejected:
+        return concepts, documents
+    # Items after the first rejected one stay "skipped" in an ordered import
+    end = min(rejected) + 1 if ordered else len(concepts)
+    keep = []
+    for row in range(end):
+        if row not in rejected:
+            keep.append(row)
+            continue
+        i = concepts[row][0]
+        results[i] = {"index": i, "status": "duplicate", "error": duplicate_detail(*rejected[row])}
+    return [concepts[row] for row in keep], [documents[row] for row in keep]
+
+
+def index_concept(user_id: str, concept_id: str, embedding):
+    """Applies a new or re-embedded concept to this worker's in-memory vector
+    indexes (other workers read it from the change feed)"""
+    embedding = decode_embedding(embedding)
+    user_index_registry.upsert(user_id, concept_id, embedding)
+    # Until the ANN index is filled, the change feed replays writes into it
+    if ann_index.ann_index_ready():
+        ann_index.ann_index.upsert(concept_id, embedding)
+
+
+def unindex_concept(user_id: str, concept_id: str):
+    """Removes a deleted concept from the in-memory vector indexes"""
+    user_index_registry.remove(user_id, concept_id)
+    if ann_index.ann_index_ready():
+        ann_index.ann_index.remove(concept_id)
+
+
+def new_concept_document(concept: CreateConceptModel) -> dict:
+    """The document of a new concept: the client's fields plus the defaults
+    of the server-owned ones, without an _id"""
+    return ConceptModel(**concept.model_dump()).model_dump(by_alias=True, exclude=["id"])
+
+
 @router.post(
     "/concepts",
     response_description="Insert new concept",
@@ -34,38 +206,288 @@ async def find_concept_by_id(db: DbDep, id: str):
     response_model_by_alias=False,
 )
 async def add_concept(
-    db : DbDep, concept: ConceptModel = Body(...)
+    db : DbDep, concept: CreateConceptModel = Body(...)
 ):
     """
-    Insert a concept record (id ignored) and return it.
-    A unique `id` will be created.
+    Insert a concept record and return it.
+    A unique `id` will be created, and the normalized_embedding is computed
+    and stored once here. Server-owned fields (review schedule, embedding
+    metadata, duplicate flags) start from their defaults.
+
+    A concept nearly identical to one the user already has is flagged with
+    duplicate_of, or rejected with a 409, depending on DUPLICATE_POLICY.
     """
+    # no "_id", so MongoDB creates its own
+    concept_dict = new_concept_document(concept)
+    # Never trust a client-provided embedding
+    concept_dict.update(await embed_concept_fields(concept.name, concept.usage))
+    concept_dict.update(
+        await check_duplicate(db, concept.user_id, concept_dict["normalized_embedding"])
+    )
+
     # returns InsertOneResult, which has inserted_id attribute
-    # exclude "id" so MongoDB can create its own
-    new_concept = await db.concepts.insert_one(
-        concept.model_dump(by_alias=True, exclude=["id"])
+    new_concept = await db.concepts.insert_one(concept_dict)
+    index_concept(
+        concept.user_id,
+        str(new_concept.inserted_id),
+        concept_dict["normalized_embedding"],
     )
-    created_concept = await db.concepts.find_one({"_id": new_concept.inserted_id})
-    return created_concept
+    # insert_one added the new _id to concept_dict, which is exactly what was
+    # stored, so there is no need to read it back
+    return concept_dict
+
+
+async def read_bulk_items(request: Request) -> list:
+    """
+    Reads the items of a bulk import body: a JSON list, or NDJSON (one concept
+    per line) when sent as application/x-ndjson. Lines that fail to parse are
+    returned as ValueErrors so they can be reported per item.
+    """
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items = []
+        async for item in iter_ndjson(request.stream()):
+            items.append(item)
+            if len(items) > MAX_BULK_ITEMS:
+                break
+    else:
+        try:
+            items = orjson.loads(await request.body())
+        except orjson.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON list of concepts")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A bulk import accepts at most {MAX_BULK_ITEMS} concepts",
+        )
+    return items
+
+
+@router.post(
+    "/concepts/bulk",
+    response_description="Insert many concepts",
+    response_model=BulkImportResult,
+    status_code=status.HTTP_200_OK,
+)
+async def add_concepts_bulk(db: DbDep, request: Request, ordered: bool = True):
+    """
+    Insert many concept records at once, from a JSON list or an NDJSON stream
+    (Content-Type: application/x-ndjson), and report the outcome per item.
+
+    All items are validated first, then embedded together in large padded
+    batches, checked for duplicates (per DUPLICATE_POLICY, against the user's
+    concepts and the other items) and written with a single insert_many.
+    With `ordered` (the default) the import stops at the first invalid,
+    rejected or failed item and the rest are skipped; otherwise every valid
+    item is attempted.
+    """
+    items = await read_bulk_items(request)
+    results = [{"index": i, "status": "skipped"} for i in range(len(items))]
+
+    concepts = []  # (index, CreateConceptModel) of the valid items to insert
+    with timed("concepts.validate"):
+        for i, item in enumerate(items):
+            try:
+                if isinstance(item, ValueError):
+                    raise item
+                concepts.append((i, CreateConceptModel.model_validate(item)))
+            except (ValidationError, ValueError) as e:
+                results[i] = {"index": i, "status": "invalid", "error": str(e)}
+                if ordered:
+                    break
+
+    documents = []
+    if concepts:
+        embeddings = await embedding_engine.embed(
+            [concept_embed_string(c.name, c.usage) for _, c in concepts]
+        )
+        for (_, concept), embedding in zip(concepts, embeddings):
+            document = new_concept_document(concept)
+            # Assigned up front so duplicates of other items can refer to them
+            document["_id"] = ObjectId()
+            document["normalized_embedding"] = encode_embedding(embedding)
+            document["embedding_hash"] = embedding_content_hash(
+                concept_embed_string(concept.name, concept.usage)
+            )
+            document.update(embedding_version_fields())
+            document.update(embedded_at_field())
+            documents.append(document)
+        if DUPLICATE_POLICY != "off":
+            concepts, documents = await check_bulk_duplicates(
+                db, concepts, documents, embeddings, results, ordered
+            )
+
+    failed_at = {}  # position in documents -> error message
+    if documents:
+        try:
+            await db.concepts.insert_many(documents, ordered=ordered)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed_at[error["index"]] = error.get("errmsg", "Write failed")
+
+    first_failure = min(failed_at, default=None)
+    for position, ((i, concept), document) in enumerate(zip(concepts, documents)):
+        if position in failed_at:
+            results[i] = {"index": i, "status": "failed", "error": failed_at[position]}
+        elif ordered and first_failure is not None and position > first_failure:
+            continue  # never attempted by MongoDB
+        else:
+            concept_id = str(document["_id"])
+            results[i] = {"index": i, "status": "created", "id": concept_id}
+            index_concept(concept.user_id, concept_id, document["normalized_embedding"])
+
+    created = sum(result["status"] == "created" for result in results)
+    skipped = sum(result["status"] == "skipped" for result in results)
+    return {
+        "created": created,
+        "failed": len(results) - created - skipped,
+        "skipped": skipped,
+        "results": results,
+    }
 
 
 @router.get(
     "/concepts",
-    response_description="Fetch all concepts",
+    response_description="Fetch a page of concepts",
+    response_model=Page,
+    status_code=status.HTTP_200_OK,
+)
+async def get_concepts(
+    db: DbDep,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    user_id: Optional[str] = None,
+):
+    """
+    Fetch a page of concepts, optionally only those of one user.
+
+    Pass the returned `next_after` as `after` for the next page. `fields` is a
+    comma-separated list of fields to return; by default every field except
+    normalized_embedding is returned.
+    """
+    try:
+        projection = build_projection(
+            fields,
+            allowed=set(ConceptModel.model_fields),
+            default_exclude={"normalized_embedding"},
+        )
+        query = {"user_id": user_id} if user_id is not None else {}
+        concepts, next_after = await fetch_page(
+            db.concepts, query, limit, after, projection
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for concept in concepts:
+        if "normalized_embedding" in concept:
+            concept["normalized_embedding"] = embedding_to_list(concept["normalized_embedding"])
+    return {
+        "items": [serialize_document(concept) for concept in concepts],
+        "next_after": next_after,
+    }
+
+
+@router.get(
+    "/concepts/export",
+    response_description="Stream all concepts as NDJSON",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def export_concepts(
+    db: DbDep,
+    user_id: Optional[str] = None,
+    include_embeddings: bool = False,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000),
+):
+    """
+    Stream every concept (optionally only one user's) as newline-delimited
+    JSON, for bulk syncs and backups.
+
+    Documents are read from MongoDB `batch_size` at a time and written out as
+    they arrive, so there is no cap on the number of concepts.
+    """
+    query = {"user_id": user_id} if user_id is not None else {}
+    projection = None if include_embeddings else {"normalized_embedding": 0}
+    cursor = db.concepts.find(query, projection).sort("_id", 1).batch_size(batch_size)
+    return StreamingResponse(stream_ndjson(cursor), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/users/{id}/concepts/search",
+    response_description="Semantic search over a user's concepts",
+    response_model=List[ConceptSearchResult],
+    response_model_by_alias=False,
+    status_code=status.HTTP_200_OK,
+)
+async def search_user_concepts(
+    db: DbDep,
+    id: str,
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=100),
+):
+    """
+    Find the k concepts of a user most similar to the query text `q`.
+
+    Scores come from the user's in-memory vector index, which is loaded from
+    the stored normalized_embeddings on first use.
+    """
+    try:
+        ObjectId(id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid user ID format: {id}")
+
+    query_embedding = (await embedding_engine.embed(q))[0]
+    index = await user_index_registry.get(db, id)
+    matches = index.search(query_embedding, k)
+    if not matches:
+        return []
+
+    concepts_cursor = db.concepts.find(
+        {"_id": {"$in": [ObjectId(concept_id) for concept_id, _ in matches]}},
+        {"normalized_embedding": 0},
+    )
+    concepts = {str(concept["_id"]): concept async for concept in concepts_cursor}
+    # Concepts deleted through another worker may still be in this index
+    return [
+        {"concept": concepts[concept_id], "score": round(score, 5)}
+        for concept_id, score in matches
+        if concept_id in concepts
+    ]
+
+
+@router.get(
+    "/users/{id}/review-queue",
+    response_description="Fetch the concepts a user is due to review",
     response_model=List[ConceptModel],
     response_model_by_alias=False,
     status_code=status.HTTP_200_OK,
 )
-async def get_concepts(db: DbDep):
+async def get_review_queue(
+    db: DbDep, id: str, limit: int = Query(20, ge=1, le=MAX_REVIEW_QUEUE)
+):
     """
-    Fetch all concepts in the database
+    Fetch up to `limit` of a user's concepts that are due for review, most
+    overdue first.
 
-    Results limited to 1000 records
+    Every review stores the concept's next due date, so this is a range scan
+    of the (user_id, next_due) index that stops after `limit` concepts, no
+    matter how many concepts the user has.
     """
-    concepts_cursor = db.concepts.find()
-    concepts = await concepts_cursor.to_list(length=1000)
-    output = [ConceptModel(**concept) for concept in concepts]
-    return output
+    try:
+        ObjectId(id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid user ID format: {id}")
+
+    cursor = (
+        db.concepts.find(
+            {"user_id": id, "next_due": {"$lte": datetime.now()}},
+            {"normalized_embedding": 0},
+        )
+        .sort("next_due", 1)
+        .limit(limit)
+    )
+    return await cursor.to_list(length=limit)
 
 
 @router.get(
@@ -90,6 +512,200 @@ async def get_concept_by_id(db: DbDep, id: str):
     return concept
 
 
+@router.get(
+    "/concepts/{id}/similar",
+    response_description="Find similar concepts across all users",
+    response_model=List[ConceptSearchResult],
+    response_model_by_alias=False,
+    status_code=status.HTTP_200_OK,
+)
+async def get_similar_concepts(
+    db: DbDep, id: str, k: int = Query(10, ge=1, le=100)
+):
+    """
+    Find the k concepts, from any user, most similar to this one.
+
+    Served by the approximate nearest-neighbour index, so it is only available
+    when ANN_INDEX_ENABLED is set, and once the index is filled after startup
+    (503 until then, see /ready). The index sees other workers' writes within
+    ANN_SYNC_SECONDS.
+    """
+    if ann_index.ann_index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The ANN index is disabled on this server.",
+        )
+    if not ann_index.ann_index_ready():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The ANN index isn't ready ({ann_index.ann_index_status['state']}).",
+            headers={"Retry-After": "5"},
+        )
+    concept = await find_concept_by_id(db, id)
+    embedding = decode_embedding(concept.get("normalized_embedding"))
+    if embedding is None or not len(embedding):
+        raise HTTPException(status_code=409, detail=f"Concept {id=} has no embedding yet")
+    if not is_current_model(concept):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Concept {id=} isn't re-embedded with the current model yet",
+        )
+
+    # Pick up concepts written or deleted by the other workers first
+    await ann_index.refresh_ann_index(db, ann_index.ann_index)
+    # Ask for one extra match, since the concept itself is the best one
+    matches = ann_index.ann_index.search(embedding, k + 1)
+    matches = [(concept_id, score) for concept_id, score in matches if concept_id != id][:k]
+    if not matches:
+        return []
+
+    concepts_cursor = db.concepts.find(
+        {"_id": {"$in": [ObjectId(concept_id) for concept_id, _ in matches]}},
+        {"normalized_embedding": 0},
+    )
+    concepts = {str(concept["_id"]): concept async for concept in concepts_cursor}
+    return [
+        {"concept": concepts[concept_id], "score": round(score, 5)}
+        for concept_id, score in matches
+        if concept_id in concepts
+    ]
+
+
+def server_timing(durations: dict[str, float]) -> str:
+    """Server-Timing header value for stage durations given in seconds"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations.items())
+
+
+@router.post(
+    "/concepts/{id}/answer",
+    response_description="Grade a spoken answer to a concept",
+    response_model=AnswerResult,
+    status_code=status.HTTP_200_OK,
+)
+async def answer_concept(
+    db: DbDep, id: str, request: Request, response: Response, encoding: str = "s16le"
+):
+    """
+    Grades a spoken answer: transcribes the audio in the body (same formats
+    as POST /transcribe), embeds only the transcript, scores it against the
+    concept's stored embedding, and records the score as a review: the
+    concept's progress, last_seen and review schedule are updated in a single
+    write.
+
+    The duration of each stage is reported in the Server-Timing header:
+    fetch (concept lookup, run while the audio uploads), decode, queue and
+    transcribe, embed, score and write.
+    """
+    try:
+        object_id = ObjectId(id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid concept ID format: {id}")
+    timings = {}
+    started = time.perf_counter()
+
+    async def fetch_concept():
+        concept = await db.concepts.find_one(
+            {"_id": object_id},
+            {
+                "name": 1,
+                "usage": 1,
+                "normalized_embedding": 1,
+                "embedding_model": 1,
+                "embedding_version": 1,
+            },
+        )
+        timings["fetch"] = time.perf_counter() - started
+        return concept
+
+    # Look the concept up while the audio is still being received
+    fetch = asyncio.create_task(fetch_concept())
+    try:
+        audio = await read_audio_clip(request, encoding)
+        timings["decode"] = time.perf_counter() - started
+        concept = await fetch
+    finally:
+        fetch.cancel()
+    if not concept:
+        raise HTTPException(status_code=404, detail=f"Concept not found with id={id}")
+
+    start = time.perf_counter()
+    try:
+        job = await transcription_scheduler.transcribe(audio)
+    except QueueFullError as e:
+        raise queue_full_error(e)
+    transcript = job.future.result()
+    timings["queue"] = job.queue_seconds
+    timings["transcribe"] = time.perf_counter() - start - job.queue_seconds
+
+    start = time.perf_counter()
+    concept_embedding = decode_embedding(concept.get("normalized_embedding"))
+    if concept_embedding is not None and len(concept_embedding) and is_current_model(concept):
+        answer_embedding = (await embedding_engine.embed(transcript))[0]
+    else:
+        # Not backfilled or re-embedded yet: embed the concept in the same batch
+        answer_embedding, concept_embedding = await embedding_engine.embed(
+            [transcript, concept_embed_string(concept["name"], concept["usage"])]
+        )
+    timings["embed"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Both embeddings are normalized, so their dot product is the cosine similarity
+    score = float(answer_embedding @ concept_embedding)
+    timings["score"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    updated = await db.concepts.find_one_and_update(
+        {"_id": object_id},
+        review_update(score),
+        projection={"progress": 1, "last_seen": 1, "next_due": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    timings["write"] = time.perf_counter() - start
+    if updated is None:
+        raise HTTPException(status_code=404, detail=f"Concept not found with id={id}")
+
+    timings["total"] = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing(timings)
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=f"answer.{stage}")
+    return {
+        "concept_id": id,
+        "transcript": transcript,
+        "score": round(score, 5),
+        "progress": updated["progress"],
+        "last_seen": updated["last_seen"],
+        "next_due": updated["next_due"],
+    }
+
+
+@router.post(
+    "/concepts/{id}/review",
+    response_description="Record a review of a concept",
+    response_model=ConceptModel,
+    response_model_by_alias=False,
+    status_code=status.HTTP_200_OK,
+)
+async def review_concept(db: DbDep, id: str, review: ReviewModel = Body(...)):
+    """
+    Records a review scored by the client (e.g. a self-graded flashcard) and
+    returns the concept with its updated progress and review schedule.
+    """
+    try:
+        object_id = ObjectId(id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid concept ID format: {id}")
+
+    updated = await db.concepts.find_one_and_update(
+        {"_id": object_id},
+        review_update(review.score),
+        projection={"normalized_embedding": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        raise HTTPException(status_code=404, detail=f"Concept not found with id={id}")
+    return updated
+
+
 @router.put(
     "/concepts/{id}",
     response_description="Update a concept",
@@ -106,32 +722,79 @@ async def update_concept(
     Updates an existing concept on name or usage, or returns the existing
     concept without any update_data provided.
 
-    The normalized_embedding, if the concept is updated, is automatically
-    recalculated.
+    The normalized_embedding is recalculated whenever name or usage change the
+    embedded text (and the stored vector is kept when they don't), and
+    checked for duplicates like a new concept. The existence check is folded into a
+    single find_one_and_update; only an update of just one of name/usage, or
+    one that needs the owner for the duplicate check, first reads the concept.
     """
-    concept = await find_concept_by_id(db, id)
-    # if we got this far, the concept exists
+    try:
+        object_id = ObjectId(id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid concept ID format: {id}")
 
     update_data_dict = {
         k: v for k, v in update_data.model_dump(by_alias=True).items() if v is not None
     }
+    if not update_data_dict:
+        return await find_concept_by_id(db, id)
 
-    # Recalculate the normalized_embedding if name or usage is updated
-    if "name" in update_data_dict or "usage" in update_data_dict:
-        embed_string = f"{update_data_dict.get('name', concept['name'])}: {update_data_dict.get('usage', concept['usage'])}"
-        update_data_dict["normalized_embedding"] = tensor_to_list(
-            calculate_normalized_embeddings(embed_string)
-        )
+    for _ in range(MAX_UPDATE_ATTEMPTS):
+        query = {"_id": object_id}
+        update_fields = dict(update_data_dict)
+        if "name" in update_fields or "usage" in update_fields:
+            name, usage = update_fields.get("name"), update_fields.get("usage")
+            current = None
+            if name is None or usage is None or DUPLICATE_POLICY != "off":
+                current = await db.concepts.find_one(
+                    query,
+                    {
+                        "name": 1,
+                        "usage": 1,
+                        "user_id": 1,
+                        "embedding_hash": 1,
+                        "embedding_model": 1,
+                        "embedding_version": 1,
+                    },
+                )
+                if not current:
+                    break
+                name = current["name"] if name is None else name
+                usage = current["usage"] if usage is None else usage
+                # Only write if the text we embedded is still the stored one
+                query.update(name=current["name"], usage=current["usage"])
+            # Same embedded text: nothing to re-embed, re-check or announce to
+            # the other workers
+            if current is None or not embedding_unchanged(current, name, usage):
+                update_fields.update(await embed_concept_fields(name, usage))
+                if current is not None:
+                    update_fields.update(
+                        await check_duplicate(
+                            db,
+                            current["user_id"],
+                            update_fields["normalized_embedding"],
+                            exclude=id,
+                        )
+                    )
 
-    if update_data_dict:
-        await db.concepts.update_one(
-            {"_id": concept["_id"]},
-            {"$set": update_data_dict},
+        updated_concept = await db.concepts.find_one_and_update(
+            query, {"$set": update_fields}, return_document=ReturnDocument.AFTER
         )
-        updated_concept = await db.concepts.find_one({"_id": concept["_id"]})
-        return updated_concept
-
-    return concept
+        if updated_concept:
+            if "normalized_embedding" in update_fields:
+                index_concept(
+                    updated_concept["user_id"], id, update_fields["normalized_embedding"]
+                )
+            return updated_concept
+        if len(query) == 1:
+            # Unguarded write matched nothing, so the concept doesn't exist
+            break
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Concept {id=} was modified concurrently, please retry.",
+        )
+    raise HTTPException(status_code=404, detail=f"Concept not found with id={id}")
 
 
 @router.delete(
@@ -143,8 +806,12 @@ async def delete_concept(db: DbDep, id: str):
     """
     Delete a concept by id
     """
-    delete_result = await db.concepts.delete_one({"_id": ObjectId(id)})
-    if delete_result.deleted_count == 1:
+    deleted_concept = await db.concepts.find_one_and_delete(
+        {"_id": ObjectId(id)}, projection={"user_id": 1}
+    )
+    if deleted_concept:
+        unindex_concept(deleted_concept["user_id"], id)
+        await record_deletions(db, deleted_concept["user_id"], id)
         return JSONResponse(
             content={"message": f"Concept with {id=} deleted."},
             status_code=status.HTTP_200_OK,
@@ -0,0 +1,169 @@
+from app.routes.common_imports import *
+from app.helpers.transcription import StreamingTranscriber, SAMPLE_RATE
+from app.helpers.transcription_engine import (
+    transcription_scheduler,
+    QueueFullError,
+    MAX_CLIP_SECONDS,
+)
+from app.helpers.audio_decode import StreamingAudioDecoder, PCM_ENCODINGS, sample_scale
+from app.helpers.audio_buffer import AudioBuffer
+from app.helpers.executors import run_cpu_bound
+from fastapi import Request, WebSocket, WebSocketDisconnect
+import numpy as np
+
+
+router = APIRouter()
+
+# Largest single audio message (10s of float32 audio)
+MAX_CHUNK_BYTES = 10 * SAMPLE_RATE * 4
+
+
+def clip_capacity(content_length: str | None, decoder: StreamingAudioDecoder) -> int:
+    """
+    Samples to preallocate for an uploaded clip: the most its body can decode
+    to (from Content-Length), capped at TRANSCRIPTION_MAX_CLIP_SECONDS.
+    """
+    max_samples = int(MAX_CLIP_SECONDS * SAMPLE_RATE)
+    if not content_length or not content_length.isdigit():
+        return max_samples
+    if decoder.wav:
+        # Enough for 8-bit audio at 8kHz and up
+        bound = 2 * int(content_length)
+    else:
+        bound = int(content_length) // decoder.dtype.itemsize
+    return max(1, min(max_samples, bound))
+
+
+def queue_full_error(e: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+async def read_audio_clip(request: Request, encoding: str) -> np.ndarray:
+    """
+    Decodes an uploaded clip to 16kHz float32 as its body streams in, straight
+    into one preallocated buffer, and returns a view of it.
+
+    The body is either a WAV file (Content-Type audio/wav; PCM or float, any
+    sample rate and channel count) or raw 16kHz mono PCM in the given
+    `encoding` (s16le or f32le).
+
+    Raises HTTPException 503 without reading the body when the transcription
+    queue is already full, 400 for invalid audio and 413 for clips longer
+    than TRANSCRIPTION_MAX_CLIP_SECONDS.
+    """
+    if transcription_scheduler.queue_depth >= transcription_scheduler.max_queue_depth:
+        raise queue_full_error(QueueFullError(transcription_scheduler.retry_after()))
+
+    try:
+        decoder = StreamingAudioDecoder.for_content_type(
+            request.headers.get("content-type"), encoding
+        )
+        clip = AudioBuffer(
+            clip_capacity(request.headers.get("content-length"), decoder), ring=False
+        )
+        async for data in request.stream():
+            decoder.feed(data, clip)
+        decoder.finish()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BufferError:
+        raise HTTPException(status_code=413, detail=f"Clips are limited to {MAX_CLIP_SECONDS}s")
+    if not clip.written:
+        raise HTTPException(status_code=400, detail="No audio in the request body")
+    return clip.view(0)
+
+
+@router.post("/transcribe")
+async def transcribe(request: Request, encoding: str = "s16le"):
+    """
+    Transcribes a clip of up to TRANSCRIPTION_MAX_CLIP_SECONDS (see
+    `read_audio_clip` for the accepted formats). Concurrent clips of similar
+    lengths are transcribed together in batches.
+
+    Responds 503 with a Retry-After header when too many clips are queued.
+    """
+    audio = await read_audio_clip(request, encoding)
+    try:
+        job = await transcription_scheduler.transcribe(audio)
+    except QueueFullError as e:
+        raise queue_full_error(e)
+    return {
+        "text": job.future.result(),
+        "audio_seconds": len(audio) / SAMPLE_RATE,
+        "queue_seconds": round(job.queue_seconds, 4),
+        "batch_size": job.batch_size,
+    }
+
+
+@router.websocket("/transcribe/stream")
+async def stream_transcription(websocket: WebSocket, encoding: str = "s16le"):
+    """
+    Transcribes speech while it is being recorded.
+
+    The client sends 16kHz mono PCM audio as binary messages (`encoding`
+    s16le by default, or f32le), of any size up to 10s, and the text message
+    "end" once done. The server answers with JSON messages:
+    - {"type": "partial", "text", "audio_seconds"} whenever the transcript
+      so far changes (about every STREAM_WINDOW_SECONDS - 2 *
+      STREAM_CONTEXT_SECONDS of audio)
+    - {"type": "final", "text", "audio_seconds", "compute_seconds"} after
+      "end", before closing the connection
+    - {"type": "error", "detail"} before closing on invalid input
+    """
+    await websocket.accept()
+    if encoding not in PCM_ENCODINGS:
+        await websocket.send_json({"type": "error", "detail": f"Unknown encoding {encoding}"})
+        await websocket.close(code=1003)
+        return
+
+    transcriber = StreamingTranscriber()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                if message["text"].strip() == "end":
+                    break
+                continue
+            data = message.get("bytes") or b""
+            if len(data) > MAX_CHUNK_BYTES:
+                detail = f"Audio message larger than {MAX_CHUNK_BYTES} bytes"
+                await websocket.send_json({"type": "error", "detail": detail})
+                await websocket.close(code=1009)
+                return
+            dtype = PCM_ENCODINGS[encoding]
+            if len(data) % dtype.itemsize:
+                raise ValueError(f"Audio isn't a whole number of {dtype.itemsize}-byte samples")
+            # A zero-copy view of the message, converted to float32 as it is
+            # written into the transcriber's window buffer. The model runs off
+            # the event loop; windows of one session still run in order since
+            # each message is awaited before the next.
+            text = await run_cpu_bound(
+                transcriber.feed,
+                np.frombuffer(data, dtype=dtype),
+                sample_scale(dtype),
+                kind="thread",
+            )
+            if text is not None:
+                await websocket.send_json(
+                    {"type": "partial", "text": text, "audio_seconds": transcriber.audio_seconds}
+                )
+
+        text = await run_cpu_bound(transcriber.finish, kind="thread")
+        await websocket.send_json(
+            {
+                "type": "final",
+                "text": text,
+                "audio_seconds": transcriber.audio_seconds,
+                "compute_seconds": round(transcriber.compute_seconds, 3),
+            }
+        )
+        await websocket.close()
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+    except WebSocketDisconnect:
+        return
@@ -1,34 +1,24 @@
-from app.models.models import UserModel, UpdateUserModel
-from passlib.context import CryptContext
+from app.models.models import UserModel, UpdateUserModel, Page
 from app.routes.common_imports import *
-from typing import List
+from app.helpers.passwords import hash_password
+from app.helpers.executors import run_cpu_bound
+from app.helpers.metrics import timed
+from app.db.pagination import (
+    build_projection,
+    fetch_page,
+    serialize_document,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+)
+from app.db.streaming import stream_ndjson, EXPORT_BATCH_SIZE
+from app.db.indexes import indexes_ready
+from fastapi import Query
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Optional
 
 router = APIRouter()
 
-# Initialize the password context for hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def hash_password(password: str) -> str:
-    """
-    Hashes a string by creating a random salt and hashing the string with that
-    random salt. The returned string contains information about the hashing
-    algorithm used, the salt, and the complete hash needed for verification.
-
-    Using a salt, and computationally-intensive algorithms, avoids rainbow table 
-    attacks
-    """
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password, hashed_password):
-    """
-    Uses the salt from hashed_password and plain_password to rehash the two
-    together and compare the results to the original hashed_password, verifying
-    if two plaintext passwords are equivalent.
-    """
-    return pwd_context.verify(plain_password, hashed_password)
-
 
 async def find_user_by_id(db: DbDep, id: str):
     """
@@ -59,37 +49,77 @@ async def create_user(db: DbDep, user: UserModel = Body(...)):
     Insert a user (ignore id) and return it.
     A unique `id` will be created.
     """
-    existing_user = await db.users.find_one({"email": user.email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="A user with this email already exists.",
-        )
-    # Hash the password before inserting the user
-    user.password = hash_password(user.password)
-
-    new_user = await db.users.insert_one(user.model_dump(by_alias=True, exclude=["id"]))
-    created_user = await db.users.find_one({"_id": new_user.inserted_id})
-    return created_user
+    duplicate_email = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A user with this email already exists.",
+    )
+    # The unique index on email (see app.db.indexes) rejects duplicates. Until
+    # it is known to exist (it is created at startup, and fails to build over
+    # existing duplicates), look the email up first.
+    if not indexes_ready() and await db.users.find_one({"email": user.email}, {"_id": 1}):
+        raise duplicate_email
+
+    # Hash the password before inserting the user, off the event loop
+    with timed("bcrypt.hash"):
+        user.password = await run_cpu_bound(hash_password, user.password)
+
+    user_dict = user.model_dump(by_alias=True, exclude=["id"])
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise duplicate_email
+    # insert_one added the new _id to user_dict, so there is no need to read
+    # the user back
+    return user_dict
 
 
 @router.get(
     "/users",
-    response_description="Fetch all users",
-    response_model=List[UserModel],
-    response_model_by_alias=False,
+    response_description="Fetch a page of users",
+    response_model=Page,
     status_code=status.HTTP_200_OK,
 )
-async def get_users(db: DbDep):
+async def get_users(
+    db: DbDep,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """
-    Fetch all users in the database.
+    Fetch a page of users.
 
-    Results limited to 1000 records.
+    Pass the returned `next_after` as `after` for the next page. `fields` is a
+    comma-separated list of fields to return. Password hashes are never
+    returned.
     """
-    users_cursor = db.users.find()
-    users = await users_cursor.to_list(length=1000)
-    output = [UserModel(**user) for user in users]
-    return output
+    try:
+        projection = build_projection(
+            fields, allowed=set(UserModel.model_fields), never={"password"}
+        )
+        users, next_after = await fetch_page(db.users, {}, limit, after, projection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "items": [serialize_document(user) for user in users],
+        "next_after": next_after,
+    }
+
+
+@router.get(
+    "/users/export",
+    response_description="Stream all users as NDJSON",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def export_users(
+    db: DbDep, batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000)
+):
+    """
+    Stream every user as newline-delimited JSON, for bulk syncs and backups.
+    Password hashes are never exported.
+    """
+    cursor = db.users.find({}, {"password": 0}).sort("_id", 1).batch_size(batch_size)
+    return StreamingResponse(stream_ndjson(cursor), media_type="application/x-ndjson")
 
 
 @router.get(
@@ -117,29 +147,38 @@ async def update_user(db: DbDep, id: str, update_data: UpdateUserModel = Body(..
     """
     Updates an existing user's username, password, or profile picture, or
     returns the existing user without any update_data provided.
+
+    The existence check and the update are a single find_one_and_update.
     """
-    existing_user = await find_user_by_id(db, id)
+    try:
+        object_id = ObjectId(id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid user ID format: {id}")
 
     # Extract only the fields that are present in the update_data
     update_data_dict = {
         k: v for k, v in update_data.model_dump(by_alias=True).items() if v is not None
     }
 
+    # Return the existing user document if no updates were made
+    if not update_data_dict:
+        return await find_user_by_id(db, id)
+
     # Hash the password if it's being updated
     if update_data_dict.get("password"):
-        update_data_dict["password"] = hash_password(update_data_dict["password"])
-
-    # Update the user document if there are changes
-    if update_data_dict:
-        await db.users.update_one(
-            {"_id": existing_user["_id"]},
-            {"$set": update_data_dict},
-        )
-        updated_user = await db.users.find_one({"_id": existing_user["_id"]})
-        return updated_user
-
-    # Return the existing user document if no updates were made
-    return existing_user
+        with timed("bcrypt.hash"):
+            update_data_dict["password"] = await run_cpu_bound(
+                hash_password, update_data_dict["password"]
+            )
+
+    updated_user = await db.users.find_one_and_update(
+        {"_id": object_id},
+        {"$set": update_data_dict},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not updated_user:
+        raise HTTPException(status_code=404, detail=f"User not found with id={id}")
+    return updated_user
 
 
 @router.delete(
@@ -0,0 +1,84 @@
+"""
+Recall and latency of the IVF-flat ANN index against exact search.
+
+Builds indexes over synthetic clustered unit vectors (default 100k and 1M;
+1M needs about 3GB of RAM) and reports, for several n_probe settings,
+recall@k against an exact VectorIndex scan plus per-query latency.
+
+Run with: python3 -m benchmarks.ann_recall --sizes 100000 1000000
+"""
+from app.helpers.ann_index import IVFFlatIndex
+from app.helpers.vector_index import VectorIndex
+from benchmarks.common import summarize_ms
+import numpy as np
+import argparse
+import time
+
+DIM = 384
+
+
+def clustered_vectors(n: int, n_clusters: int, rng) -> np.ndarray:
+    """Unit vectors scattered around random cluster centres, roughly like
+    sentence embeddings of related concepts"""
+    centres = rng.standard_normal((n_clusters, DIM), dtype=np.float32)
+    vectors = np.empty((n, DIM), dtype=np.float32)
+    # Generate in chunks to keep the temporary arrays small
+    for start in range(0, n, 100_000):
+        size = min(100_000, n - start)
+        chunk = centres[rng.integers(0, n_clusters, size)]
+        chunk += 0.6 * rng.standard_normal((size, DIM), dtype=np.float32)
+        vectors[start : start + size] = chunk
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def timed_searches(search, queries, k):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query, k))
+        timings.append(time.perf_counter() - start)
+    return results, timings
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        vectors = clustered_vectors(n, max(100, n // 1000), rng)
+        ids = [str(i) for i in range(n)]
+        queries = vectors[rng.choice(n, args.queries, replace=False)]
+        queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        exact = VectorIndex(DIM)
+        exact.extend(ids, vectors)
+        truth, exact_timings = timed_searches(exact.search, queries, args.k)
+        truth = [{id for id, _ in matches} for matches in truth]
+
+        start = time.perf_counter()
+        ann = IVFFlatIndex(DIM, train_threshold=0)
+        ann.build(ids, vectors)
+        build_time = time.perf_counter() - start
+
+        print(f"\n{n} vectors ({len(ann.centroids)} lists, built in {build_time:.1f}s)")
+        print(summarize_ms("  exact            ", exact_timings))
+        for n_probe in args.n_probe:
+            results, timings = timed_searches(
+                lambda query, k: ann.search(query, k, n_probe=n_probe), queries, args.k
+            )
+            recall = np.mean(
+                [
+                    len(truth_ids & {id for id, _ in matches}) / args.k
+                    for truth_ids, matches in zip(truth, results)
+                ]
+            )
+            print(summarize_ms(f"  ivf n_probe={n_probe:<4} recall@{args.k}={recall:.3f}", timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    main(parser.parse_args())
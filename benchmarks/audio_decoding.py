@@ -0,0 +1,112 @@
+"""
+Benchmark of StreamingAudioDecoder on synthetic WAV uploads.
+
+Decodes 60 seconds of noise in several WAV formats (16kHz mono int16, which
+is copied straight into the buffer, and 44.1kHz stereo int16 / float32,
+which are downmixed and resampled), fed in upload-sized chunks, and reports
+decoding speed as a multiple of real time.
+
+With --check, instead feeds malformed WAV headers (truncated, out-of-order
+or undersized chunks) and verifies that each is rejected with a ValueError,
+which the transcription route turns into a 400, rather than any other
+exception.
+
+Run with: python3 -m benchmarks.audio_decoding [--check]
+"""
+from app.helpers.audio_decode import StreamingAudioDecoder, TARGET_RATE
+from app.helpers.audio_buffer import AudioBuffer
+import numpy as np
+import argparse
+import struct
+import time
+
+FORMATS = [
+    # (label, format tag, sample rate, channels, dtype)
+    ("16kHz mono int16", 1, 16000, 1, np.dtype("<i2")),
+    ("44.1kHz stereo int16", 1, 44100, 2, np.dtype("<i2")),
+    ("44.1kHz stereo float32", 3, 44100, 2, np.dtype("<f4")),
+]
+
+
+def fmt_chunk(tag: int, rate: int, channels: int, bits: int) -> bytes:
+    block_align = channels * bits // 8
+    body = struct.pack("<HHIIHH", tag, channels, rate, rate * block_align, block_align, bits)
+    return b"fmt " + struct.pack("<I", len(body)) + body
+
+
+def wav_bytes(chunks: bytes, data: bytes) -> bytes:
+    """A RIFF/WAVE file made of the given chunks followed by the data chunk"""
+    body = b"WAVE" + chunks + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def decode(payload: bytes, chunk_size: int, capacity: int) -> AudioBuffer:
+    decoder = StreamingAudioDecoder(wav=True)
+    buffer = AudioBuffer(capacity, ring=False)
+    for start in range(0, len(payload), chunk_size):
+        decoder.feed(payload[start : start + chunk_size], buffer)
+    decoder.finish()
+    return buffer
+
+
+def benchmark(args):
+    rng = np.random.default_rng(0)
+    for label, tag, rate, channels, dtype in FORMATS:
+        n = args.seconds * rate * channels
+        if dtype.kind == "f":
+            samples = rng.uniform(-1, 1, n).astype(dtype)
+        else:
+            samples = rng.integers(-(2**15), 2**15, n).astype(dtype)
+        payload = wav_bytes(fmt_chunk(tag, rate, channels, dtype.itemsize * 8), samples.tobytes())
+        capacity = args.seconds * TARGET_RATE + TARGET_RATE
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            decode(payload, args.chunk_size, capacity)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(
+            f"{label:>24}: {best * 1000:8.2f}ms for {args.seconds}s of audio "
+            f"({args.seconds / best:,.0f}x real time)"
+        )
+
+
+def check(args):
+    audio = np.zeros(1600, dtype="<i2").tobytes()
+    fmt = fmt_chunk(1, 16000, 1, 16)
+    cases = [
+        ("not RIFF", b"RIFX" + wav_bytes(fmt, audio)[4:]),
+        ("data before fmt", wav_bytes(b"", audio)),
+        ("empty fmt chunk", wav_bytes(b"fmt " + struct.pack("<I", 0), audio)),
+        ("fmt chunk too short", wav_bytes(fmt[:4] + struct.pack("<I", 8) + fmt[8:16], audio)),
+        ("unsupported format", wav_bytes(fmt_chunk(1, 16000, 1, 24), audio)),
+        ("no channels", wav_bytes(fmt_chunk(1, 16000, 0, 16), audio)),
+        ("header only", wav_bytes(fmt, b"")[:-8]),
+        ("half a sample", wav_bytes(fmt, audio + b"\0")),
+    ]
+    failures = 0
+    for label, payload in cases:
+        try:
+            decode(payload, args.chunk_size, TARGET_RATE)
+            outcome, ok = "accepted", False
+        except ValueError as e:
+            outcome, ok = f"ValueError: {e}", True
+        except Exception as e:
+            outcome, ok = f"{type(e).__name__}: {e}", False
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {label:>20}: {outcome}")
+    if failures:
+        raise SystemExit(f"{failures} malformed WAV(s) not rejected with a ValueError")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--check", action="store_true", help="Only check malformed headers")
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    if args.check:
+        check(args)
+    else:
+        benchmark(args)
@@ -0,0 +1,96 @@
+"""
+Throughput of importing a deck of concepts through `POST /api/v1/concepts`
+one at a time versus a single `POST /api/v1/concepts/bulk`.
+
+Start the API first (`uvicorn app.main:app`), then run:
+    python3 -m benchmarks.bulk_import --count 2000
+
+Concepts are created under a throwaway user and deleted afterwards.
+"""
+import argparse
+import asyncio
+import httpx
+import time
+import uuid
+
+
+def make_deck(user_id: str, count: int, tag: str) -> list[dict]:
+    return [
+        {
+            "user_id": user_id,
+            "name": f"bench concept {tag} {i}",
+            "usage": f"used in benchmark sentence number {i} of run {tag}",
+        }
+        for i in range(count)
+    ]
+
+
+async def single_inserts(client, deck, concurrency: int) -> list[str]:
+    """Inserts the deck with one request per concept, `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def insert(concept):
+        async with semaphore:
+            response = await client.post("/api/v1/concepts", json=concept)
+            response.raise_for_status()
+            return response.json()["id"]
+
+    return await asyncio.gather(*(insert(concept) for concept in deck))
+
+
+async def bulk_insert(client, deck, ordered: bool) -> list[str]:
+    response = await client.post(
+        "/api/v1/concepts/bulk", params={"ordered": ordered}, json=deck
+    )
+    response.raise_for_status()
+    return [result["id"] for result in response.json()["results"] if result["id"]]
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=600) as client:
+        user = await client.post(
+            "/api/v1/users",
+            json={
+                "email": f"bench-{uuid.uuid4().hex}@circa.test",
+                "username": "bench-importer",
+                "password": "benchmark-password",
+            },
+        )
+        user.raise_for_status()
+        user_id = user.json()["id"]
+        created = []
+        try:
+            start = time.perf_counter()
+            created += await single_inserts(
+                client, make_deck(user_id, args.count, "single"), args.concurrency
+            )
+            single_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            created += await bulk_insert(
+                client, make_deck(user_id, args.count, "bulk"), args.ordered
+            )
+            bulk_time = time.perf_counter() - start
+
+            print(
+                f"single POSTs (concurrency={args.concurrency}): {single_time:.2f}s "
+                f"= {args.count / single_time:.1f} concepts/s"
+            )
+            print(
+                f"bulk POST (ordered={args.ordered}): {bulk_time:.2f}s "
+                f"= {args.count / bulk_time:.1f} concepts/s "
+                f"({single_time / bulk_time:.1f}x faster)"
+            )
+        finally:
+            for id in created:
+                await client.delete(f"/api/v1/concepts/{id}")
+            await client.delete(f"/api/v1/users/{user_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ordered", action=argparse.BooleanOptionalAction, default=False)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,23 @@
+# Small helpers shared by the benchmark scripts in this folder
+import statistics
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values (pct in 0-100)"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize_ms(label: str, seconds: list[float]) -> str:
+    """One-line latency summary of a list of durations in seconds, in ms"""
+    ms = [s * 1000 for s in seconds]
+    if not ms:
+        return f"{label}: no samples"
+    return (
+        f"{label}: n={len(ms)} mean={statistics.fmean(ms):.2f}ms "
+        f"p50={percentile(ms, 50):.2f}ms p95={percentile(ms, 95):.2f}ms "
+        f"p99={percentile(ms, 99):.2f}ms max={max(ms):.2f}ms"
+    )
@@ -0,0 +1,57 @@
+"""
+Cost of the near-duplicate check on the concept insert path, and of the
+offline duplicate clustering, for one user's concepts.
+
+Runs offline on random unit vectors:
+    python3 -m benchmarks.duplicate_check --concepts 10000
+
+The insert check is one top-2 search of the user's in-memory vector index
+(what find_duplicate does once the index is loaded); clustering is the
+blocked all-pairs comparison of cluster_duplicates.
+"""
+from app.helpers.vector_index import VectorIndex
+from app.helpers.duplicates import cluster_duplicates, DUPLICATE_THRESHOLD
+from benchmarks.common import summarize_ms
+import numpy as np
+import argparse
+import time
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.concepts, args.dim)).astype(np.float32)
+    # Plant near-duplicates: slightly perturbed copies of other vectors
+    originals, copies = rng.choice(args.concepts, (2, args.duplicates), replace=False)
+    noise = 0.05 * rng.standard_normal((args.duplicates, args.dim))
+    vectors[copies] = vectors[originals] + noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"{i:024x}" for i in range(args.concepts)]
+
+    index = VectorIndex(args.dim)
+    index.extend(ids, vectors)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    durations = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, 2)
+        durations.append(time.perf_counter() - start)
+    print(summarize_ms(f"insert check ({args.concepts} concepts)", durations))
+
+    start = time.perf_counter()
+    clusters = cluster_duplicates(ids, vectors, args.threshold)
+    elapsed = time.perf_counter() - start
+    print(
+        f"clustering: {elapsed * 1000:.0f}ms, {len(clusters)} clusters of "
+        f"{sum(map(len, clusters))} concepts ({args.duplicates} planted)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concepts", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--duplicates", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    main(parser.parse_args())
@@ -0,0 +1,57 @@
+"""
+Throughput and latency of the embedding backends on CPU.
+
+For every backend (or those given) and batch sizes 1, 8 and 64, reports
+sentences per second and p50/p99 latency per batch. Set EMBEDDING_NUM_THREADS
+to compare thread counts.
+
+Run with: python3 -m benchmarks.embedding_backends [--backends torch onnx]
+"""
+from app.helpers.embedding_backends import BACKENDS, create_backend
+from app.helpers.model_registry import load_embedding_weights, EMBEDDING_MODEL_ID
+from benchmarks.common import percentile
+import argparse
+import random
+import time
+
+WORDS = (
+    "concept usage example meaning balance effect opposite neglect present "
+    "found everywhere short time fashion trend nature meeting ignore"
+).split()
+
+
+def random_sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 24)))
+
+
+def main(args):
+    rng = random.Random(0)
+    tokenizer, model = load_embedding_weights()
+    for name in args.backends:
+        backend = create_backend(name, tokenizer, model, EMBEDDING_MODEL_ID)
+        for batch_size in (1, 8, 64):
+            batches = [
+                [random_sentence(rng) for _ in range(batch_size)]
+                for _ in range(args.warmup + args.batches)
+            ]
+            for batch in batches[: args.warmup]:
+                backend.encode(batch)
+            timings = []
+            for batch in batches[args.warmup :]:
+                start = time.perf_counter()
+                backend.encode(batch)
+                timings.append(time.perf_counter() - start)
+            print(
+                f"{name:<12} batch={batch_size:<3} "
+                f"{batch_size * len(timings) / sum(timings):8.1f} sentences/s "
+                f"p50={percentile(timings, 50) * 1000:7.2f}ms "
+                f"p99={percentile(timings, 99) * 1000:7.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    main(parser.parse_args())
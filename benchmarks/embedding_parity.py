@@ -0,0 +1,64 @@
+"""
+Parity check of the embedding backends against the reference PyTorch backend.
+
+Embeds a set of sentences with every backend (or those given) and compares
+each embedding with the reference one by cosine similarity. Exits with status
+1 if any backend falls below its minimum agreement, so it can gate a switch
+of EMBEDDING_BACKEND.
+
+Run with: python3 -m benchmarks.embedding_parity [--backends onnx quantized]
+"""
+from app.helpers.embedding_backends import BACKENDS, create_backend
+from app.helpers.model_registry import load_embedding_weights, EMBEDDING_MODEL_ID
+import numpy as np
+import argparse
+import sys
+
+SENTENCES = [
+    "counterbalances: neglect impacts by exerting an opposite effect",
+    "works against",
+    "balances the overall effect",
+    "ubiquitous: present, appearing, or found everywhere",
+    "Her ubiquitous presence at every meeting made her hard to ignore.",
+    "ephemeral",
+    "lasting for a very short time; the ephemeral nature of fashion trends",
+    "a",
+    "The quick brown fox jumps over the lazy dog " * 20,
+]
+
+# Quantization trades a little precision for speed, so it gets a looser bound
+MIN_COSINE = {"quantized": 0.98}
+DEFAULT_MIN_COSINE = 0.9999
+
+
+def main(args):
+    tokenizer, model = load_embedding_weights()
+    reference = create_backend("torch", tokenizer, model).encode(SENTENCES)
+
+    failed = False
+    for name in args.backends:
+        try:
+            backend = create_backend(name, tokenizer, model, EMBEDDING_MODEL_ID)
+            embeddings = backend.encode(SENTENCES)
+        except Exception as e:
+            print(f"{name:<12} ERROR {e}")
+            failed = True
+            continue
+        # Rows are normalized, so the row-wise dot product is the cosine
+        cosines = np.sum(reference * embeddings, axis=1)
+        threshold = MIN_COSINE.get(name, DEFAULT_MIN_COSINE)
+        ok = cosines.min() >= threshold
+        failed |= not ok
+        print(
+            f"{name:<12} {'ok' if ok else 'FAIL':<4} min_cosine={cosines.min():.6f} "
+            f"mean_cosine={cosines.mean():.6f} (threshold {threshold})"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--backends", nargs="+", default=[name for name in BACKENDS if name != "torch"]
+    )
+    main(parser.parse_args())
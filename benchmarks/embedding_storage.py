@@ -0,0 +1,74 @@
+"""
+Document size and decode time of the concept embedding storage formats.
+
+Runs offline, with random unit vectors in a concept-shaped document:
+    python3 -m benchmarks.embedding_storage --count 2000
+
+For each format (a BSON array of doubles, as stored before, and packed
+float32/float16 Binary), reports the BSON size of a document and the time to
+BSON-decode a batch of documents and turn their embeddings into one float32
+matrix (what loading a vector index does), plus the worst cosine similarity
+error the format introduces.
+"""
+from app.db.embedding_codec import encode_embedding, decode_embedding
+from datetime import datetime
+from bson import ObjectId
+import numpy as np
+import argparse
+import time
+import bson
+
+FORMATS = {
+    "array": lambda vector: vector.astype(np.float64).tolist(),
+    "float32": lambda vector: encode_embedding(vector, "float32"),
+    "float16": lambda vector: encode_embedding(vector, "float16"),
+}
+
+
+def make_document(embedding) -> dict:
+    return {
+        "_id": ObjectId(),
+        "user_id": str(ObjectId()),
+        "name": "Example Concept",
+        "usage": "This is how you use it",
+        "date_created": datetime(2024, 1, 1),
+        "last_seen": None,
+        "progress": 0.0,
+        "normalized_embedding": embedding,
+        "embedding_hash": "0" * 64,
+    }
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.count, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Pairs of vectors whose similarity is compared before and after encoding
+    pairs = rng.integers(0, args.count, size=(1000, 2))
+    exact = np.sum(vectors[pairs[:, 0]] * vectors[pairs[:, 1]], axis=1)
+
+    for name, encode in FORMATS.items():
+        raw = [bson.encode(make_document(encode(vector))) for vector in vectors]
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            documents = [bson.decode(data) for data in raw]
+            matrix = np.stack(
+                [decode_embedding(document["normalized_embedding"]) for document in documents]
+            )
+            best = min(best, time.perf_counter() - start)
+        stored = matrix[pairs]
+        error = np.abs(np.sum(stored[:, 0] * stored[:, 1], axis=1) - exact).max()
+        print(
+            f"{name:<8} document={len(raw[0]):>5}B "
+            f"decode={best / args.count * 1e6:7.2f}us/doc "
+            f"max_cosine_error={error:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
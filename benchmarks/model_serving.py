@@ -0,0 +1,133 @@
+"""
+Memory per worker and embedding throughput, with models loaded in every
+worker vs served by one shared model server.
+
+Starts 1, 4 and 8 worker processes (like uvicorn workers). In "local" mode
+each worker loads its own copy of the embedding model; in "server" mode a
+single model server holds it and workers send their jobs over local IPC.
+Every worker embeds the same number of small batches, and the memory of each
+process is read from /proc (Linux only) once all jobs are done.
+
+Run with: python3 -m benchmarks.model_serving [--workers 1 4 8]
+"""
+import multiprocessing
+import subprocess
+import argparse
+import tempfile
+import secrets
+import random
+import time
+import sys
+import os
+
+WORDS = (
+    "concept usage example meaning balance effect opposite neglect present "
+    "found everywhere short time fashion trend nature meeting ignore"
+).split()
+
+
+def memory_mb(pid: int | str = "self") -> tuple[float, float]:
+    """Resident (RSS) and proportional (PSS, shared pages split between
+    processes) memory of a process in MB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0]) / 1024
+    return values["Rss"], values["Pss"]
+
+
+def worker(address, batches, ready, start, results):
+    if address:
+        os.environ["MODEL_SERVER_ADDRESS"] = address
+    # Imported here so the model server address is set first
+    from app.helpers.similarity import calculate_normalized_embeddings
+    from app.helpers.model_registry import model_registry
+
+    model_registry.get("embedding")
+    ready.put(os.getpid())
+    start.wait()
+    for batch in batches:
+        calculate_normalized_embeddings(batch)
+    results.put((sum(map(len, batches)), *memory_mb()))
+
+
+def start_server(address: str) -> subprocess.Popen:
+    # The server and the workers (forked or spawned from here) share the key
+    os.environ.setdefault("MODEL_SERVER_AUTHKEY", secrets.token_hex(32))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.helpers.model_server", "--address", address],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # Wait for the server to accept connections and load the model
+    os.environ["MODEL_SERVER_ADDRESS"] = address
+    from app.helpers.model_server import RemoteModel
+
+    while True:
+        try:
+            if RemoteModel(address).states()["embedding"]["state"] == "ready":
+                return server
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+        time.sleep(0.2)
+
+
+def run(n_workers: int, address: str | None, args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready, results, start = context.Queue(), context.Queue(), context.Event()
+    rng = random.Random(0)
+    processes = []
+    for _ in range(n_workers):
+        batches = [
+            [" ".join(rng.choices(WORDS, k=rng.randint(2, 12))) for _ in range(args.batch_size)]
+            for _ in range(args.batches)
+        ]
+        process = context.Process(
+            target=worker, args=(address, batches, ready, start, results)
+        )
+        process.start()
+        processes.append(process)
+    for _ in processes:
+        ready.get()
+
+    began = time.perf_counter()
+    start.set()
+    reports = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    return {
+        "sentences/s": sum(report[0] for report in reports) / elapsed,
+        "worker_rss": sum(report[1] for report in reports) / n_workers,
+        "worker_pss": sum(report[2] for report in reports) / n_workers,
+    }
+
+
+def main(args):
+    address = os.path.join(tempfile.mkdtemp(), "models.sock")
+    for mode in args.modes:
+        server = start_server(address) if mode == "server" else None
+        for n_workers in args.workers:
+            report = run(n_workers, address if server else None, args)
+            server_pss = memory_mb(server.pid)[1] if server else 0.0
+            total = report["worker_pss"] * n_workers + server_pss
+            print(
+                f"{mode:<6} workers={n_workers:<2} {report['sentences/s']:8.1f} sentences/s "
+                f"worker rss={report['worker_rss']:7.1f}MB pss={report['worker_pss']:7.1f}MB "
+                f"server pss={server_pss:7.1f}MB total pss={total:8.1f}MB"
+            )
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", default=["local", "server"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=8)
+    main(parser.parse_args())
@@ -0,0 +1,67 @@
+"""
+Padding efficiency and throughput of length-bucketed embedding batches.
+
+Embeds batches that mix short concept names with long usage sentences, once
+padded as a single group (the previous behaviour) and once bucketed by token
+length, and reports real tokens / total tokens and sentences per second.
+
+Run with: python3 -m benchmarks.padding_efficiency [--batch-size 64]
+"""
+from app.helpers.embedding_backends import create_backend, EMBEDDING_BACKEND
+from app.helpers.model_registry import load_embedding_weights, EMBEDDING_MODEL_ID
+import argparse
+import random
+import time
+
+WORDS = (
+    "concept usage example meaning balance effect opposite neglect present "
+    "found everywhere short time fashion trend nature meeting ignore"
+).split()
+
+
+def mixed_batch(rng: random.Random, size: int) -> list[str]:
+    """Mostly short names, with about one in eight long usage sentences"""
+    return [
+        " ".join(
+            rng.choice(WORDS)
+            for _ in range(rng.randint(30, 80) if rng.random() < 0.125 else rng.randint(1, 4))
+        )
+        for _ in range(size)
+    ]
+
+
+def run(backend, batches: list[list[str]]) -> tuple[float, float]:
+    """Sentences per second and padding efficiency over the batches"""
+    start = time.perf_counter()
+    for batch in batches:
+        backend.encode(batch)
+    elapsed = time.perf_counter() - start
+    stats = backend.stats()
+    return sum(map(len, batches)) / elapsed, stats["padding_efficiency"]
+
+
+def main(args):
+    rng = random.Random(0)
+    tokenizer, model = load_embedding_weights()
+    batches = [mixed_batch(rng, args.batch_size) for _ in range(args.batches)]
+
+    for label, bucketed in (("single group", False), ("bucketed", True)):
+        backend = create_backend(EMBEDDING_BACKEND, tokenizer, model, EMBEDDING_MODEL_ID)
+        if not bucketed:
+            # Every batch as one group padded to its longest sentence, the
+            # same as tokenizing it with padding=True
+            backend.buckets = lambda lengths: [list(range(len(lengths)))]
+        # Warm up, which also fills the token cache for the first batch
+        backend.encode(batches[0])
+        throughput, efficiency = run(backend, batches)
+        print(
+            f"{label:<13} {throughput:8.1f} sentences/s "
+            f"padding efficiency={efficiency:.1%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--batches", type=int, default=20)
+    main(parser.parse_args())
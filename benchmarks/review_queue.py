@@ -0,0 +1,108 @@
+"""
+Latency of `GET /api/v1/users/{id}/review-queue` for a user with many
+concepts, against the old way of paging through every concept and sorting on
+the client.
+
+Start the API first (`uvicorn app.main:app`), then run:
+    python3 -m benchmarks.review_queue --count 50000
+
+Concepts are bulk imported under a throwaway user with due dates spread over
+the last and next 30 days (so about half are due), and deleted afterwards.
+Importing embeds every concept, so setting up a large user takes a while.
+"""
+from benchmarks.common import summarize_ms
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import httpx
+import random
+import time
+import uuid
+
+# Most concepts accepted by one bulk import
+BULK_CHUNK = 10000
+
+
+async def import_concepts(client, user_id: str, count: int) -> list[str]:
+    rng = random.Random(0)
+    now = datetime.now()
+    created = []
+    for start in range(0, count, BULK_CHUNK):
+        deck = [
+            {
+                "user_id": user_id,
+                "name": f"review concept {i}",
+                "usage": f"used in review benchmark sentence {i}",
+                "next_due": (now + timedelta(days=rng.uniform(-30, 30))).isoformat(),
+            }
+            for i in range(start, min(count, start + BULK_CHUNK))
+        ]
+        response = await client.post("/api/v1/concepts/bulk", json=deck)
+        response.raise_for_status()
+        created += [result["id"] for result in response.json()["results"] if result.get("id")]
+    return created
+
+
+async def client_side_queue(client, user_id: str, limit: int) -> list[dict]:
+    """Pages through all of the user's concepts and picks the due ones"""
+    concepts, after = [], None
+    while True:
+        params = {"user_id": user_id, "fields": "next_due", "limit": 1000}
+        if after:
+            params["after"] = after
+        page = (await client.get("/api/v1/concepts", params=params)).json()
+        concepts += page["items"]
+        after = page["next_after"]
+        if after is None:
+            break
+    now = datetime.now().isoformat()
+    due = sorted((c for c in concepts if c["next_due"] <= now), key=lambda c: c["next_due"])
+    return due[:limit]
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=3600) as client:
+        user = await client.post(
+            "/api/v1/users",
+            json={
+                "email": f"bench-{uuid.uuid4().hex}@circa.test",
+                "username": "bench-reviewer",
+                "password": "benchmark-password",
+            },
+        )
+        user.raise_for_status()
+        user_id = user.json()["id"]
+        created = []
+        try:
+            created = await import_concepts(client, user_id, args.count)
+            print(f"Imported {len(created)} concepts")
+
+            durations = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = await client.get(
+                    f"/api/v1/users/{user_id}/review-queue", params={"limit": args.limit}
+                )
+                response.raise_for_status()
+                durations.append(time.perf_counter() - start)
+            print(summarize_ms(f"review-queue (limit={args.limit})", durations))
+
+            durations = []
+            for _ in range(max(1, args.requests // 20)):
+                start = time.perf_counter()
+                await client_side_queue(client, user_id, args.limit)
+                durations.append(time.perf_counter() - start)
+            print(summarize_ms("paging through every concept", durations))
+        finally:
+            for id in created:
+                await client.delete(f"/api/v1/concepts/{id}")
+            await client.delete(f"/api/v1/users/{user_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,148 @@
+"""
+MongoDB round trips and latency per write endpoint.
+
+Runs the app in-process (httpx ASGITransport) against either a local mongod
+(`--mongo-uri mongodb://localhost:27017`) or, by default, the mongomock-motor
+stand-in (`pip install mongomock-motor`), and counts the collection calls
+each request makes. The embedding model is replaced by random unit vectors so
+only database work is measured.
+
+Run with: python3 -m benchmarks.round_trips
+"""
+from benchmarks.common import summarize_ms
+from app.helpers.embedding_engine import embedding_engine
+from app.db.database import get_db
+from app.main import app
+from collections import Counter
+import numpy as np
+import argparse
+import asyncio
+import httpx
+import time
+import uuid
+
+# Collection methods that each cost one round trip to the server
+ROUND_TRIP_METHODS = {
+    "find_one",
+    "insert_one",
+    "insert_many",
+    "update_one",
+    "update_many",
+    "delete_one",
+    "find_one_and_update",
+    "find_one_and_delete",
+    "bulk_write",
+    "aggregate",
+    "find",
+}
+
+
+class CountingCollection:
+    """Wraps a Motor collection and counts calls to round-trip methods"""
+
+    def __init__(self, collection, counter: Counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in ROUND_TRIP_METHODS:
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter[name] += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, db, counter: Counter):
+        self._db = db
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._db, name), self._counter)
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self._counter)
+
+
+def random_embeddings(texts):
+    vectors = np.random.standard_normal((len(texts), 384)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def measure(client, counter, label, method, url, repeats, body=None):
+    """Sends `repeats` requests, building the url and JSON body for each"""
+    timings, trips = [], []
+    for _ in range(repeats):
+        json = body() if body else None
+        counter.clear()
+        start = time.perf_counter()
+        response = await client.request(method, url(), json=json)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+        trips.append(sum(counter.values()))
+    print(f"{summarize_ms(f'{label:<30}', timings)} round_trips={max(trips)}")
+    return response
+
+
+async def main(args):
+    if args.mongo_uri:
+        import motor.motor_asyncio
+
+        db = motor.motor_asyncio.AsyncIOMotorClient(args.mongo_uri)["circa_benchmark"]
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        db = AsyncMongoMockClient()["circa_benchmark"]
+
+    counter = Counter()
+    counting_db = CountingDatabase(db, counter)
+
+    async def get_counting_db():
+        return counting_db
+
+    app.dependency_overrides[get_db] = get_counting_db
+    embedding_engine.embed_fn = random_embeddings
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        user = await measure(
+            client, counter, "POST /users", "POST", lambda: "/api/v1/users", args.repeats,
+            body=lambda: {
+                "email": f"{uuid.uuid4().hex}@circa.test",
+                "username": "bench",
+                "password": "benchmark-password",
+            },
+        )
+        user_id = user.json()["id"]
+        await measure(
+            client, counter, "PUT /users/{id}", "PUT", lambda: f"/api/v1/users/{user_id}",
+            args.repeats, body=lambda: {"username": "renamed"},
+        )
+        concept = await measure(
+            client, counter, "POST /concepts", "POST", lambda: "/api/v1/concepts",
+            args.repeats, body=lambda: {"user_id": user_id, "name": "bench", "usage": "usage"},
+        )
+        concept_id = concept.json()["id"]
+        for label, body in [
+            ("PUT /concepts/{id} name+usage", {"name": "bench", "usage": "new usage"}),
+            ("PUT /concepts/{id} usage", {"usage": "other usage"}),
+            ("PUT /concepts/{id} last_seen", {"last_seen": "2024-07-01T10:00:00"}),
+        ]:
+            await measure(
+                client, counter, label, "PUT", lambda: f"/api/v1/concepts/{concept_id}",
+                args.repeats, body=lambda: body,
+            )
+
+    if args.mongo_uri:
+        await db.client.drop_database("circa_benchmark")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--repeats", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
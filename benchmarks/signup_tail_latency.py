@@ -0,0 +1,85 @@
+"""
+Tail latency of simple `GET /users/{id}` reads while signups (bcrypt hashing)
+run concurrently.
+
+Start the API first (`uvicorn app.main:app`), then run:
+    python3 -m benchmarks.signup_tail_latency --base-url http://127.0.0.1:8000
+
+Reports read latency percentiles without and with concurrent signups. With
+hashing on the event loop the p99 jumps by the cost of a bcrypt round; with
+the executor layer it should stay close to the baseline.
+"""
+from benchmarks.common import summarize_ms
+import argparse
+import asyncio
+import httpx
+import time
+import uuid
+
+
+async def reader(client: httpx.AsyncClient, user_id: str, stop_at: float, out: list):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        response = await client.get(f"/api/v1/users/{user_id}")
+        out.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def signer(client: httpx.AsyncClient, stop_at: float, created: list):
+    while time.perf_counter() < stop_at:
+        response = await client.post(
+            "/api/v1/users",
+            json={
+                "email": f"bench-{uuid.uuid4().hex}@circa.test",
+                "username": "bench",
+                "password": "benchmark-password",
+            },
+        )
+        response.raise_for_status()
+        created.append(response.json()["id"])
+
+
+async def run_phase(client, user_id, readers, signups, duration):
+    latencies, created = [], []
+    stop_at = time.perf_counter() + duration
+    tasks = [reader(client, user_id, stop_at, latencies) for _ in range(readers)]
+    tasks += [signer(client, stop_at, created) for _ in range(signups)]
+    await asyncio.gather(*tasks)
+    return latencies, created
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        seed = await client.post(
+            "/api/v1/users",
+            json={
+                "email": f"bench-{uuid.uuid4().hex}@circa.test",
+                "username": "bench-reader",
+                "password": "benchmark-password",
+            },
+        )
+        seed.raise_for_status()
+        user_id = seed.json()["id"]
+        created = [user_id]
+
+        try:
+            baseline, _ = await run_phase(client, user_id, args.readers, 0, args.duration)
+            loaded, signed_up = await run_phase(
+                client, user_id, args.readers, args.signups, args.duration
+            )
+            created += signed_up
+            print(summarize_ms("GET /users/{id} (no signups)  ", baseline))
+            print(summarize_ms(f"GET /users/{{id}} ({args.signups} signups)", loaded))
+            print(f"signups completed: {len(signed_up)}")
+        finally:
+            for id in created:
+                await client.delete(f"/api/v1/users/{id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--signups", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    asyncio.run(main(parser.parse_args()))
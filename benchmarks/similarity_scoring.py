@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of similarity scoring on precomputed embeddings.
+
+Compares the old per-pair `F.cosine_similarity` loop against the vectorized
+`score_similarities` for 1, 100 and 10k candidates, plus a many-to-many
+`top_k_similarities` call. Embeddings are random unit vectors, so only the
+scoring is timed, not the model.
+
+Run with: python3 -m benchmarks.similarity_scoring
+"""
+from app.helpers.similarity import score_similarities, top_k_similarities
+import torch.nn.functional as F
+import argparse
+import torch
+import time
+
+DIM = 384
+
+
+def random_embeddings(n: int) -> torch.Tensor:
+    return F.normalize(torch.randn(n, DIM), p=2, dim=1)
+
+
+def loop_similarities(ref_embedding, rest_embeddings, rest):
+    """The previous implementation: one cosine_similarity and .item() per pair"""
+    similarities = []
+    for other_embedding, sentence in zip(rest_embeddings, rest):
+        similarity = F.cosine_similarity(
+            ref_embedding.unsqueeze(0), other_embedding.unsqueeze(0)
+        )
+        similarities.append((sentence, round(similarity.item(), 5)))
+    return similarities
+
+
+def best_of(fn, repeats: int) -> float:
+    """Fastest of several runs, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(args):
+    ref = random_embeddings(1)[0]
+    for n in (1, 100, 10_000):
+        rest_embeddings = random_embeddings(n)
+        rest = [f"sentence {i}" for i in range(n)]
+        loop = best_of(lambda: loop_similarities(ref, rest_embeddings, rest), args.repeats)
+        vectorized = best_of(
+            lambda: score_similarities(ref, rest_embeddings, rest), args.repeats
+        )
+        print(
+            f"{n:>6} candidates: loop={loop * 1000:9.3f}ms "
+            f"vectorized={vectorized * 1000:8.3f}ms speedup={loop / vectorized:7.1f}x"
+        )
+
+    refs = random_embeddings(args.refs)
+    candidates = random_embeddings(10_000)
+    top_k = best_of(lambda: top_k_similarities(refs, candidates, args.k), args.repeats)
+    print(f"{args.refs} refs x 10000 candidates, top-{args.k}: {top_k * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--refs", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+API cold-start time.
+
+Measures, in fresh processes:
+  - how long `import app.main` takes (and whether it pulled in torch),
+  - after launching uvicorn, how long until `GET /` answers (routes that need
+    no model) and until `GET /ready` reports the preloaded models as ready.
+
+Run with: python3 -m benchmarks.startup_time --runs 3
+Compare against an older checkout by running the same script there.
+"""
+from benchmarks.common import summarize_ms
+import subprocess
+import argparse
+import httpx
+import sys
+import time
+
+IMPORT_SNIPPET = (
+    "import time, sys; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start, 'torch' in sys.modules)"
+)
+
+
+def time_import() -> tuple[float, bool]:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[-2]), output[-1] == "True"
+
+
+def wait_for(url: str, start: float, timeout: float, expect_ok=True) -> float:
+    """Polls a URL until it answers (with a 2xx if expect_ok), returning the
+    seconds since `start`"""
+    while time.perf_counter() - start < timeout:
+        try:
+            response = httpx.get(url, timeout=1)
+            if not expect_ok or response.is_success:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def time_server(port: int, timeout: float) -> tuple[float, float]:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        first_response = wait_for(f"http://127.0.0.1:{port}/", start, timeout)
+        models_ready = wait_for(f"http://127.0.0.1:{port}/ready", start, timeout)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_response, models_ready
+
+
+def main(args):
+    imports, first_responses, ready = [], [], []
+    for _ in range(args.runs):
+        seconds, loaded_torch = time_import()
+        imports.append(seconds)
+        first, models = time_server(args.port, args.timeout)
+        first_responses.append(first)
+        ready.append(models)
+    print(summarize_ms("import app.main       ", imports), f"torch imported={loaded_torch}")
+    print(summarize_ms("first response (GET /)", first_responses))
+    print(summarize_ms("models ready (/ready) ", ready))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    main(parser.parse_args())
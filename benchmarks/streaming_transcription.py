@@ -0,0 +1,119 @@
+"""
+Time-to-first-token and real-time factor of the streaming transcription
+WebSocket.
+
+Start the API first (`uvicorn app.main:app`), then replay WAV files at
+real-time speed:
+    python3 -m benchmarks.streaming_transcription speech.wav other.wav
+
+Each file is sent as 16-bit PCM chunks of `--chunk-ms`, paced like a live
+microphone (`--speed 0` sends as fast as possible). Reported per file:
+- time to first token: from the first audio chunk to the first non-empty
+  partial transcript
+- final latency: from the end of the audio to the final transcript
+- real-time factor: model compute time / audio duration, as reported by the
+  server (below 1 keeps up with live audio)
+Without files, `--synthetic` seconds of noise are sent instead.
+"""
+from benchmarks.common import summarize_ms
+import numpy as np
+import websockets
+import argparse
+import asyncio
+import json
+import time
+import wave
+
+SAMPLE_RATE = 16000
+
+
+def read_wav(path: str) -> np.ndarray:
+    """A 16-bit PCM WAV file as 16kHz mono float32 samples"""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        frames = f.readframes(f.getnframes())
+        channels, rate = f.getnchannels(), f.getframerate()
+    audio = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        # Linear resampling is plenty for a benchmark
+        positions = np.arange(0, len(audio), rate / SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+async def replay(url: str, audio: np.ndarray, chunk_ms: int, speed: float) -> dict:
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
+    chunk_bytes = SAMPLE_RATE * chunk_ms // 1000 * 2
+    first_token_at = None
+    final = None
+
+    async with websockets.connect(url, max_size=None) as websocket:
+
+        async def receive():
+            nonlocal first_token_at, final
+            async for message in websocket:
+                message = json.loads(message)
+                if message["type"] == "partial" and message["text"] and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                elif message["type"] == "final":
+                    final = (time.perf_counter(), message)
+                elif message["type"] == "error":
+                    raise RuntimeError(message["detail"])
+
+        receiver = asyncio.create_task(receive())
+        started = time.perf_counter()
+        for offset in range(0, len(pcm), chunk_bytes):
+            await websocket.send(pcm[offset : offset + chunk_bytes])
+            if speed:
+                # Pace against the start time so sending overhead doesn't add up
+                sent_seconds = (offset + chunk_bytes) / 2 / SAMPLE_RATE
+                await asyncio.sleep(max(0, started + sent_seconds / speed - time.perf_counter()))
+        ended = time.perf_counter()
+        await websocket.send("end")
+        await receiver
+
+    finished_at, message = final
+    return {
+        "first_token": first_token_at - started if first_token_at else None,
+        "final_latency": finished_at - ended,
+        "rtf": message["compute_seconds"] / message["audio_seconds"],
+        "audio_seconds": message["audio_seconds"],
+        "text": message["text"],
+    }
+
+
+async def main(args):
+    url = f"{args.base_url.rstrip('/')}/api/v1/transcribe/stream"
+    if args.files:
+        clips = [(path, read_wav(path)) for path in args.files]
+    else:
+        noise = np.random.default_rng(0).standard_normal(int(args.synthetic * SAMPLE_RATE))
+        clips = [("synthetic", (noise * 0.1).astype(np.float32))]
+
+    first_tokens, final_latencies = [], []
+    for name, audio in clips:
+        report = await replay(url, audio, args.chunk_ms, args.speed)
+        first_token = report["first_token"]
+        if first_token is not None:
+            first_tokens.append(first_token)
+        final_latencies.append(report["final_latency"])
+        print(
+            f"{name}: {report['audio_seconds']:.1f}s audio, "
+            f"time to first token={'-' if first_token is None else f'{first_token * 1000:.0f}ms'} "
+            f"final latency={report['final_latency'] * 1000:.0f}ms "
+            f"RTF={report['rtf']:.3f}\n  {report['text'][:100]!r}"
+        )
+    print(summarize_ms("time to first token", first_tokens))
+    print(summarize_ms("final latency", final_latencies))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", help="16-bit PCM WAV files to replay")
+    parser.add_argument("--base-url", default="ws://127.0.0.1:8000")
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--speed", type=float, default=1.0, help="1 is real time, 0 unpaced")
+    parser.add_argument("--synthetic", type=float, default=10.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""
+Load test of batched transcription (`POST /api/v1/transcribe`).
+
+Start the API first (`uvicorn app.main:app`), then run:
+    python3 -m benchmarks.transcription_load --concurrency 1 4 16 64
+
+At each concurrency level, that many clients post clips back to back for
+`--duration` seconds. Clips are random noise of 1-10s, or WAV files given
+with `--files`. Reports clips per second, request latency, queueing delay
+before a clip reached the model, the mean batch size, and how many requests
+were turned away with 503 (backpressure).
+"""
+from benchmarks.common import summarize_ms
+import numpy as np
+import argparse
+import asyncio
+import httpx
+import random
+import time
+
+SAMPLE_RATE = 16000
+
+
+async def client(
+    http: httpx.AsyncClient, clips: list[tuple[bytes, dict]], stop_at: float, stats: dict
+):
+    rng = random.Random()
+    while time.perf_counter() < stop_at:
+        body, headers = rng.choice(clips)
+        start = time.perf_counter()
+        response = await http.post("/api/v1/transcribe", content=body, headers=headers)
+        if response.status_code == 503:
+            stats["rejected"] += 1
+            # Honour the backpressure instead of hammering the server
+            await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+            continue
+        response.raise_for_status()
+        result = response.json()
+        stats["latency"].append(time.perf_counter() - start)
+        stats["queue"].append(result["queue_seconds"])
+        stats["batch_sizes"].append(result["batch_size"])
+
+
+async def main(args):
+    if args.files:
+        clips = [(open(path, "rb").read(), {"content-type": "audio/wav"}) for path in args.files]
+    else:
+        rng = np.random.default_rng(0)
+        clips = [
+            (
+                (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 3000).astype("<i2").tobytes(),
+                {"content-type": "application/octet-stream"},
+            )
+            for seconds in rng.uniform(1, 10, 20)
+        ]
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300) as http:
+        for concurrency in args.concurrency:
+            stats = {"latency": [], "queue": [], "batch_sizes": [], "rejected": 0}
+            start = time.perf_counter()
+            stop_at = start + args.duration
+            await asyncio.gather(
+                *(client(http, clips, stop_at, stats) for _ in range(concurrency))
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"concurrency={concurrency}: {len(stats['latency']) / elapsed:.2f} clips/s, "
+                f"mean batch size {np.mean(stats['batch_sizes'] or [0]):.1f}, "
+                f"{stats['rejected']} rejected (503)"
+            )
+            print("  " + summarize_ms("latency", stats["latency"]))
+            print("  " + summarize_ms("queueing delay", stats["queue"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--files", nargs="*", default=[], help="16kHz 16-bit WAV clips")
+    asyncio.run(main(parser.parse_args()))